@@ -4,6 +4,6 @@ Core - 航空机票核心业务逻辑模块
 包含航班数据处理等核心功能
 """
 
-from . import flights
+from . import flights, connections, timetable, ranking
 
-__all__ = ["flights"] 
\ No newline at end of file
+__all__ = ["flights", "connections", "timetable", "ranking"] 
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""
+Connections - 中转衔接匹配引擎
+
+把航段时刻一次性解析为整数分钟，第二程按起飞时间排序后，
+对每个第一程的到达时间二分查找 [最小, 最大] 中转时间窗口，
+匹配复杂度为 O((n+m) log m)；支持 "+1天"、"次日" 等跨天到达和隔夜衔接
+"""
+
+import re
+import logging
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from .flights import Flight
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+DAY_MINUTES = 24 * 60
+
+_CLOCK = re.compile(r'(\d{1,2}):(\d{2})')
+# 跨天偏移只认紧跟在时刻之后的 "+N天"，避免把日期中的 "-06" 当作偏移
+_DAY_OFFSET = re.compile(r'^\s*([+-])\s*(\d+)\s*天?')
+
+
+def parse_clock_minutes(text: str) -> Optional[int]:
+    """
+    将时刻文本解析为相对出发日零点的分钟数
+
+    支持 "08:05"、"8:05"、"08:05 +1天"、"08:05+1"、"次日08:05" 等格式。
+
+    Args:
+        text: 时刻文本
+
+    Returns:
+        分钟数（跨天时大于等于1440）；无法解析时返回None
+    """
+    if not text:
+        return None
+    match = _CLOCK.search(text)
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2))
+    if hour > 23 or minute > 59:
+        return None
+
+    days = 0
+    offset = _DAY_OFFSET.match(text[match.end():])
+    if offset:
+        days = int(offset.group(2)) * (1 if offset.group(1) == '+' else -1)
+    elif '次日' in text[:match.start()] + ' ' + text[match.end():]:
+        days = 1
+    return days * DAY_MINUTES + hour * 60 + minute
+
+
+def format_clock_minutes(minutes: int) -> str:
+    """
+    将相对出发日零点的分钟数格式化为时刻文本，跨天时追加 "+N天"
+
+    Args:
+        minutes: 分钟数
+
+    Returns:
+        如 "08:05"、"01:30 +1天"
+    """
+    days, rest = divmod(int(minutes), DAY_MINUTES)
+    text = f"{rest // 60:02d}:{rest % 60:02d}"
+    return f"{text} +{days}天" if days > 0 else text
+
+
+class TimedLeg(NamedTuple):
+    """带整数分钟时刻的航段"""
+    flight: Flight
+    departure: int
+    arrival: int
+
+
+def time_leg(flight: Flight) -> Optional[TimedLeg]:
+    """
+    解析航段的起飞和到达时刻
+
+    到达时间未标注跨天且早于起飞时间时视为次日到达。
+
+    Returns:
+        TimedLeg；时刻无法解析时返回None
+    """
+    departure = parse_clock_minutes(flight.schedule.departure_time)
+    arrival = parse_clock_minutes(flight.schedule.arrival_time)
+    if departure is None or arrival is None:
+        return None
+    while arrival < departure:
+        arrival += DAY_MINUTES
+    return TimedLeg(flight, departure, arrival)
+
+
+def time_legs(flights: Iterable[Flight]) -> List[TimedLeg]:
+    """批量解析航段时刻，跳过无法解析的航段"""
+    timed = []
+    for flight in flights or []:
+        leg = time_leg(flight)
+        if leg is None:
+            logger.debug(f"航段时刻无法解析，跳过: {flight.flight_number} "
+                         f"{flight.schedule.departure_time}-{flight.schedule.arrival_time}")
+            continue
+        timed.append(leg)
+    return timed
+
+
+class ConnectionIndex:
+    """按起飞时间排序的第二程索引，可对任意到达时刻查询中转窗口内的衔接航段"""
+
+    def __init__(self, second_legs: Iterable[Flight], max_day_offset: int = 2):
+        """
+        构建索引
+
+        Args:
+            second_legs: 第二程航班列表（每日执行的航班时刻）
+            max_day_offset: 第二程最多顺延的天数，用于匹配跨天到达后的隔夜衔接
+        """
+        legs = time_legs(second_legs)
+        entries = sorted(
+            (leg.departure + day * DAY_MINUTES, position, day)
+            for position, leg in enumerate(legs)
+            for day in range(max_day_offset + 1)
+        )
+        self._legs = legs
+        self._departures = [entry[0] for entry in entries]
+        self._entries = [(legs[position], day) for _, position, day in entries]
+
+    def __len__(self) -> int:
+        return len(self._legs)
+
+    @property
+    def legs(self) -> List[TimedLeg]:
+        """已解析时刻的第二程航段"""
+        return list(self._legs)
+
+    def connections_from(self, arrival: int, min_minutes: int, max_minutes: int) -> Iterator[Tuple[TimedLeg, int, int]]:
+        """
+        查询在 [arrival+min_minutes, arrival+max_minutes] 内起飞的第二程
+
+        Args:
+            arrival: 第一程到达时刻（分钟）
+            min_minutes: 最短中转时间（分钟）
+            max_minutes: 最长中转时间（分钟）
+
+        Yields:
+            (第二程, 中转分钟数, 第二程顺延天数)，按起飞时间升序
+        """
+        lo = bisect_left(self._departures, arrival + min_minutes)
+        hi = bisect_right(self._departures, arrival + max_minutes)
+        for i in range(lo, hi):
+            leg, day = self._entries[i]
+            yield leg, self._departures[i] - arrival, day
+
+
+def iter_connections(first_legs: Iterable[Flight], second_legs: Iterable[Flight],
+                     min_transfer_hours: float, max_transfer_hours: float) -> Iterator[Tuple[TimedLeg, TimedLeg, int]]:
+    """
+    逐个产出满足中转时间要求的两段航班（带整数分钟时刻，便于计算全程时长）
+
+    Args:
+        first_legs: 第一程航班列表
+        second_legs: 第二程航班列表
+        min_transfer_hours: 最短中转时间（小时）
+        max_transfer_hours: 最长中转时间（小时）
+
+    Yields:
+        (第一程, 第二程, 中转分钟数)，第二程的时刻已按顺延天数换算到第一程的时间轴上
+    """
+    min_minutes = int(round(min_transfer_hours * 60))
+    max_minutes = int(round(max_transfer_hours * 60))
+    if max_minutes < min_minutes:
+        return
+
+    index = ConnectionIndex(second_legs, max_day_offset=(max_minutes // DAY_MINUTES) + 2)
+    for leg in time_legs(first_legs):
+        for second, transfer_minutes, day in index.connections_from(leg.arrival, min_minutes, max_minutes):
+            logger.debug(f"符合换乘时间要求: {leg.flight.flight_number} -> {second.flight.flight_number}, "
+                         f"中转 {transfer_minutes} 分钟")
+            shift = day * DAY_MINUTES
+            yield leg, TimedLeg(second.flight, second.departure + shift, second.arrival + shift), transfer_minutes
+
+
+def match_connections(first_legs: Iterable[Flight], second_legs: Iterable[Flight],
+                      min_transfer_hours: float, max_transfer_hours: float) -> List[Tuple[Flight, Flight, int]]:
+    """
+    匹配满足中转时间要求的两段航班
+
+    Args:
+        first_legs: 第一程航班列表
+        second_legs: 第二程航班列表
+        min_transfer_hours: 最短中转时间（小时）
+        max_transfer_hours: 最长中转时间（小时）
+
+    Returns:
+        (第一程, 第二程, 中转分钟数) 列表，按第一程顺序、第二程起飞时间排列
+    """
+    return [(first.flight, second.flight, transfer_minutes)
+            for first, second, transfer_minutes
+            in iter_connections(first_legs, second_legs, min_transfer_hours, max_transfer_hours)]
@@ -70,6 +70,9 @@ class FlightTransfer(BaseModel):
     second_flight: Flight = Field(..., description="中转航班信息")
     departure_date:str=Field(..., description="出发日期")
     transfer_time: float = Field(..., description="中转时间（小时）")
+    transfer_place: Optional[str] = Field(None, description="中转地")
+    total_duration: Optional[float] = Field(None, description="全程时长（小时，含中转）")
+    total_price: Optional[float] = Field(None, description="两程经济舱价格合计")
     
 
 class FlightSearchCriteria(BaseModel):
@@ -0,0 +1,166 @@
+"""
+Ranking - 中转方案帕累托排序
+
+按 价格、全程时长、航段数 三个目标保留非支配方案。每个航段数维护一条
+"价格升序、时长严格递减" 的阶梯，支配判断和插入都只需二分查找；
+匹配中转时先用第一程的价格/时长下限与现有前沿比较，被支配的第一程
+直接跳过全部衔接组合，避免为大量被支配的组合构建模型对象
+"""
+
+import logging
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .flights import Flight
+from .connections import ConnectionIndex, DAY_MINUTES, time_legs
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+# 可选的排序方式（其余目标依次作为次级排序键）
+TIE_BREAKERS = ("price", "duration", "legs")
+
+
+class RankedItinerary(NamedTuple):
+    """帕累托前沿上的方案"""
+    price: float
+    duration: int
+    legs: int
+    payload: Any
+
+
+class ParetoFront:
+    """价格/时长/航段数 三目标的非支配集合"""
+
+    def __init__(self):
+        # 航段数 -> (价格升序列表, 时长严格递减列表, 方案列表)
+        self._stairs: Dict[int, Tuple[List[float], List[int], List[RankedItinerary]]] = {}
+        self.pruned = 0
+
+    def __len__(self) -> int:
+        return sum(len(stair[0]) for stair in self._stairs.values())
+
+    def dominated(self, price: float, duration: int, legs: int) -> bool:
+        """
+        判断方案是否被前沿弱支配（各目标都不优于前沿上的某个方案）
+
+        Args:
+            price: 价格
+            duration: 全程时长（分钟）
+            legs: 航段数
+
+        Returns:
+            被支配时返回True
+        """
+        for stair_legs, (prices, durations, _) in self._stairs.items():
+            if stair_legs > legs:
+                continue
+            position = bisect_right(prices, price) - 1
+            if position >= 0 and durations[position] <= duration:
+                return True
+        return False
+
+    def add(self, price: float, duration: int, legs: int, payload: Any) -> bool:
+        """
+        尝试把方案加入前沿，并移除被它支配的已有方案
+
+        Returns:
+            方案进入前沿时返回True；被支配时返回False
+        """
+        if self.dominated(price, duration, legs):
+            self.pruned += 1
+            return False
+
+        for stair_legs, (prices, durations, items) in self._stairs.items():
+            if stair_legs < legs:
+                continue
+            # 价格不低于新方案的部分中，时长也不短于新方案的是一段连续区间
+            start = bisect_left(prices, price)
+            end = start
+            while end < len(prices) and durations[end] >= duration:
+                end += 1
+            if end > start:
+                del prices[start:end], durations[start:end], items[start:end]
+                self.pruned += end - start
+
+        prices, durations, items = self._stairs.setdefault(legs, ([], [], []))
+        position = bisect_left(prices, price)
+        prices.insert(position, price)
+        durations.insert(position, duration)
+        items.insert(position, RankedItinerary(price, duration, legs, payload))
+        return True
+
+    def ranked(self, tie_breaker: str = "price") -> List[RankedItinerary]:
+        """
+        返回按指定目标排序的前沿方案
+
+        Args:
+            tie_breaker: 排序方式，"price"、"duration" 或 "legs"，其余目标依次作为次级排序键
+
+        Returns:
+            排序后的方案列表
+        """
+        items = [item for stair in self._stairs.values() for item in stair[2]]
+        return sorted(items, key=ranking_key(tie_breaker))
+
+
+def ranking_key(tie_breaker: str) -> Callable[[RankedItinerary], tuple]:
+    """返回排序键函数，tie_breaker 不支持时抛出ValueError"""
+    if tie_breaker == "price":
+        return lambda item: (item.price, item.duration, item.legs)
+    if tie_breaker == "duration":
+        return lambda item: (item.duration, item.price, item.legs)
+    if tie_breaker == "legs":
+        return lambda item: (item.legs, item.price, item.duration)
+    raise ValueError(f"不支持的排序方式: {tie_breaker}，可选: {', '.join(TIE_BREAKERS)}")
+
+
+def pareto_connections(first_legs: Iterable[Flight], second_legs: Iterable[Flight],
+                       min_transfer_hours: float, max_transfer_hours: float,
+                       front: Optional[ParetoFront] = None, context: Any = None) -> ParetoFront:
+    """
+    匹配两程衔接航班，只保留帕累托最优的组合
+
+    对每个第一程先计算 价格下限（第一程价格 + 第二程最低价）和 时长下限
+    （第一程时长 + 最短中转 + 第二程最短飞行时间），下限已被前沿支配时跳过该第一程。
+
+    Args:
+        first_legs: 第一程航班列表
+        second_legs: 第二程航班列表
+        min_transfer_hours: 最短中转时间（小时）
+        max_transfer_hours: 最长中转时间（小时）
+        front: 已有的前沿（多个中转地共用时传入），默认新建
+        context: 附加到每个方案 payload 中的上下文（如中转地）
+
+    Returns:
+        前沿，方案 payload 为 (第一程, 第二程, 中转分钟数, context)
+    """
+    front = front if front is not None else ParetoFront()
+    min_minutes = int(round(min_transfer_hours * 60))
+    max_minutes = int(round(max_transfer_hours * 60))
+    if max_minutes < min_minutes:
+        return front
+
+    index = ConnectionIndex(second_legs, max_day_offset=(max_minutes // DAY_MINUTES) + 2)
+    seconds = index.legs
+    if not seconds:
+        return front
+    min_second_price = min(leg.flight.price.economy for leg in seconds)
+    min_second_duration = min(leg.arrival - leg.departure for leg in seconds)
+
+    # 价格低的第一程先处理，尽早形成有效前沿
+    firsts = sorted(time_legs(first_legs), key=lambda leg: (leg.flight.price.economy, leg.arrival - leg.departure))
+    skipped = 0
+    for first in firsts:
+        first_price = first.flight.price.economy
+        bound_duration = first.arrival - first.departure + min_minutes + min_second_duration
+        if front.dominated(first_price + min_second_price, bound_duration, 2):
+            skipped += 1
+            continue
+        for second, transfer_minutes, day in index.connections_from(first.arrival, min_minutes, max_minutes):
+            total_minutes = second.arrival + day * DAY_MINUTES - first.departure
+            front.add(first_price + second.flight.price.economy, total_minutes, 2,
+                      (first.flight, second.flight, transfer_minutes, context))
+
+    logger.debug(f"帕累托匹配完成: 前沿 {len(front)} 条，跳过被支配的第一程 {skipped} 个，剔除组合 {front.pruned} 个")
+    return front
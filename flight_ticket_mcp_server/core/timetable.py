@@ -0,0 +1,368 @@
+"""
+Timetable - 基于连接扫描算法（CSA）的多段行程引擎
+
+把已抓取的航段时刻展开为 "连接"（起飞分钟、到达分钟、出发站、到达站），
+按起飞时间排序后存入 array 数组，站点名称统一驻留为整数ID；每日执行的航班
+按天复制，支持隔夜衔接。最早到达查询和出发时刻剖面查询都只需对连接数组
+做一次线性扫描，同时维护最多 K 段的到达时间表
+"""
+
+import os
+import time
+import logging
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .flights import Flight
+from .connections import DAY_MINUTES, time_legs
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+_INF = float('inf')
+
+
+class JourneyLeg(NamedTuple):
+    """行程中的一段"""
+    origin: str
+    destination: str
+    departure: int
+    arrival: int
+    flight: Flight
+
+
+class Journey(NamedTuple):
+    """由若干航段组成的行程，时刻为相对出发日零点的分钟数"""
+    departure: int
+    arrival: int
+    legs: List[JourneyLeg]
+
+
+class Timetable:
+    """数组存储的连接时刻表"""
+
+    def __init__(self, day_copies: int = 2):
+        """
+        初始化空时刻表
+
+        Args:
+            day_copies: 每日航班展开的天数（2 表示当天和次日），决定可匹配的隔夜衔接范围
+        """
+        self.day_copies = max(1, int(day_copies))
+        self._station_ids: Dict[str, int] = {}
+        self._stations: List[str] = []
+        self._flights: List[Flight] = []
+        self._pending: List[Tuple[int, int, int, int, int]] = []
+        self._dirty = False
+        self.departures = array('l')
+        self.arrivals = array('l')
+        self.origins = array('l')
+        self.destinations = array('l')
+        self.flight_refs = array('l')
+
+    # ---------- 构建 ----------
+
+    def station_id(self, code: str) -> int:
+        """返回站点的整数ID，首次出现时分配"""
+        key = str(code).strip().lower()
+        station = self._station_ids.get(key)
+        if station is None:
+            station = len(self._stations)
+            self._station_ids[key] = station
+            self._stations.append(key)
+        return station
+
+    def add_flights(self, origin: str, destination: str, flights: Iterable[Flight]) -> int:
+        """
+        添加一组航段（同一出发站和到达站的每日航班）
+
+        Args:
+            origin: 出发站代码（城市或机场三字码）
+            destination: 到达站代码
+            flights: 航班列表
+
+        Returns:
+            成功解析时刻的航段数量
+        """
+        origin_id = self.station_id(origin)
+        destination_id = self.station_id(destination)
+        count = 0
+        for leg in time_legs(flights):
+            ref = len(self._flights)
+            self._flights.append(leg.flight)
+            for day in range(self.day_copies):
+                shift = day * DAY_MINUTES
+                self._pending.append((leg.departure + shift, leg.arrival + shift, origin_id, destination_id, ref))
+            count += 1
+        self._dirty = True
+        return count
+
+    def build(self):
+        """把新增连接合并进按起飞时间排序的数组（查询前自动调用）"""
+        if not self._dirty:
+            return
+        connections = list(zip(self.departures, self.arrivals, self.origins, self.destinations, self.flight_refs))
+        connections.extend(self._pending)
+        connections.sort()
+        self._pending = []
+        self.departures = array('l', (c[0] for c in connections))
+        self.arrivals = array('l', (c[1] for c in connections))
+        self.origins = array('l', (c[2] for c in connections))
+        self.destinations = array('l', (c[3] for c in connections))
+        self.flight_refs = array('l', (c[4] for c in connections))
+        self._dirty = False
+
+    def __len__(self) -> int:
+        self.build()
+        return len(self.departures)
+
+    @property
+    def stations(self) -> List[str]:
+        """已登记的站点代码列表（下标即站点ID）"""
+        return list(self._stations)
+
+    # ---------- 查询 ----------
+
+    def _leg(self, index: int) -> JourneyLeg:
+        return JourneyLeg(self._stations[self.origins[index]], self._stations[self.destinations[index]],
+                          self.departures[index], self.arrivals[index], self._flights[self.flight_refs[index]])
+
+    def earliest_arrival(self, origin: str, destination: str, departure_after: int = 0, max_legs: int = 3,
+                         min_transfer_minutes: int = 60) -> List[Journey]:
+        """
+        最早到达查询：从 departure_after 起出发，求最多 max_legs 段的最早到达行程
+
+        一次扫描同时维护 "最多 k 段" 的到达时间表（k = 1..max_legs），
+        返回按航段数的帕累托行程：航段更多的行程只有在到达更早时才会返回。
+
+        Args:
+            origin: 出发站代码
+            destination: 到达站代码
+            departure_after: 最早出发时刻（分钟）
+            max_legs: 最多航段数
+            min_transfer_minutes: 最短中转时间（分钟）
+
+        Returns:
+            行程列表，按航段数升序（到达时间随之递减）；不可达时返回空列表
+        """
+        self.build()
+        source = self._station_ids.get(str(origin).strip().lower())
+        target = self._station_ids.get(str(destination).strip().lower())
+        if source is None or target is None or source == target or max_legs < 1:
+            return []
+
+        stations = len(self._stations)
+        # reached[k][s]: 最多 k 段到达站点 s 的最早时刻；via[k][s]: 对应的最后一段连接（-1 表示出发站）
+        reached = [[_INF] * stations for _ in range(max_legs + 1)]
+        via = [[-1] * stations for _ in range(max_legs + 1)]
+        for k in range(max_legs + 1):
+            reached[k][source] = departure_after
+
+        departures, arrivals = self.departures, self.arrivals
+        origins, destinations = self.origins, self.destinations
+        levels = range(1, max_legs + 1)
+        for i in range(bisect_left(departures, departure_after), len(departures)):
+            departure = departures[i]
+            # 直飞已到达：之后起飞的连接不可能产生更早到达，也不可能更少航段
+            if departure >= reached[1][target]:
+                break
+            u = origins[i]
+            v = destinations[i]
+            arrival = arrivals[i]
+            for k in levels:
+                ready = reached[k - 1][u]
+                if ready == _INF:
+                    continue
+                if via[k - 1][u] >= 0:
+                    ready += min_transfer_minutes
+                if ready <= departure and arrival < reached[k][v]:
+                    reached[k][v] = arrival
+                    via[k][v] = i
+
+        journeys = []
+        best = _INF
+        for k in levels:
+            if reached[k][target] < best:
+                best = reached[k][target]
+                journeys.append(self._trace(via, k, source, target))
+        return journeys
+
+    def _trace(self, via: List[List[int]], k: int, source: int, target: int) -> Journey:
+        """沿 via 指针回溯最多 k 段的行程"""
+        legs = []
+        station = target
+        while station != source and k > 0:
+            index = via[k][station]
+            if index < 0:
+                break
+            legs.append(self._leg(index))
+            station = self.origins[index]
+            k -= 1
+        legs.reverse()
+        return Journey(legs[0].departure, legs[-1].arrival, legs)
+
+    def profile(self, origin: str, destination: str, departure_after: int = 0,
+                departure_before: int = DAY_MINUTES, max_legs: int = 3,
+                min_transfer_minutes: int = 60) -> List[Journey]:
+        """
+        出发时刻剖面查询：求 [departure_after, departure_before) 内每个出发时刻的最早到达行程
+
+        逆序扫描连接数组，为每个站点维护 "最多 k 段" 的 (出发时刻, 最早到达) 帕累托表，
+        结果中不存在 出发更晚且到达更早 的被支配行程。
+
+        Args:
+            origin: 出发站代码
+            destination: 到达站代码
+            departure_after: 最早出发时刻（分钟）
+            departure_before: 最晚出发时刻（分钟，不含），默认出发当天结束
+            max_legs: 最多航段数
+            min_transfer_minutes: 最短中转时间（分钟）
+
+        Returns:
+            行程列表，按出发时间升序
+        """
+        self.build()
+        source = self._station_ids.get(str(origin).strip().lower())
+        target = self._station_ids.get(str(destination).strip().lower())
+        if source is None or target is None or source == target or max_legs < 1:
+            return []
+
+        # tables[k][s] = (负出发时刻列表-升序, 到达时刻列表-递减, 连接下标列表)
+        tables: List[Dict[int, Tuple[List[int], List[int], List[int]]]] = [{} for _ in range(max_legs + 1)]
+
+        def lookup(k: int, station: int, ready: int):
+            table = tables[k].get(station)
+            if not table:
+                return None
+            position = bisect_right(table[0], -ready) - 1
+            return position if position >= 0 else None
+
+        departures, arrivals = self.departures, self.arrivals
+        origins, destinations = self.origins, self.destinations
+        levels = range(1, max_legs + 1)
+        stop = bisect_left(departures, departure_after)
+        for i in range(len(departures) - 1, stop - 1, -1):
+            u = origins[i]
+            v = destinations[i]
+            for k in levels:
+                if v == target:
+                    arrival = arrivals[i]
+                else:
+                    if k == 1:
+                        continue
+                    position = lookup(k - 1, v, arrivals[i] + min_transfer_minutes)
+                    if position is None:
+                        continue
+                    arrival = tables[k - 1][v][1][position]
+                table = tables[k].get(u)
+                if table is None:
+                    table = tables[k][u] = ([], [], [])
+                if table[1] and arrival >= table[1][-1]:
+                    continue
+                table[0].append(-departures[i])
+                table[1].append(arrival)
+                table[2].append(i)
+
+        origin_table = tables[max_legs].get(source)
+        if not origin_table:
+            return []
+
+        journeys = []
+        for position in range(len(origin_table[2]) - 1, -1, -1):
+            index = origin_table[2][position]
+            if self.departures[index] >= departure_before:
+                continue
+            legs = [self._leg(index)]
+            k = max_legs - 1
+            while self.destinations[index] != target and k > 0:
+                station = self.destinations[index]
+                next_position = lookup(k, station, self.arrivals[index] + min_transfer_minutes)
+                if next_position is None:
+                    break
+                index = tables[k][station][2][next_position]
+                legs.append(self._leg(index))
+                k -= 1
+            journeys.append(Journey(legs[0].departure, legs[-1].arrival, legs))
+        return journeys
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回时刻表规模统计"""
+        return {
+            "stations": len(self._stations),
+            "flights": len(self._flights),
+            "connections": len(self),
+            "day_copies": self.day_copies,
+        }
+
+
+class ScheduleRegistry:
+    """已抓取航段时刻的登记表，按 (出发站, 到达站) 保存最近一次结果，查询时按需重建时刻表"""
+
+    def __init__(self, ttl: Optional[float] = None):
+        """
+        Args:
+            ttl: 航段时刻的保留时间（秒），默认读取环境变量 TIMETABLE_SCHEDULE_TTL
+        """
+        self.ttl = float(ttl if ttl is not None else os.getenv('TIMETABLE_SCHEDULE_TTL', '21600'))
+        self._lock = threading.Lock()
+        self._schedules: Dict[Tuple[str, str], Tuple[float, List[Flight]]] = {}
+        self._timetable: Optional[Timetable] = None
+
+    def record(self, origin: str, destination: str, flights: Iterable[Flight]):
+        """
+        登记一组航段时刻（覆盖同一航段的旧结果）
+
+        Args:
+            origin: 出发站代码
+            destination: 到达站代码
+            flights: 航班列表
+        """
+        flights = list(flights or [])
+        if not origin or not destination or not flights:
+            return
+        key = (str(origin).strip().lower(), str(destination).strip().lower())
+        with self._lock:
+            self._schedules[key] = (time.time(), flights)
+            self._timetable = None
+        logger.debug(f"登记航段时刻: {key[0]}-{key[1]} {len(flights)} 个航班")
+
+    def timetable(self) -> Timetable:
+        """返回由未过期航段时刻构建的时刻表（登记内容未变化时复用）"""
+        with self._lock:
+            now = time.time()
+            expired = [key for key, (recorded, _) in self._schedules.items() if now - recorded > self.ttl]
+            for key in expired:
+                del self._schedules[key]
+            if self._timetable is None or expired:
+                started = time.perf_counter()
+                timetable = Timetable(day_copies=int(os.getenv('TIMETABLE_DAY_COPIES', '2')))
+                for (origin, destination), (_, flights) in self._schedules.items():
+                    timetable.add_flights(origin, destination, flights)
+                timetable.build()
+                self._timetable = timetable
+                logger.info(f"时刻表重建完成: {timetable.get_stats()}, "
+                            f"耗时 {(time.perf_counter() - started) * 1000:.1f}ms")
+            return self._timetable
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回登记表统计"""
+        stats = self.timetable().get_stats()
+        stats["routes"] = len(self._schedules)
+        stats["ttl"] = self.ttl
+        return stats
+
+
+_default_registry: Optional[ScheduleRegistry] = None
+_default_registry_lock = threading.Lock()
+
+
+def get_schedule_registry() -> ScheduleRegistry:
+    """获取进程共享的航段时刻登记表"""
+    global _default_registry
+    if _default_registry is None:
+        with _default_registry_lock:
+            if _default_registry is None:
+                _default_registry = ScheduleRegistry()
+    return _default_registry
@@ -217,10 +217,16 @@ def register_tools():
     
     # Flight route search tool
     @mcp.tool()
-    def searchFlightRoutes(departure_city: str, destination_city: str, departure_date: str):
-        """航班路线查询 - 根据出发地、目的地和出发日期查询可用航班信息"""
-        logger.debug(f"调用航班路线查询工具: departure_city={departure_city}, destination_city={destination_city}, departure_date={departure_date}")
-        return flight_search_tools.searchFlightRoutes(departure_city, destination_city, departure_date)
+    def searchFlightRoutes(departure_city: str, destination_city: str, departure_date: str, cursor: str = None, page_size: int = 10):
+        """航班路线查询 - 根据出发地、目的地和出发日期查询可用航班信息。结果分页返回，page_size为每页数量；传入上次结果中的next_cursor可获取下一页（不会重新加载页面）"""
+        logger.debug(f"调用航班路线查询工具: departure_city={departure_city}, destination_city={destination_city}, departure_date={departure_date}, cursor={cursor}, page_size={page_size}")
+        return flight_search_tools.searchFlightRoutes(departure_city, destination_city, departure_date, cursor, page_size)
+    
+    @mcp.tool()
+    def searchFlightRoutesBatch(queries: list, max_concurrency: int = 3):
+        """批量航班路线查询 - 并行查询多条航线。queries为查询列表，每项为{"departure_city","destination_city","departure_date"}或[出发地,目的地,日期]，max_concurrency为最大并发数，结果按完成先后返回"""
+        logger.debug(f"调用批量航班路线查询工具: queries={queries}, max_concurrency={max_concurrency}")
+        return flight_search_tools.searchFlightRoutesBatch(queries, max_concurrency)
     
     # Date tools
     @mcp.tool()
@@ -231,11 +237,56 @@ def register_tools():
 
     # Flight transfer search tools
     @mcp.tool()
-    def getTransferFlightsByThreePlace(from_place: str="北京", transfer_place: str="香港", to_place: str="纽约",min_transfer_time: float = 2.0, max_transfer_time: float = 5.0):
-        """航班中转路线查询 - 根据出发地、中转地、目的地、最小转机时间、最大转机时间查询中转航班信息，最小转机时间默认为2小时，最大转机时间默认为5小时"""
-        logger.debug(f"调用航班中转查询工具：: from_place={from_place}, transfer_place={transfer_place}, to_place={to_place}")
-        logger.debug(f"最短换乘时间: min_transfer_time={from_place},默认2小时 最长换乘时间：max_transfer_time={max_transfer_time}, 默认5小时")
-        return flight_transfer_tools.getTransferFlightsByThreePlace(from_place, transfer_place, to_place, min_transfer_time, max_transfer_time)
+    def getTransferFlightsByThreePlace(from_place: str="北京", transfer_place: str="香港", to_place: str="纽约",min_transfer_time: float = 2.0, max_transfer_time: float = 5.0, departure_date: str = None,
+                                       pareto_only: bool = True, tie_breaker: str = "price"):
+        """航班中转路线查询 - 根据出发地、中转地、目的地、最小转机时间、最大转机时间查询中转航班信息，最小转机时间默认为2小时，最大转机时间默认为5小时，departure_date为出发日期(YYYY-MM-DD)，默认今天。pareto_only默认只返回价格/全程时长帕累托最优的方案，tie_breaker为排序方式(price/duration/legs)"""
+        logger.debug(f"调用航班中转查询工具：: from_place={from_place}, transfer_place={transfer_place}, to_place={to_place}, departure_date={departure_date}")
+        logger.debug(f"最短换乘时间: min_transfer_time={min_transfer_time},默认2小时 最长换乘时间：max_transfer_time={max_transfer_time}, 默认5小时")
+        return flight_transfer_tools.getTransferFlightsByThreePlace(
+            from_place, transfer_place, to_place,
+            departure_date=departure_date,
+            min_transfer_time=min_transfer_time,
+            max_transfer_time=max_transfer_time,
+            pareto_only=pareto_only,
+            tie_breaker=tie_breaker,
+        )
+
+    @mcp.tool()
+    def searchTransferItineraries(from_place: str, to_place: str, departure_date: str = None, top_k: int = 5,
+                                  sort_by: str = "duration", max_hubs: int = None,
+                                  min_transfer_time: float = 2.0, max_transfer_time: float = 5.0,
+                                  pareto_only: bool = False):
+        """自动中转方案查询 - 只需出发地和目的地，自动从枢纽城市中挑选中转地并并行查询各航段，返回按全程时长(sort_by=duration)或两程价格合计(sort_by=price)排序的前top_k条中转方案。departure_date为出发日期(YYYY-MM-DD)，默认今天；max_hubs为最多尝试的枢纽数量；pareto_only为True时只在价格/时长帕累托最优的方案中选取"""
+        logger.debug(f"调用自动中转查询工具: from_place={from_place}, to_place={to_place}, departure_date={departure_date}, "
+                     f"top_k={top_k}, sort_by={sort_by}, max_hubs={max_hubs}")
+        return flight_transfer_tools.searchTransferItineraries(
+            from_place, to_place,
+            departure_date=departure_date,
+            top_k=top_k,
+            sort_by=sort_by,
+            max_hubs=max_hubs,
+            min_transfer_time=min_transfer_time,
+            max_transfer_time=max_transfer_time,
+            pareto_only=pareto_only,
+        )
+
+    @mcp.tool()
+    def searchEarliestArrival(from_place: str, to_place: str, earliest_departure: str = "00:00",
+                              max_legs: int = 3, min_transfer_time: float = 1.0):
+        """多段行程最早到达查询 - 在已抓取的航段时刻表上用连接扫描算法查询最多max_legs段的最早到达行程，earliest_departure为最早出发时刻(HH:MM)，min_transfer_time为最短中转时间(小时)。只使用此前航班路线查询和中转查询抓取过的航段"""
+        logger.debug(f"调用最早到达查询工具: from_place={from_place}, to_place={to_place}, "
+                     f"earliest_departure={earliest_departure}, max_legs={max_legs}, min_transfer_time={min_transfer_time}")
+        return flight_transfer_tools.searchEarliestArrival(from_place, to_place, earliest_departure,
+                                                           max_legs, min_transfer_time)
+
+    @mcp.tool()
+    def getDepartureProfile(from_place: str, to_place: str, departure_after: str = "00:00",
+                            departure_before: str = "23:59", max_legs: int = 3, min_transfer_time: float = 1.0):
+        """出发时刻剖面查询 - 在已抓取的航段时刻表上列出departure_after到departure_before(HH:MM)之间每个出发时刻的最早到达行程(最多max_legs段)，结果中不含出发更早却到达更晚的行程"""
+        logger.debug(f"调用出发时刻剖面查询工具: from_place={from_place}, to_place={to_place}, "
+                     f"departure_after={departure_after}, departure_before={departure_before}, max_legs={max_legs}")
+        return flight_transfer_tools.getDepartureProfile(from_place, to_place, departure_after, departure_before,
+                                                         max_legs, min_transfer_time)
 
     # Weather query tools
     @mcp.tool()
@@ -260,7 +311,7 @@ def register_tools():
     # Simple OpenSky Network tools for real-time flight tracking
     @mcp.tool()
     def getFlightStatus(flight_number: str, date: str = None):
-        """航班实时状态查询 - 使用OpenSky Network查询航班实时位置和状态。flight_number为航班呼号(如CCA1234)，date参数无效(仅支持实时数据)"""
+        """航班实时状态查询 - 使用OpenSky Network查询航班实时位置和状态。flight_number为航班呼号(如CCA1234)、呼号片段或以*结尾的前缀(如CCA*查询国航所有航班)，date参数无效(仅支持实时数据)"""
         logger.debug(f"调用航班实时状态查询工具: flight_number={flight_number}, date={date}")
         return simple_opensky_tools.getFlightStatus(flight_number, date)
 
@@ -282,7 +333,62 @@ def register_tools():
         logger.debug(f"调用批量航班跟踪工具: flight_numbers={flight_numbers}, date={date}")
         return simple_opensky_tools.trackMultipleFlights(flight_numbers, date)
 
-    logger.info("MCP工具注册完成 - 已注册工具: searchFlightRoutes, getCurrentDate, getTransferFlightsByThreePlace, getWeatherByLocation, getWeatherByCity, getFlightInfo, getFlightStatus, getAirportFlights, getFlightsInArea, trackMultipleFlights")
+    @mcp.tool()
+    def getFlightTrajectory(flight_number: str, limit: int = 60):
+        """航班轨迹查询 - 返回航班最近的位置点(时间、经纬度、高度、速度、航向)。flight_number为航班呼号(如CCA1234)或icao24地址，limit为最多返回的点数。需启用后台轮询(OPENSKY_POLLER_ENABLED=true)才能持续记录轨迹"""
+        logger.debug(f"调用航班轨迹查询工具: flight_number={flight_number}, limit={limit}")
+        return simple_opensky_tools.getFlightTrajectory(flight_number, limit)
+
+    @mcp.tool()
+    def getFlightHistory(flight_number: str, start_time: str = None, end_time: str = None):
+        """航班位置历史查询 - 返回航班在时间窗口内记录的位置点。flight_number为航班呼号或icao24地址，start_time/end_time为ISO格式时间(如2025-06-01T08:00:00)"""
+        logger.debug(f"调用航班位置历史查询工具: flight_number={flight_number}, start_time={start_time}, end_time={end_time}")
+        return simple_opensky_tools.getFlightHistory(flight_number, start_time, end_time)
+
+    @mcp.tool()
+    def getFlightChanges(since: str = None, min_lat: float = None, max_lat: float = None, min_lon: float = None, max_lon: float = None):
+        """航班增量查询 - 返回since之后位置有更新、新出现或消失的航班。since为ISO格式时间，传入上一次返回的server_time；可选经纬度边界过滤区域"""
+        logger.debug(f"调用航班增量查询工具: since={since}, bbox=({min_lat}, {max_lat}, {min_lon}, {max_lon})")
+        return simple_opensky_tools.getFlightChanges(since, min_lat, max_lat, min_lon, max_lon)
+
+    # Browser pool stats tool
+    @mcp.tool()
+    def getBrowserPoolStats():
+        """浏览器池状态查询 - 返回航班路线查询浏览器池和中转查询驱动池的实例数量、租借等待时间和利用率等统计信息"""
+        logger.debug("调用浏览器池状态查询工具")
+        return flight_search_tools.getBrowserPoolStats()
+
+    # Result cache stats tool
+    @mcp.tool()
+    def getCacheStats():
+        """缓存状态查询 - 返回航班路线、中转航段、天气等查询结果缓存的条目数、命中/过期命中/未命中/淘汰计数和命中率"""
+        logger.debug("调用缓存状态查询工具")
+        return flight_search_tools.getCacheStats()
+
+    # OpenSky snapshot/poller stats tool
+    @mcp.tool()
+    def getOpenSkyStats():
+        """OpenSky数据状态查询 - 返回全球状态快照的下载/复用计数和年龄、后台轮询器状态、航班位置历史的航班数和位置点数"""
+        logger.debug("调用OpenSky数据状态查询工具")
+        return simple_opensky_tools.getOpenSkyStats()
+
+    logger.info("MCP工具注册完成 - 已注册工具: searchFlightRoutes, searchFlightRoutesBatch, getCurrentDate, getTransferFlightsByThreePlace, searchTransferItineraries, searchEarliestArrival, getDepartureProfile, getWeatherByLocation, getWeatherByCity, getFlightInfo, getFlightStatus, getAirportFlights, getFlightsInArea, trackMultipleFlights, getFlightTrajectory, getFlightHistory, getFlightChanges, getBrowserPoolStats, getCacheStats, getOpenSkyStats")
+
+
+def start_background_services():
+    """Start optional background services such as browser pool prewarming."""
+    import logging
+    import threading
+    logger = logging.getLogger(__name__)
+
+    if os.getenv('BROWSER_POOL_PREWARM', 'false').lower() in ('true', '1', 'yes'):
+        logger.info("后台预热航班查询浏览器池...")
+        threading.Thread(target=flight_search_tools.prewarm_browser_pool,
+                         name="browser-pool-prewarm", daemon=True).start()
+
+    if os.getenv('OPENSKY_POLLER_ENABLED', 'false').lower() in ('true', '1', 'yes'):
+        logger.info("启动OpenSky后台轮询...")
+        simple_opensky_tools.start_state_poller()
 
 
 def run_server():
@@ -313,6 +419,9 @@ def run_server():
         print("All tools registered successfully")
         logger.info("所有工具注册成功")
         
+        # Start optional background services
+        start_background_services()
+        
         # Start server based on transport type
         if config['transport'] == 'stdio':
             print("Starting stdio transport...")
@@ -5,12 +5,17 @@ Flight Search Tools - 航班路线查询工具
 """
 
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Any
+from typing import Callable, Dict, List, Optional, Any
+from collections import OrderedDict
 import json
 import random
 import logging
 import time
 import re
+import os
+import atexit
+import threading
+import uuid
 
 # 初始化日志器
 logger = logging.getLogger(__name__)
@@ -33,43 +38,266 @@ except ImportError:
     get_airport_code = None
     get_city_name = None
 
+from ..utils.browser_pool import BrowserPool, BrowserPoolTimeout, pool_config_from_env
+from ..utils.page_readiness import PageReadinessEngine
+from ..utils.browser_profile import get_lean_profile, measure_transferred_bytes
+from ..core.flights import Flight, FlightSchedule, FlightPrice, SeatConfiguration
+from ..core.timetable import get_schedule_registry
+from ..utils.result_cache import CACHE_STALE, get_all_cache_stats, get_cache
+from ..utils.flight_store import SOURCE_CTRIP, get_flight_store
+from ..utils.geocode_cache import get_geocode_cache
+from ..utils.singleflight import get_all_singleflight_stats, get_singleflight
 
 
+# =================== 浏览器池 ===================
 
+_route_browser_pool: Optional[BrowserPool] = None
+_route_browser_pool_lock = threading.Lock()
 
 
+def _create_chromium_page(headless: bool = True):
+    """启动一个独立端口、应用精简抓取配置的Chromium实例"""
+    profile = get_lean_profile()
+    co = ChromiumOptions()
+    co.auto_port()
+    if headless:
+        co.headless()
+    profile.apply_to_chromium_options(co)
+    page = ChromiumPage(co)
+    profile.apply_to_drission_page(page)
+    return page
 
 
+class _ChromiumTabProvider:
+    """
+    为浏览器池提供标签页
+
+    每个Chromium实例最多同时承载 tabs_per_browser 个标签页，空位不足时才启动新浏览器；
+    浏览器累计开过一定数量的标签页后不再分配新标签页，最后一个标签页关闭时退出，
+    以便按页面数/内存回收的策略最终也能作用到浏览器进程本身。
+    """
+
+    def __init__(self, tabs_per_browser: int = 1, max_tabs_per_host: Optional[int] = None, headless: bool = True):
+        """
+        Args:
+            tabs_per_browser: 每个Chromium实例同时承载的标签页数量
+            max_tabs_per_host: 每个Chromium实例累计开过多少个标签页后退役，
+                默认为 tabs_per_browser 的3倍
+            headless: 是否以无头模式启动浏览器
+        """
+        self.tabs_per_browser = max(1, tabs_per_browser)
+        if max_tabs_per_host is None:
+            max_tabs_per_host = self.tabs_per_browser * 3
+        self.max_tabs_per_host = max(self.tabs_per_browser, max_tabs_per_host)
+        self.headless = headless
+        self._lock = threading.Lock()
+        self._hosts: List[Dict[str, Any]] = []
+        self._tab_hosts: Dict[int, Dict[str, Any]] = {}
+
+    def create(self):
+        """在有空位的浏览器中新开标签页，没有空位时启动新浏览器（启动过程不持有锁）"""
+        with self._lock:
+            host = self._find_host()
+            if host is not None:
+                return self._open_tab(host)
+
+        # 启动Chromium需要数秒，放在锁外，其他标签页的租借和关闭不必等待
+        browser = _create_chromium_page(self.headless)
+        with self._lock:
+            # 启动期间其他线程可能已腾出空位或启动了浏览器，优先使用已有的浏览器
+            host = self._find_host()
+            if host is None:
+                host = {"browser": browser, "tabs": set(), "opened": 0}
+                self._hosts.append(host)
+                browser = None
+                logger.info(f"启动新的Chromium实例，当前共 {len(self._hosts)} 个")
+            tab = self._open_tab(host)
+        if browser is not None:
+            browser.quit()
+            logger.debug("已有浏览器空出位置，退出多启动的Chromium实例")
+        return tab
+
+    def _find_host(self) -> Optional[Dict[str, Any]]:
+        """查找有空位且未退役的浏览器（调用方持有锁）"""
+        return next((h for h in self._hosts
+                     if len(h["tabs"]) < self.tabs_per_browser
+                     and h["opened"] < self.max_tabs_per_host), None)
+
+    def _open_tab(self, host: Dict[str, Any]):
+        """在指定浏览器中新开标签页并登记（调用方持有锁）"""
+        tab = host["browser"].new_tab()
+        get_lean_profile().apply_to_drission_page(tab)
+        host["tabs"].add(id(tab))
+        host["opened"] += 1
+        self._tab_hosts[id(tab)] = host
+        return tab
+
+    def close(self, tab):
+        """关闭标签页，浏览器不再承载任何标签页且已退役时退出"""
+        try:
+            tab.close()
+        finally:
+            with self._lock:
+                host = self._tab_hosts.pop(id(tab), None)
+                if host is None:
+                    return
+                host["tabs"].discard(id(tab))
+                retire = not host["tabs"] and host["opened"] >= self.max_tabs_per_host
+                if retire or (not host["tabs"] and len(self._hosts) > 1):
+                    self._hosts.remove(host)
+                else:
+                    host = None
+            if host is not None:
+                host["browser"].quit()
+                logger.info("Chromium实例已无标签页，退出浏览器")
+
+    def shutdown(self):
+        """退出所有浏览器"""
+        with self._lock:
+            hosts, self._hosts = self._hosts, []
+            self._tab_hosts.clear()
+        for host in hosts:
+            try:
+                host["browser"].quit()
+            except Exception as e:
+                logger.debug(f"退出浏览器失败: {str(e)}")
+
 
+def _chromium_is_alive(page) -> bool:
+    """健康检查：页面能正常执行脚本即视为可用"""
+    return page.run_js("return 1") == 1
+
+
+def _chromium_memory_mb(page) -> Optional[float]:
+    """读取页面JS堆内存占用（MB）"""
+    used = page.run_js("return (performance.memory && performance.memory.usedJSHeapSize) || 0")
+    return used / 1024 / 1024 if used else None
+
+
+def _chromium_reset(page):
+    """归还前跳转空白页，释放航班列表页占用的DOM和内存"""
+    page.get("about:blank")
+
+
+def get_route_browser_pool() -> BrowserPool:
+    """
+    获取进程级航班查询浏览器池（首次调用时创建，不会立即启动浏览器）
+
+    池中的每个实例是一个标签页，BROWSER_POOL_SIZE 为可同时使用的标签页数量，
+    BROWSER_POOL_TABS_PER_BROWSER 控制每个Chromium实例承载的标签页数量，
+    BROWSER_POOL_MAX_TABS_PER_BROWSER 控制每个Chromium实例累计开过多少个标签页后退役。
+
+    Returns:
+        BrowserPool实例
+    """
+    global _route_browser_pool
+    if _route_browser_pool is None:
+        with _route_browser_pool_lock:
+            if _route_browser_pool is None:
+                max_tabs = os.getenv("BROWSER_POOL_MAX_TABS_PER_BROWSER")
+                tabs = _ChromiumTabProvider(int(os.getenv("BROWSER_POOL_TABS_PER_BROWSER", "1")),
+                                            int(max_tabs) if max_tabs else None)
+                _route_browser_pool = BrowserPool(
+                    name="ctrip-chromium",
+                    factory=tabs.create,
+                    closer=tabs.close,
+                    health_check=_chromium_is_alive,
+                    memory_probe=_chromium_memory_mb,
+                    reset=_chromium_reset,
+                    **pool_config_from_env("BROWSER_POOL"),
+                )
+                atexit.register(tabs.shutdown)
+                atexit.register(_route_browser_pool.shutdown)
+    return _route_browser_pool
+
+
+def prewarm_browser_pool() -> int:
+    """
+    预先启动浏览器池中的Chromium标签页
+
+    Returns:
+        新启动的标签页数量
+    """
+    if not DRISSION_PAGE_AVAILABLE:
+        logger.warning("DrissionPage未安装，跳过浏览器池预热")
+        return 0
+    return get_route_browser_pool().prewarm()
 
 
 # =================== 航班路线查询功能 ===================
 
+# 航班卡片各字段的CSS选择器（批量提取和逐元素解析共用）
+_FLIGHT_CARD_FIELDS = {
+    'airline': '.airline-name span',
+    'plane_no': '.plane-No',
+    'depart_time': '.depart-box .time',
+    'depart_airport': '.depart-box .name',
+    'depart_terminal': '.depart-box .terminal',
+    'arrive_time': '.arrive-box .time',
+    'arrive_airport': '.arrive-box .name',
+    'arrive_terminal': '.arrive-box .terminal',
+    'price': '.price',
+}
+
+# 在页面内一次性提取航班卡片字段（从第start张卡片开始），返回JSON数组字符串
+#   arguments: 卡片选择器, {字段名: 选择器}, start
+_EXTRACT_FLIGHT_CARDS_JS = """
+const [itemSelector, fields, start] = arguments;
+const rows = [];
+Array.from(document.querySelectorAll(itemSelector)).slice(start || 0).forEach(card => {
+    const row = {};
+    for (const [key, selector] of Object.entries(fields)) {
+        const el = card.querySelector(selector);
+        row[key] = el ? el.innerText : null;
+    }
+    rows.push(row);
+});
+return JSON.stringify(rows);
+"""
+
+
+# 批量查询单次最多航线数
+MAX_BATCH_QUERIES = 20
+
+# 携程列表页加载航班数据的搜索接口
+_CTRIP_SEARCH_API_TARGET = 'search/api/search/batchSearch'
+
+
 class FlightRouteSearcher:
     """航班路线查询器"""
     
-    def __init__(self, headless=True):
+    def __init__(self, headless=True, page=None, mode: Optional[str] = None):
         """
         初始化浏览器
         
         Args:
             headless: 是否使用无头模式
+            page: 可选的已启动页面（如从浏览器池租借），传入时由调用方负责其生命周期
+            mode: 数据获取模式，xhr=拦截搜索接口响应（未捕获时回退DOM解析），dom=解析渲染后的页面；
+                  默认读取环境变量 CTRIP_SEARCH_MODE
         """
         if not DRISSION_PAGE_AVAILABLE:
             raise ImportError("DrissionPage库未安装，无法使用航班路线查询功能")
         
         self.base_url = "https://flights.ctrip.com/online/list/oneway-{}-{}?_=1&depdate={}&cabin=Y_S_C_F"
+        self.mode = (mode or os.getenv('CTRIP_SEARCH_MODE', 'xhr')).lower()
+        self.xhr_timeout = float(os.getenv('CTRIP_XHR_TIMEOUT', '15'))
+        self.xhr_batch_gap = float(os.getenv('CTRIP_XHR_BATCH_GAP', '1.5'))
         
-        if headless:
-            co = ChromiumOptions()
-            co.headless()
-            self.page = ChromiumPage(co)
-        else:
-            self.page = ChromiumPage()
+        self._owns_page = page is None
+        self.page = page if page is not None else _create_chromium_page(headless)
+        self.last_timings: Dict[str, Any] = {}
+        self.last_page_bytes: Dict[str, Any] = {}
+        
+        # 增量解析状态：已收集的航班、已解析的卡片/行程数量、新航班回调
+        self._flights: List[Dict[str, Any]] = []
+        self._parsed_count = 0
+        self._on_flights: Optional[Callable[[List[Dict[str, Any]]], None]] = None
         
         logger.info("航班路线查询器初始化完成")
     
-    def search_flights(self, departure_city: str, destination_city: str, departure_date: str) -> List[Dict[str, Any]]:
+    def search_flights(self, departure_city: str, destination_city: str, departure_date: str,
+                       on_flights: Optional[Callable[[List[Dict[str, Any]]], None]] = None) -> List[Dict[str, Any]]:
         """
         搜索航班
         
@@ -77,9 +305,10 @@ class FlightRouteSearcher:
             departure_city: 出发城市
             destination_city: 目的地城市
             departure_date: 出发日期 (YYYY-MM-DD格式)
+            on_flights: 可选回调，每解析出一批新航班即以该批航班调用，调用方可在页面加载完成前先返回首页结果
             
         Returns:
-            航班信息列表
+            完整的航班信息列表
         """
         logger.info(f"开始搜索航班：{departure_city} -> {destination_city}, 日期：{departure_date}")
         
@@ -105,165 +334,196 @@ class FlightRouteSearcher:
         logger.info(f"出发地：{get_city_name(departure_city)} ({departure_code.upper()})")
         logger.info(f"目的地：{get_city_name(destination_city)} ({destination_code.upper()})")
         
+        self.last_timings = {}
+        self.last_page_bytes = {}
+        self._flights = []
+        self._parsed_count = 0
+        self._on_flights = on_flights
+        listening = self.mode == 'xhr'
         try:
+            if listening:
+                # 在页面加载前开始监听搜索接口，避免错过首批响应
+                self.page.listen.start(_CTRIP_SEARCH_API_TARGET)
+
             # 访问页面
             self.page.get(search_url)
             logger.info("页面加载完成，等待内容渲染...")
-            # 智能滚动加载更多内容
-            self._intelligent_scroll_for_content()
-
-            # 智能等待页面加载完成
-            self._wait_for_page_ready()
-
-            # 等待关键元素出现
-            self._wait_for_flight_content()
-
-
 
+            if listening:
+                flights = self._search_via_api_responses()
+                if flights:
+                    logger.info(f"搜索完成（接口数据），找到 {len(flights)} 条航班信息")
+                    return flights
+                logger.info("未捕获到搜索接口数据，回退到DOM解析")
+                self._parsed_count = 0
 
-            # 解析航班信息
-            flights = self._parse_flights()
+            # 滚动加载的同时增量解析航班卡片，最后补充解析剩余卡片
+            self._wait_for_flight_list()
+            self._parse_new_cards()
 
-            logger.info(f"搜索完成，找到 {len(flights)} 条航班信息")
-            return flights
+            if not self._parsed_count:
+                logger.warning("未找到航班项")
+            logger.info(f"搜索完成，找到 {len(self._flights)} 条航班信息")
+            return list(self._flights)
 
         except Exception as e:
             logger.error(f"搜索航班失败: {str(e)}", exc_info=True)
-            return []
+            return list(self._flights)
+        finally:
+            if listening:
+                try:
+                    self.page.listen.stop()
+                except Exception as e:
+                    logger.debug(f"停止接口监听失败: {str(e)}")
+            self.last_page_bytes = measure_transferred_bytes(self.page.run_js)
+            logger.info(f"页面传输统计: {self.last_page_bytes}")
 
-    def _intelligent_scroll_for_content(self):
-        """智能滚动以加载更多航班内容"""
-        print("🔄 智能滚动加载航班内容...")
+    def _wait_for_flight_list(self):
+        """事件驱动地等待航班列表渲染：首批卡片就绪后立即解析，再滚动加载并解析新增卡片，直到数量不再增长"""
+        readiness = PageReadinessEngine(self.page, item_selector='.flight-item')
+        readiness.install()
+        readiness.wait_for_document_ready()
+        if readiness.wait_for_items():
+            self._parse_new_cards()
+            readiness.scroll_until_stable(on_growth=lambda count: self._parse_new_cards())
+            readiness.wait_for_network_idle()
+        else:
+            logger.warning("等待航班列表超时，尝试直接解析页面")
+        self.last_timings.update(readiness.get_timings())
+        logger.info(f"页面就绪耗时: {self.last_timings}")
 
+    def _search_via_api_responses(self) -> List[Dict[str, Any]]:
+        """
+        从监听到的搜索接口响应中构建航班列表，每收到一批响应即解析
+        
+        Returns:
+            航班信息列表；未捕获到数据时返回空列表
+        """
+        start = time.time()
+        payload_count = 0
+        packet = self.page.listen.wait(timeout=self.xhr_timeout)
+        while packet:
+            body = packet.response.body if packet.response else None
+            if isinstance(body, (str, bytes)):
+                try:
+                    body = json.loads(body)
+                except ValueError:
+                    body = None
+            if isinstance(body, dict):
+                payload_count += 1
+                itineraries = (body.get('data') or {}).get('flightItineraryList') or []
+                if itineraries:
+                    logger.info(f"接口第 {payload_count} 批返回 {len(itineraries)} 条行程")
+                    base = self._parsed_count
+                    self._parsed_count += len(itineraries)
+                    self._collect_valid_flights(
+                        self._build_flight_info_from_itinerary(itinerary, base + i + 1)
+                        for i, itinerary in enumerate(itineraries)
+                    )
+            # 搜索结果可能分多批返回，短暂等待后续批次
+            packet = self.page.listen.wait(timeout=self.xhr_batch_gap)
+        self.last_timings["xhr_capture"] = round(time.time() - start, 3)
+        logger.info(f"捕获到 {payload_count} 个搜索接口响应，耗时 {self.last_timings['xhr_capture']}s")
+        return list(self._flights)
+
+    def _build_flight_info_from_itinerary(self, itinerary: Dict[str, Any], index: int) -> Optional[Dict[str, Any]]:
+        """
+        将搜索接口返回的行程转换为与DOM解析一致的航班信息
+        
+        Args:
+            itinerary: flightItineraryList 中的单个行程
+            index: 航班序号
+            
+        Returns:
+            航班信息字典
+        """
         try:
-            # 先向下滚动几次，加载初始内容
-            scroll_distances = [500, 800, 1200]
+            legs = [flight for segment in itinerary.get('flightSegments') or []
+                    for flight in segment.get('flightList') or []]
+            if not legs:
+                return None
+            first, last = legs[0], legs[-1]
 
-            for i, distance in enumerate(scroll_distances, 1):
-                self.page.scroll(distance)
-                print(f"📜 第{i}次向下滚动 {distance}px")
-                time.sleep(1.5)  # 等待内容加载
+            flight_info = {'序号': index}
+            if first.get('marketAirlineName'):
+                flight_info['航空公司'] = first['marketAirlineName']
+            if first.get('flightNo'):
+                flight_info['航班号'] = first['flightNo']
+            if first.get('aircraftName'):
+                flight_info['机型'] = first['aircraftName']
 
-                # 检查是否有新的航班元素加载出来
-                flight_elements = self.page.eles('css:.flight-item', timeout=1)
-                print(f"   当前页面航班元素数量：{len(flight_elements)}")
+            departure_dt = first.get('departureDateTime') or ''
+            arrival_dt = last.get('arrivalDateTime') or ''
+            if departure_dt:
+                flight_info['出发时间'] = departure_dt[11:16]
+            if first.get('departureAirportName'):
+                flight_info['出发机场'] = first['departureAirportName']
+            if first.get('departureTerminal'):
+                flight_info['出发航站楼'] = first['departureTerminal']
+            if arrival_dt:
+                day_offset = 0
+                if departure_dt:
+                    day_offset = (datetime.strptime(arrival_dt[:10], '%Y-%m-%d')
+                                  - datetime.strptime(departure_dt[:10], '%Y-%m-%d')).days
+                flight_info['到达时间'] = arrival_dt[11:16] + (f" +{day_offset}天" if day_offset > 0 else "")
+            if last.get('arrivalAirportName'):
+                flight_info['到达机场'] = last['arrivalAirportName']
+            if last.get('arrivalTerminal'):
+                flight_info['到达航站楼'] = last['arrivalTerminal']
+            if len(legs) > 1:
+                flight_info['中转次数'] = len(legs) - 1
 
-            # 滚动回到顶部，确保能看到所有航班
-            print("🔝 滚动回到页面顶部")
-            self.page.scroll(-2000)  # 向上滚动回到顶部
-            time.sleep(1)
+            prices = [price.get('adultPrice') for price in itinerary.get('priceList') or []
+                      if price.get('adultPrice')]
+            if prices:
+                flight_info['价格'] = f"¥{int(min(prices))}"
 
+            return flight_info
         except Exception as e:
-            print(f"⚠️ 智能滚动过程中出错：{e}")
-    def _wait_for_flight_content(self, timeout=30):
-        """等待航班内容加载"""
-        print("⏳ 等待航班内容加载...")
-
-        # 方法1：等待航班容器出现
-        flight_container = self.page.ele('css:.body-wrapper', timeout=timeout)
-        if flight_container:
-            print("✅ 找到航班容器")
-
-            # 方法2：等待航班列表出现
-            flight_items = self.page.ele('css:.flight-item', timeout=10)
-            if flight_items:
-                print("✅ 航班列表加载完成")
-            else:
-                print("⚠️ 等待航班列表超时，尝试其他解析方法...")
+            logger.error(f"解析接口行程 {index} 失败: {str(e)}")
+            return None
 
-                # 等待可能的加载指示器消失
-                self._wait_for_loading_complete()
-        else:
-            print("❌ 航班容器未找到")
-    def _wait_for_page_ready(self, timeout=30):
-        """智能等待页面完全加载"""
-        print("⏳ 等待页面完全加载...")
-
-        # 方法1：等待 document.readyState 为 complete
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            ready_state = self.page.run_js("return document.readyState")
-            if ready_state == "complete":
-                print("✅ 页面DOM加载完成")
-                break
-            time.sleep(0.5)
-        else:
-            print("⚠️ 页面加载超时，继续执行...")
+    def _parse_new_cards(self) -> List[Dict[str, Any]]:
+        """
+        解析上次解析之后新出现的航班卡片，优先一次性批量提取，失败时回退到逐元素解析
 
-        # 方法2：等待jQuery加载完成（如果页面使用jQuery）
-        if self._wait_for_jquery_ready():
-            print("✅ jQuery加载完成")
+        Returns:
+            本次新解析出的有效航班列表
+        """
+        start = self._parsed_count
+        raw_cards = self._extract_flight_cards(start)
+        if raw_cards is None:
+            logger.info("批量提取失败，回退到逐元素解析")
+            return self._parse_flights_by_elements(start)
 
-        # 方法3：等待Ajax请求完成
-        if self._wait_for_ajax_complete():
-            print("✅ Ajax请求完成")
+        if not raw_cards:
+            return []
 
-    def _wait_for_ajax_complete(self, timeout=10):
-        """等待Ajax请求完成"""
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                # 检查是否有活跃的Ajax请求
-                ajax_complete = self.page.run_js("""
-                    if (typeof XMLHttpRequest !== 'undefined') {
-                        return XMLHttpRequest.active === 0 || XMLHttpRequest.active === undefined;
-                    }
-                    return true;
-                """)
-                if ajax_complete:
-                    return True
-            except:
-                pass
-            time.sleep(0.2)
-        return False
-
-    def _wait_for_jquery_ready(self, timeout=10):
-        """等待jQuery加载完成"""
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                jquery_active = self.page.run_js("return typeof jQuery !== 'undefined' && jQuery.active === 0")
-                if jquery_active:
-                    return True
-            except:
-                pass
-            time.sleep(0.2)
-        return False
-    def _wait_for_loading_complete(self, timeout=15):
-        """等待加载指示器消失"""
-        print("⏳ 等待加载指示器消失...")
-
-        # 常见的加载指示器选择器
-        loading_selectors = [
-            '.loading',
-            '.spinner',
-            '.loader',
-            '#loading',
-            '[data-loading]',
-            '.fa-spinner',
-            '.loading-overlay'
-        ]
-
-        for selector in loading_selectors:
-            try:
-                # 等待加载指示器消失
-                start_time = time.time()
-                while time.time() - start_time < timeout:
-                    loader = self.page.ele(f'css:{selector}', timeout=1)
-                    if not loader:
-                        break
-                    time.sleep(0.5)
-                else:
-                    continue
-                print(f"✅ 加载指示器 {selector} 已消失")
-                break
-            except:
-                continue
-
-    def _parse_flights(self) -> List[Dict[str, Any]]:
-        """解析航班信息"""
-        flights = []
+        self._parsed_count += len(raw_cards)
+        logger.info(f"批量提取到 {len(raw_cards)} 个新航班卡片（累计 {self._parsed_count} 个）")
+        return self._collect_valid_flights(
+            self._build_flight_info(raw, start + i + 1) for i, raw in enumerate(raw_cards)
+        )
 
+    def _extract_flight_cards(self, start: int = 0) -> Optional[List[Dict[str, Optional[str]]]]:
+        """
+        通过一次 run_js 调用提取航班卡片的原始字段
+
+        Args:
+            start: 起始卡片下标，此前的卡片已解析过
+
+        Returns:
+            原始字段字典列表；脚本执行失败时返回None
+        """
+        try:
+            raw = self.page.run_js(_EXTRACT_FLIGHT_CARDS_JS, '.body-wrapper .flight-item', _FLIGHT_CARD_FIELDS, start)
+            return json.loads(raw) if raw else []
+        except Exception as e:
+            logger.warning(f"批量提取航班卡片失败: {str(e)}")
+            return None
+
+    def _parse_flights_by_elements(self, start: int = 0) -> List[Dict[str, Any]]:
+        """逐元素解析航班信息（批量提取不可用时的后备路径），从第start个航班项开始"""
         try:
             # 查找航班容器
             flight_list = self.page.ele('css:.body-wrapper')
@@ -277,34 +537,35 @@ class FlightRouteSearcher:
                 logger.warning("未找到航班项")
                 return []
 
-            logger.info(f"找到 {len(flight_containers)} 个航班容器")
-
-            # 选取存在航班号的10个航班
-            valid_flights_count = 0
-            for i, container in enumerate(flight_containers):
-                if valid_flights_count >= 10:  # 已找到10个有效航班，停止搜索
-                    break
-
-                try:
-                    flight_info = self._parse_flight_container(container, i + 1)
-                    if flight_info and flight_info.get('航班号') and flight_info.get('航班号') != '未知':
-                        # 只有当航班号存在且不是'未知'时才添加
-                        flights.append(flight_info)
-                        valid_flights_count += 1
-                        logger.debug(f"成功解析航班 {valid_flights_count}: {flight_info.get('航班号')}")
-                    else:
-                        logger.debug(f"航班容器 {i+1} 无有效航班号，跳过")
-
-                except Exception as e:
-                    logger.error(f"解析航班容器 {i+1} 出错: {str(e)}")
-                    continue
-
-            logger.info(f"成功找到 {valid_flights_count} 个有航班号的航班")
-            return flights
+            new_containers = flight_containers[start:]
+            self._parsed_count = max(self._parsed_count, len(flight_containers))
+            logger.info(f"找到 {len(flight_containers)} 个航班容器，新增 {len(new_containers)} 个")
+            return self._collect_valid_flights(
+                self._parse_flight_container(container, start + i + 1)
+                for i, container in enumerate(new_containers)
+            )
             
         except Exception as e:
             logger.error(f"解析航班信息失败: {str(e)}", exc_info=True)
             return []
+
+    def _collect_valid_flights(self, parsed_flights) -> List[Dict[str, Any]]:
+        """筛选存在航班号的航班，追加到已收集结果并通知回调"""
+        flights = []
+        for flight_info in parsed_flights:
+            if flight_info and flight_info.get('航班号') and flight_info.get('航班号') != '未知':
+                # 只有当航班号存在且不是'未知'时才添加
+                flights.append(flight_info)
+                logger.debug(f"成功解析航班 {len(self._flights) + len(flights)}: {flight_info.get('航班号')}")
+            else:
+                logger.debug("航班项无有效航班号，跳过")
+
+        if flights:
+            self._flights.extend(flights)
+            if self._on_flights:
+                self._on_flights(flights)
+        logger.info(f"本批找到 {len(flights)} 个有航班号的航班，累计 {len(self._flights)} 个")
+        return flights
     
     def _parse_flight_container(self, container, index: int) -> Optional[Dict[str, Any]]:
         """
@@ -314,65 +575,74 @@ class FlightRouteSearcher:
             container: 航班容器元素
             index: 航班序号
             
+        Returns:
+            航班信息字典
+        """
+        try:
+            raw = {}
+            for field, selector in _FLIGHT_CARD_FIELDS.items():
+                element = container.ele(f'css:{selector}', timeout=1)
+                raw[field] = element.text if element else None
+            return self._build_flight_info(raw, index)
+        except Exception as e:
+            logger.error(f"解析航班容器 {index} 详细信息失败: {str(e)}")
+            return None
+
+    def _build_flight_info(self, raw: Dict[str, Optional[str]], index: int) -> Optional[Dict[str, Any]]:
+        """
+        将航班卡片的原始字段整理为航班信息
+        
+        Args:
+            raw: 原始字段字典（键见 _FLIGHT_CARD_FIELDS）
+            index: 航班序号
+            
         Returns:
             航班信息字典
         """
         flight_info = {'序号': index}
         
+        def text(field):
+            value = raw.get(field)
+            return value.strip() if value else None
+        
         try:
             # 解析航空公司
-            airline_span = container.ele('css:.airline-name span', timeout=1)
-            if airline_span:
-                flight_info['航空公司'] = airline_span.text.strip()
+            if text('airline'):
+                flight_info['航空公司'] = text('airline')
             
-            # 解析航班号
-            plane_no_span = container.ele('css:.plane-No', timeout=1)
-            if plane_no_span:
-                plane_text = plane_no_span.text.strip()
-                # 提取航班号（如MU6863）
+            # 解析航班号（如MU6863）
+            plane_text = text('plane_no')
+            if plane_text:
                 flight_match = re.search(r'([A-Z]{2}\d{3,4})', plane_text)
                 if flight_match:
                     flight_info['航班号'] = flight_match.group(1)
             
-            # 解析出发时间
-            depart_time = container.ele('css:.depart-box .time', timeout=1)
-            if depart_time:
-                flight_info['出发时间'] = depart_time.text.strip()
-            
-            # 解析出发机场
-            depart_airport = container.ele('css:.depart-box .name', timeout=1)
-            if depart_airport:
-                flight_info['出发机场'] = depart_airport.text.strip()
-            
-            # 解析出发航站楼
-            depart_terminal = container.ele('css:.depart-box .terminal', timeout=1)
-            if depart_terminal:
-                flight_info['出发航站楼'] = depart_terminal.text.strip()
+            # 解析出发时间、机场、航站楼
+            if text('depart_time'):
+                flight_info['出发时间'] = text('depart_time')
+            if text('depart_airport'):
+                flight_info['出发机场'] = text('depart_airport')
+            if text('depart_terminal'):
+                flight_info['出发航站楼'] = text('depart_terminal')
             
             # 解析到达时间
-            arrive_time = container.ele('css:.arrive-box .time', timeout=1)
-            if arrive_time:
-                arrival_text = arrive_time.text.strip()
+            arrival_text = text('arrive_time')
+            if arrival_text:
                 # 处理跨天信息
                 if '+1天' in arrival_text:
                     flight_info['到达时间'] = arrival_text.replace('+1天', ' +1天')
                 else:
                     flight_info['到达时间'] = arrival_text
             
-            # 解析到达机场
-            arrive_airport = container.ele('css:.arrive-box .name', timeout=1)
-            if arrive_airport:
-                flight_info['到达机场'] = arrive_airport.text.strip()
-            
-            # 解析到达航站楼
-            arrive_terminal = container.ele('css:.arrive-box .terminal', timeout=1)
-            if arrive_terminal:
-                flight_info['到达航站楼'] = arrive_terminal.text.strip()
+            # 解析到达机场、航站楼
+            if text('arrive_airport'):
+                flight_info['到达机场'] = text('arrive_airport')
+            if text('arrive_terminal'):
+                flight_info['到达航站楼'] = text('arrive_terminal')
             
             # 解析价格
-            price_span = container.ele('css:.price', timeout=1)
-            if price_span:
-                price_text = price_span.text.strip()
+            price_text = text('price')
+            if price_text:
                 # 处理价格格式
                 if '¥' in price_text:
                     flight_info['价格'] = price_text
@@ -394,24 +664,337 @@ class FlightRouteSearcher:
             return None
     
     def close(self):
-        """关闭浏览器"""
-        if hasattr(self, 'page'):
+        """关闭浏览器（池中租借的页面由浏览器池负责回收）"""
+        if hasattr(self, 'page') and self._owns_page:
             self.page.quit()
             logger.info("浏览器已关闭")
 
 
-def searchFlightRoutes(departure_city: str, destination_city: str, departure_date: str) -> Dict[str, Any]:
+# =================== 分页结果集 ===================
+
+# 单页航班数量
+DEFAULT_ROUTE_PAGE_SIZE = 10
+MAX_ROUTE_PAGE_SIZE = 50
+
+
+class _RouteResultSet:
+    """一次航班路线查询的完整结果集：后台解析时逐批追加，分页请求直接从中读取"""
+
+    def __init__(self, search_id: str, departure_city: str, destination_city: str, departure_date: str,
+                 cache_key: Optional[tuple] = None):
+        self.search_id = search_id
+        self.cache_key = cache_key
+        self.departure_city = departure_city
+        self.destination_city = destination_city
+        self.departure_date = departure_date
+        self.flights: List[Dict[str, Any]] = []
+        self.complete = False
+        self.error: Optional[Exception] = None
+        self.wait_timings: Dict[str, Any] = {}
+        self.page_transfer: Dict[str, Any] = {}
+        self.last_access = time.time()
+        self._cond = threading.Condition()
+
+    def extend(self, flights: List[Dict[str, Any]]):
+        """追加一批新解析的航班并唤醒等待中的分页请求"""
+        with self._cond:
+            self.flights.extend(flights)
+            self._cond.notify_all()
+
+    def finish(self, error: Optional[Exception] = None, wait_timings: Optional[Dict[str, Any]] = None,
+               page_transfer: Optional[Dict[str, Any]] = None):
+        """标记结果集加载完成（或失败）"""
+        with self._cond:
+            self.complete = True
+            self.error = error
+            self.wait_timings = wait_timings or {}
+            self.page_transfer = page_transfer or {}
+            self._cond.notify_all()
+
+    def read(self, offset: int, page_size: int, timeout: float):
+        """
+        读取一页航班，结果不足一页且仍在加载时最多等待timeout秒
+        
+        Returns:
+            (本页航班, 已加载航班快照, 是否加载完成)
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: len(self.flights) >= offset + page_size or self.complete, timeout)
+            self.last_access = time.time()
+            loaded = list(self.flights)
+            return loaded[offset:offset + page_size], loaded, self.complete
+
+    def wait(self, timeout: float) -> bool:
+        """等待结果集加载完成，返回是否已完成"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.complete, timeout)
+
+
+_route_result_sets: "OrderedDict[str, _RouteResultSet]" = OrderedDict()
+_route_result_sets_lock = threading.Lock()
+
+
+def _store_route_result_set(result_set: _RouteResultSet):
+    """保存结果集，同时淘汰过期（ROUTE_RESULT_TTL秒未访问）和超出数量上限的旧结果集"""
+    ttl = float(os.getenv('ROUTE_RESULT_TTL', '600'))
+    max_sets = int(os.getenv('ROUTE_RESULT_MAX_SETS', '50'))
+    now = time.time()
+    with _route_result_sets_lock:
+        for search_id in [key for key, item in _route_result_sets.items()
+                          if item.complete and now - item.last_access > ttl]:
+            del _route_result_sets[search_id]
+        _route_result_sets[result_set.search_id] = result_set
+        while len(_route_result_sets) > max_sets:
+            evicted_id, _ = _route_result_sets.popitem(last=False)
+            logger.debug(f"结果集数量超出上限，淘汰: {evicted_id}")
+
+
+def _get_route_result_set(search_id: str) -> Optional[_RouteResultSet]:
+    """按ID查找结果集，过期则删除并返回None"""
+    ttl = float(os.getenv('ROUTE_RESULT_TTL', '600'))
+    with _route_result_sets_lock:
+        result_set = _route_result_sets.get(search_id)
+        if result_set is None:
+            return None
+        if result_set.complete and time.time() - result_set.last_access > ttl:
+            del _route_result_sets[search_id]
+            return None
+        _route_result_sets.move_to_end(search_id)
+        return result_set
+
+
+def _load_route_result_set(result_set: _RouteResultSet):
+    """后台线程：租借浏览器页面完成整次搜索，解析出的航班逐批写入结果集"""
+    try:
+        with get_route_browser_pool().lease() as page:
+            searcher = FlightRouteSearcher(page=page)
+            try:
+                searcher.search_flights(result_set.departure_city, result_set.destination_city,
+                                        result_set.departure_date, on_flights=result_set.extend)
+                wait_timings = searcher.last_timings
+                page_transfer = searcher.last_page_bytes
+            finally:
+                searcher.close()
+        result_set.finish(wait_timings=wait_timings, page_transfer=page_transfer)
+        logger.info(f"结果集 {result_set.search_id} 加载完成，共 {len(result_set.flights)} 条航班")
+        _record_route_schedules(result_set)
+        # 只缓存成功且有航班的结果，空结果可能是页面加载异常
+        if result_set.cache_key and result_set.flights:
+            get_cache("flight_routes").set(result_set.cache_key, {
+                "flights": list(result_set.flights),
+                "wait_timings": wait_timings,
+                "page_transfer": page_transfer,
+            })
+            store = get_flight_store()
+            if store:
+                store.save_route(SOURCE_CTRIP, *result_set.cache_key, list(result_set.flights))
+    except Exception as e:
+        logger.error(f"结果集 {result_set.search_id} 加载失败: {str(e)}", exc_info=not isinstance(e, BrowserPoolTimeout))
+        result_set.finish(error=e)
+    finally:
+        if result_set.cache_key:
+            get_singleflight("flight_routes").done(result_set.cache_key, result_set)
+
+
+def _route_flight_model(flight_info: Dict[str, Any]) -> Optional[Flight]:
+    """将航班信息字典转换为Flight模型（缺少时刻或为中转航班时返回None）"""
+    if flight_info.get('中转次数') or not flight_info.get('出发时间') or not flight_info.get('到达时间'):
+        return None
+    price_match = re.search(r'(\d+(?:\.\d+)?)', str(flight_info.get('价格', '')))
+    price = float(price_match.group(1)) if price_match else 0.0
+    return Flight(
+        flight_id=str(flight_info.get('序号', '')),
+        flight_number=flight_info['航班号'],
+        airline=flight_info.get('航空公司', ''),
+        aircraft=flight_info.get('机型', ''),
+        origin=flight_info.get('出发机场', ''),
+        destination=flight_info.get('到达机场', ''),
+        schedule=FlightSchedule(departure_time=flight_info['出发时间'], arrival_time=flight_info['到达时间'],
+                                duration=''),
+        price=FlightPrice(economy=price, business=price, first=0),
+        seat_config=SeatConfiguration(),
+    )
+
+
+def _record_route_schedules(result_set: _RouteResultSet):
+    """把结果集中的直飞航班登记到时刻表，供多段行程查询复用"""
+    try:
+        flights = [model for model in map(_route_flight_model, result_set.flights) if model]
+        get_schedule_registry().record(get_airport_code(result_set.departure_city),
+                                       get_airport_code(result_set.destination_city), flights)
+    except Exception as e:
+        logger.warning(f"登记航段时刻失败: {str(e)}")
+
+
+def _route_cache_key(departure_city: str, destination_city: str, departure_date: str) -> tuple:
+    """航班路线缓存键：规范化的 (出发地代码, 目的地代码, 日期)"""
+    return (str(get_airport_code(departure_city)).lower(), str(get_airport_code(destination_city)).lower(),
+            departure_date)
+
+
+def _load_stored_route(cache_key: tuple) -> Optional[Dict[str, Any]]:
+    """从持久化存储读取未超过 FLIGHT_STORE_FARE_TTL 秒的航线结果，格式与内存缓存条目相同"""
+    store = get_flight_store()
+    if not store:
+        return None
+    stored = store.load_route(SOURCE_CTRIP, *cache_key, max_age=float(os.getenv('FLIGHT_STORE_FARE_TTL', '1800')))
+    if not stored or not stored[0]:
+        return None
+    flights, fetched_at = stored
+    return {"flights": flights, "fetched_at": datetime.fromtimestamp(fetched_at).isoformat()}
+
+
+def _refresh_route_cache(departure_city: str, destination_city: str, departure_date: str, cache_key: tuple):
+    """后台刷新缓存的加载函数：完整执行一次搜索，成功时由 _load_route_result_set 写入缓存"""
+    result_set = _RouteResultSet(uuid.uuid4().hex[:12], departure_city, destination_city, departure_date,
+                                 cache_key=cache_key)
+    _load_route_result_set(result_set)
+    if result_set.error:
+        raise result_set.error
+    return None
+
+
+def _parse_route_cursor(cursor: str):
+    """解析分页游标 "search_id:offset"，格式错误时抛出ValueError"""
+    search_id, sep, offset = str(cursor).partition(':')
+    if not search_id or not sep or not offset.isdigit():
+        raise ValueError(f"无效的分页游标: {cursor}")
+    return search_id, int(offset)
+
+
+def _build_route_page(result_set: _RouteResultSet, offset: int, page_size: int) -> Dict[str, Any]:
+    """
+    从结果集构建一页查询结果
+    
+    Args:
+        result_set: 航班结果集
+        offset: 本页起始位置
+        page_size: 本页航班数量
+        
+    Returns:
+        包含本页航班、分页游标和统计信息的字典
+    """
+    timeout = float(os.getenv('ROUTE_PAGE_WAIT_TIMEOUT', '120'))
+    flights, loaded, complete = result_set.read(offset, page_size, timeout)
+    
+    if result_set.error is not None and not loaded:
+        if isinstance(result_set.error, BrowserPoolTimeout):
+            return {
+                "status": "error",
+                "message": f"查询繁忙，请稍后重试: {str(result_set.error)}",
+                "error_code": "BROWSER_POOL_BUSY"
+            }
+        return {
+            "status": "error",
+            "message": f"查询航班路线失败: {str(result_set.error)}",
+            "error_code": "SEARCH_FAILED"
+        }
+    
+    next_offset = offset + len(flights)
+    has_more = next_offset < len(loaded) or not complete
+    departure_city = result_set.departure_city
+    destination_city = result_set.destination_city
+    departure_date = result_set.departure_date
+    
+    # 格式化结果
+    result = {
+        "status": "success",
+        "departure_city": departure_city,
+        "destination_city": destination_city,
+        "departure_date": departure_date,
+        "departure_airport": get_city_name(departure_city),
+        "destination_airport": get_city_name(destination_city),
+        "flight_count": len(flights),
+        "flights": flights,
+        "search_id": result_set.search_id,
+        "offset": offset,
+        "page_size": page_size,
+        "loaded_count": len(loaded),
+        "is_complete": complete,
+        "has_more": has_more,
+        "next_cursor": f"{result_set.search_id}:{next_offset}" if has_more else None,
+        "formatted_output": _format_route_result(flights, departure_city, destination_city, departure_date,
+                                                 offset=offset, loaded_count=len(loaded), complete=complete),
+        "wait_timings": result_set.wait_timings,
+        "page_transfer": result_set.page_transfer,
+        "query_time": datetime.now().isoformat()
+    }
+    
+    # 添加统计信息（基于已加载的全部航班）
+    if loaded:
+        prices = []
+        airlines = {}
+        
+        for flight in loaded:
+            # 提取价格
+            if '价格' in flight and flight['价格'] != '未知':
+                price_str = flight['价格'].replace('¥', '').replace('起', '')
+                if price_str.isdigit():
+                    prices.append(int(price_str))
+            
+            # 统计航空公司
+            airline = flight.get('航空公司', '未知')
+            airlines[airline] = airlines.get(airline, 0) + 1
+        
+        if prices:
+            result["price_statistics"] = {
+                "min_price": min(prices),
+                "max_price": max(prices),
+                "avg_price": sum(prices) // len(prices)
+            }
+        
+        if airlines:
+            result["airline_statistics"] = airlines
+    
+    return result
+
+
+def searchFlightRoutes(departure_city: str, destination_city: str, departure_date: str,
+                       cursor: Optional[str] = None, page_size: int = DEFAULT_ROUTE_PAGE_SIZE,
+                       wait_complete: bool = False) -> Dict[str, Any]:
     """
     根据出发地、目的地和出发日期查询航班路线
     
+    首次查询在后台加载完整结果集，首页航班解析出来即返回；携带上次返回的 next_cursor
+    再次调用可获取后续页，直接读取服务端保存的结果集，不会重新加载页面。
+    
     Args:
         departure_city: 出发城市名称或机场代码
         destination_city: 目的地城市名称或机场代码
         departure_date: 出发日期 (YYYY-MM-DD格式)
+        cursor: 分页游标（上次结果中的 next_cursor），为空时发起新查询
+        page_size: 每页航班数量
+        wait_complete: 在当前线程内完成整次搜索并返回全部航班（批量查询使用），不在后台加载
         
     Returns:
         包含航班查询结果的字典
     """
+    try:
+        page_size = max(1, min(int(page_size), MAX_ROUTE_PAGE_SIZE))
+    except (TypeError, ValueError):
+        page_size = DEFAULT_ROUTE_PAGE_SIZE
+    
+    if cursor:
+        logger.info(f"按游标读取航班路线分页: cursor={cursor}, page_size={page_size}")
+        try:
+            search_id, offset = _parse_route_cursor(cursor)
+        except ValueError as e:
+            logger.warning(str(e))
+            return {
+                "status": "error",
+                "message": str(e),
+                "error_code": "INVALID_CURSOR"
+            }
+        result_set = _get_route_result_set(search_id)
+        if result_set is None:
+            logger.warning(f"结果集不存在或已过期: {search_id}")
+            return {
+                "status": "error",
+                "message": "查询结果已过期，请重新查询",
+                "error_code": "CURSOR_EXPIRED"
+            }
+        return _build_route_page(result_set, offset, page_size)
+    
     logger.info(f"开始查询航班路线: {departure_city} -> {destination_city}, 日期: {departure_date}")
     
     try:
@@ -479,58 +1062,62 @@ def searchFlightRoutes(departure_city: str, destination_city: str, departure_dat
                 "error_code": "INVALID_DESTINATION_CITY"
             }
         
-        # 创建搜索器并搜索
-        searcher = FlightRouteSearcher(headless=True)
-        
-        try:
-            flights = searcher.search_flights(departure_city, destination_city, departure_date)
-            
-            # 格式化结果
-            result = {
-                "status": "success",
-                "departure_city": departure_city,
-                "destination_city": destination_city,
-                "departure_date": departure_date,
-                "departure_airport": get_city_name(departure_city),
-                "destination_airport": get_city_name(destination_city),
-                "flight_count": len(flights),
-                "flights": flights,
-                "formatted_output": _format_route_result(flights, departure_city, destination_city, departure_date),
-                "query_time": datetime.now().isoformat()
-            }
-            
-            # 添加统计信息
-            if flights:
-                prices = []
-                airlines = {}
-                
-                for flight in flights:
-                    # 提取价格
-                    if '价格' in flight and flight['价格'] != '未知':
-                        price_str = flight['价格'].replace('¥', '').replace('起', '')
-                        if price_str.isdigit():
-                            prices.append(int(price_str))
-                    
-                    # 统计航空公司
-                    airline = flight.get('航空公司', '未知')
-                    airlines[airline] = airlines.get(airline, 0) + 1
-                
-                if prices:
-                    result["price_statistics"] = {
-                        "min_price": min(prices),
-                        "max_price": max(prices),
-                        "avg_price": sum(prices) // len(prices)
-                    }
-                
-                if airlines:
-                    result["airline_statistics"] = airlines
-            
-            logger.info(f"航班路线查询成功: 找到 {len(flights)} 条航班")
-            return result
-            
-        finally:
-            searcher.close()
+        # 命中缓存时直接由缓存结果生成结果集；已过期但在stale窗口内时先返回旧结果，后台刷新
+        cache = get_cache("flight_routes")
+        cache_key = _route_cache_key(departure_city, destination_city, departure_date)
+        cached, cache_status = cache.get(cache_key)
+        coalesced = False
+        if cached is None:
+            # 内存未命中时读取持久化存储（重启后或其他进程抓取的结果）
+            cached = _load_stored_route(cache_key)
+            if cached is not None:
+                cache_status = "store"
+                # 存储中的结果可能已抓取一段时间，内存缓存只保留剩余的有效期
+                age = time.time() - datetime.fromisoformat(cached["fetched_at"]).timestamp()
+                cache.set(cache_key, cached, ttl=max(0.0, cache.ttl - age))
+                logger.info(f"航班路线持久化存储命中: {cache_key}，抓取于 {cached['fetched_at']}")
+        else:
+            logger.info(f"航班路线缓存{'过期' if cache_status == CACHE_STALE else ''}命中: {cache_key}")
+        if cached is not None:
+            result_set = _RouteResultSet(uuid.uuid4().hex[:12], departure_city, destination_city, departure_date,
+                                         cache_key=cache_key)
+            _store_route_result_set(result_set)
+            result_set.extend(cached["flights"])
+            result_set.finish(wait_timings=cached.get("wait_timings"), page_transfer=cached.get("page_transfer"))
+            if cache_status == CACHE_STALE:
+                cache.refresh_async(cache_key, lambda: _refresh_route_cache(
+                    departure_city, destination_city, departure_date, cache_key))
+        else:
+            def start_load():
+                new_set = _RouteResultSet(uuid.uuid4().hex[:12], departure_city, destination_city, departure_date,
+                                          cache_key=cache_key)
+                _store_route_result_set(new_set)
+                return new_set
             
+            # 相同航线和日期的查询正在加载时共享其结果集，不重复打开页面
+            result_set, coalesced = get_singleflight("flight_routes").share(cache_key, start_load)
+            if coalesced:
+                logger.info(f"合并相同的进行中查询: {cache_key}，共享结果集 {result_set.search_id}")
+            elif wait_complete:
+                # 在调用线程内完成整次搜索，调用方的并发数和耗时反映实际抓取
+                _load_route_result_set(result_set)
+            else:
+                # 后台加载完整结果集，首页航班就绪后即返回
+                threading.Thread(target=_load_route_result_set, args=(result_set,),
+                                 name=f"route-search-{result_set.search_id}", daemon=True).start()
+        
+        if wait_complete:
+            result_set.wait(float(os.getenv('ROUTE_PAGE_WAIT_TIMEOUT', '120')))
+            page_size = max(page_size, len(result_set.flights))
+        result = _build_route_page(result_set, 0, page_size)
+        if result.get("status") == "success":
+            result["cache_status"] = cache_status
+            result["coalesced"] = coalesced
+            if cached is not None and cached.get("fetched_at"):
+                result["fetched_at"] = cached["fetched_at"]
+            logger.info(f"航班路线查询成功: 返回首页 {result['flight_count']} 条航班，已加载 {result['loaded_count']} 条")
+        return result
+
     except Exception as e:
         logger.error(f"查询航班路线失败: {str(e)}", exc_info=True)
         return {
@@ -540,31 +1127,212 @@ def searchFlightRoutes(departure_city: str, destination_city: str, departure_dat
         }
 
 
-def _format_route_result(flights: List[Dict[str, Any]], departure_city: str, destination_city: str, departure_date: str) -> str:
+def _normalize_batch_query(query: Any) -> Dict[str, str]:
+    """将批量查询项统一为字典格式，支持字典或 [出发地, 目的地, 日期] 列表"""
+    if isinstance(query, dict):
+        return {
+            "departure_city": str(query.get("departure_city", "")).strip(),
+            "destination_city": str(query.get("destination_city", "")).strip(),
+            "departure_date": str(query.get("departure_date", "")).strip(),
+        }
+    if isinstance(query, (list, tuple)) and len(query) == 3:
+        return {
+            "departure_city": str(query[0]).strip(),
+            "destination_city": str(query[1]).strip(),
+            "departure_date": str(query[2]).strip(),
+        }
+    raise ValueError(f"无法识别的查询项: {query}")
+
+
+def iter_route_search_results(queries: List[Dict[str, str]], max_concurrency: int = 3):
+    """
+    并行执行多条航班路线查询，按完成顺序逐条产出结果
+    
+    Args:
+        queries: 规范化后的查询列表
+        max_concurrency: 最大并发查询数（同时受浏览器池大小限制）
+        
+    Yields:
+        (查询序号, 包含全部航班的查询结果字典, 完成整次搜索的耗时秒数)
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    
+    workers = max(1, min(max_concurrency, get_route_browser_pool().size, len(queries)))
+    
+    def _run(query):
+        start = time.time()
+        # 工作线程内完成整次搜索，max_concurrency 限制的是实际占用的浏览器页面数
+        result = searchFlightRoutes(query["departure_city"], query["destination_city"], query["departure_date"],
+                                    wait_complete=True)
+        return result, round(time.time() - start, 3)
+    
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="route-batch") as executor:
+        futures = {executor.submit(_run, query): index for index, query in enumerate(queries)}
+        for future in as_completed(futures):
+            result, elapsed = future.result()
+            yield futures[future], result, elapsed
+
+
+def searchFlightRoutesBatch(queries: List[Any], max_concurrency: int = 3) -> Dict[str, Any]:
+    """
+    批量查询多条航班路线，在浏览器池的多个标签页中并行执行
+    
+    Args:
+        queries: 查询列表，每项为 {"departure_city", "destination_city", "departure_date"} 字典
+                 或 [出发地, 目的地, 日期] 列表
+        max_concurrency: 最大并发查询数
+        
+    Returns:
+        包含每条查询完整结果的字典，results 按完成先后排列
+    """
+    logger.info(f"开始批量查询航班路线: {len(queries) if queries else 0} 条, 并发 {max_concurrency}")
+    
+    if not queries:
+        return {
+            "status": "error",
+            "message": "查询列表不能为空",
+            "error_code": "INVALID_PARAMS"
+        }
+    
+    if len(queries) > MAX_BATCH_QUERIES:
+        return {
+            "status": "error",
+            "message": f"单次最多查询 {MAX_BATCH_QUERIES} 条航线",
+            "error_code": "TOO_MANY_QUERIES"
+        }
+    
+    try:
+        normalized = [_normalize_batch_query(query) for query in queries]
+    except ValueError as e:
+        logger.warning(str(e))
+        return {
+            "status": "error",
+            "message": f"{str(e)}，每项应包含出发地、目的地和出发日期",
+            "error_code": "INVALID_PARAMS"
+        }
+    
+    if not DRISSION_PAGE_AVAILABLE:
+        logger.error("DrissionPage库未安装")
+        return {
+            "status": "error",
+            "message": "DrissionPage库未安装，无法进行航班搜索",
+            "error_code": "DRISSION_PAGE_NOT_AVAILABLE"
+        }
+    
+    start = time.time()
+    results = []
+    for index, result, elapsed in iter_route_search_results(normalized, max(1, int(max_concurrency))):
+        logger.info(f"批量查询第 {index + 1} 条完成 ({result.get('status')})，耗时 {elapsed}s")
+        results.append({
+            "index": index + 1,
+            "query": normalized[index],
+            "completed_order": len(results) + 1,
+            "elapsed_seconds": elapsed,
+            "result": result
+        })
+    
+    success_count = sum(1 for item in results if item["result"].get("status") == "success")
+    total_elapsed = round(time.time() - start, 3)
+    logger.info(f"批量查询完成: 成功 {success_count}/{len(results)}，总耗时 {total_elapsed}s")
+    
+    return {
+        "status": "success",
+        "message": f"批量查询完成，共 {len(results)} 条，成功 {success_count} 条",
+        "query_count": len(results),
+        "success_count": success_count,
+        "total_elapsed_seconds": total_elapsed,
+        "slowest_query_seconds": max(item["elapsed_seconds"] for item in results),
+        "results": results,
+        "query_time": datetime.now().isoformat()
+    }
+
+
+def getCacheStats() -> Dict[str, Any]:
+    """
+    获取查询结果缓存（航班路线、中转航段、天气等）、相同请求合并、持久化航班存储和城市地理编码缓存的统计信息
+    
+    Returns:
+        包含各缓存条目数、命中/过期命中/未命中/淘汰计数、命中率、请求合并次数、持久化存储和地理编码缓存统计的字典
+    """
+    store = get_flight_store()
+    return {
+        "status": "success",
+        "caches": get_all_cache_stats(),
+        "coalescing": get_all_singleflight_stats(),
+        "store": store.get_stats() if store else None,
+        "geocode": get_geocode_cache().get_stats(),
+        "query_time": datetime.now().isoformat()
+    }
+
+
+def getBrowserPoolStats() -> Dict[str, Any]:
+    """
+    获取航班路线查询浏览器池和中转查询驱动池的统计信息
+    
+    Returns:
+        包含实例数量、等待时间和利用率的字典
+    """
+    pools = []
+    if DRISSION_PAGE_AVAILABLE:
+        pools.append(get_route_browser_pool().get_stats())
+    
+    try:
+        from .flight_transfer_tools import get_transfer_driver_pool
+        pools.append(get_transfer_driver_pool().get_stats())
+    except ImportError:
+        logger.debug("Selenium未安装，跳过中转查询驱动池统计")
+    
+    if not pools:
+        return {
+            "status": "error",
+            "message": "DrissionPage和Selenium均未安装，浏览器池不可用",
+            "error_code": "DRISSION_PAGE_NOT_AVAILABLE"
+        }
+    
+    return {
+        "status": "success",
+        "pools": pools,
+        "query_time": datetime.now().isoformat()
+    }
+
+
+def _format_route_result(flights: List[Dict[str, Any]], departure_city: str, destination_city: str, departure_date: str,
+                         offset: int = 0, loaded_count: Optional[int] = None, complete: bool = True) -> str:
     """
     格式化航班路线查询结果
     
     Args:
-        flights: 航班列表
+        flights: 航班列表（当前页）
         departure_city: 出发城市
         destination_city: 目的地城市
         departure_date: 出发日期
+        offset: 当前页在结果集中的起始位置
+        loaded_count: 结果集中已加载的航班总数，默认等于当前页数量
+        complete: 结果集是否已加载完成
         
     Returns:
         格式化后的字符串
     """
     if not flights:
+        if offset > 0:
+            return f"📄 {departure_city} -> {destination_city} 在 {departure_date} 没有更多航班了"
         return f"😔 未找到 {departure_city} -> {destination_city} 在 {departure_date} 的航班"
     
+    if loaded_count is None:
+        loaded_count = offset + len(flights)
+    
     output = []
     output.append(f"✈️ 航班查询结果")
     output.append(f"📍 {get_city_name(departure_city)} -> {get_city_name(destination_city)}")
     output.append(f"📅 {departure_date}")
-    output.append(f"🔢 共找到 {len(flights)} 条航班")
+    if complete:
+        output.append(f"🔢 共找到 {loaded_count} 条航班，当前显示第 {offset + 1}-{offset + len(flights)} 条")
+    else:
+        output.append(f"🔢 已加载 {loaded_count} 条航班（仍在加载），当前显示第 {offset + 1}-{offset + len(flights)} 条")
     output.append("")
     
     # 显示航班列表
-    for i, flight in enumerate(flights, 1):
+    for i, flight in enumerate(flights, offset + 1):
         output.append(f"【{i}】{flight.get('航空公司', '未知')} {flight.get('航班号', '未知')}")
         output.append(f"    🛫 {flight.get('出发时间', '未知')} {flight.get('出发机场', '未知')} {flight.get('出发航站楼', '')}")
         output.append(f"    🛬 {flight.get('到达时间', '未知')} {flight.get('到达机场', '未知')} {flight.get('到达航站楼', '')}")
@@ -1,25 +1,146 @@
 """
 Flight Transfer Tools - 航班中转查询工具
 
-提供根据始发地、中转地、目的地查询飞机中转方案。
+提供根据始发地、中转地、目的地查询飞机中转方案、自动选择中转枢纽的多枢纽中转查询，
+以及基于已抓取航段时刻表的多段行程查询。
 """
 
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from concurrent.futures import Future, ThreadPoolExecutor
+import heapq
 import logging
+import os
+import re
+import time
+import atexit
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from selenium import webdriver
 from selenium.webdriver import Keys
 from selenium.webdriver.common.by import By
-import time
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
 
 from ..core.flights import FlightSchedule, FlightPrice, Flight, SeatConfiguration, FlightTransfer
+from ..core.connections import format_clock_minutes, iter_connections, parse_clock_minutes
+from ..core.timetable import Journey, get_schedule_registry
+from ..core.ranking import TIE_BREAKERS, ParetoFront, pareto_connections
+from ..utils.browser_profile import get_lean_profile, measure_transferred_bytes
+from ..utils.browser_pool import BrowserPool, pool_config_from_env
+from ..utils.airport_index import AirportIndex, get_airport_index, great_circle_km
+from ..utils.route_page_parser import parse_route_blocks
+from ..utils.result_cache import get_cache
+from ..utils.singleflight import get_singleflight
+from ..utils.flight_store import SCHEDULE_DATE, SOURCE_CHAHANGXIAN, get_flight_store
 
 # 初始化日志器
 logger = logging.getLogger(__name__)
 
+_transfer_driver_pool: Optional[BrowserPool] = None
+_transfer_driver_pool_lock = threading.Lock()
+
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+_ROUTE_PAGE_URL = "https://www.chahangxian.com/{}-{}/"
+
+
+def _create_driver():
+    """启动应用精简抓取配置的无头Chrome"""
+    profile = get_lean_profile()
+    options = webdriver.ChromeOptions()
+    options.add_argument('--headless')  # 无头模式，不打开浏览器窗口
+    profile.apply_to_selenium_options(options)
+    driver = webdriver.Chrome(options=options)
+    profile.apply_to_selenium_driver(driver)
+    return driver
+
+
+def _driver_is_alive(driver) -> bool:
+    """健康检查：驱动能正常执行脚本即视为可用"""
+    return driver.execute_script("return 1") == 1
+
+
+def _driver_memory_mb(driver) -> Optional[float]:
+    """读取当前页面JS堆内存占用（MB）"""
+    used = driver.execute_script("return (performance.memory && performance.memory.usedJSHeapSize) || 0")
+    return used / 1024 / 1024 if used else None
+
+
+def _driver_reset(driver):
+    """归还前跳转空白页，释放上一次查询的页面"""
+    driver.get("about:blank")
+
+
+def get_transfer_driver_pool() -> BrowserPool:
+    """
+    获取进程级中转查询Selenium驱动池（首次调用时创建，不会立即启动浏览器）
+
+    默认大小为3，使三个城市的三字码查询可以同时进行；通过 DRIVER_POOL_* 环境变量配置。
+
+    Returns:
+        BrowserPool实例
+    """
+    global _transfer_driver_pool
+    if _transfer_driver_pool is None:
+        with _transfer_driver_pool_lock:
+            if _transfer_driver_pool is None:
+                _transfer_driver_pool = BrowserPool(
+                    name="chahangxian-selenium",
+                    factory=_create_driver,
+                    closer=lambda driver: driver.quit(),
+                    health_check=_driver_is_alive,
+                    memory_probe=_driver_memory_mb,
+                    reset=_driver_reset,
+                    **pool_config_from_env("DRIVER_POOL", size=3),
+                )
+                atexit.register(_transfer_driver_pool.shutdown)
+    return _transfer_driver_pool
+
+
+def _get_http_session() -> requests.Session:
+    """获取进程共享的HTTP会话（连接池复用，失败自动重试）"""
+    global _http_session
+    if _http_session is None:
+        with _http_session_lock:
+            if _http_session is None:
+                pool_size = int(os.getenv('TRANSFER_HTTP_POOL_SIZE', '10'))
+                retry = Retry(total=2, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504],
+                              allowed_methods=["GET"])
+                adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=retry)
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({
+                    "User-Agent": ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                                   "(KHTML, like Gecko) Chrome/124.0 Safari/537.36"),
+                    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                    "Accept-Language": "zh-CN,zh;q=0.9",
+                })
+                _http_session = session
+    return _http_session
 
-def getTransferFlightsByThreePlace(from_place: str, transfer_place: str, to_place: str,departure_date: str, min_transfer_time: float = 2.0,
-                                max_transfer_time: float = 5.0) -> List[FlightTransfer]:
+
+def _page_timeout() -> float:
+    """页面元素等待超时（秒）"""
+    return float(os.getenv('TRANSFER_PAGE_TIMEOUT', '10'))
+
+
+def _log_page_transfer(driver, label: str):
+    """记录当前页面的传输字节数"""
+    stats = measure_transferred_bytes(driver.execute_script)
+    if stats:
+        logger.info(f"{label} 页面传输 {stats.get('transfer_bytes', 0)} 字节, 资源 {stats.get('resource_count', 0)} 个")
+
+
+def getTransferFlightsByThreePlace(from_place: str, transfer_place: str, to_place: str, departure_date: Optional[str] = None,
+                                   min_transfer_time: float = 2.0, max_transfer_time: float = 5.0,
+                                   pareto_only: bool = True, tie_breaker: str = "price") -> List[FlightTransfer]:
     """
    查询从出发地通过中转地到目的地的联程航班信息。
 
@@ -27,54 +148,66 @@ def getTransferFlightsByThreePlace(from_place: str, transfer_place: str, to_plac
         from_place (str): 出发地城市或机场
         transfer_place (str): 中转地城市或机场
         to_place (str): 目的地城市或机场
+        departure_date (str): 出发日期（YYYY-MM-DD），默认今天
         min_transfer_time (float): 最小中转时间（单位：小时），默认 2 小时
         max_transfer_time (float): 最大中转时间（单位：小时），默认 5 小时
+        pareto_only (bool): 只返回价格/全程时长/航段数帕累托最优的方案，默认 True
+        tie_breaker (str): 方案排序方式，"price"、"duration" 或 "legs"，默认 "price"
 
     Returns:
         List[str]: 符合条件的航班列表，每个航班用字典表示。
     """
     logger.info(f"开始查询中转航班...")
+    departure_date = departure_date or datetime.now().strftime('%Y-%m-%d')
+    if tie_breaker not in TIE_BREAKERS:
+        logger.warning(f"不支持的排序方式 {tie_breaker}，改用 price")
+        tie_breaker = "price"
     logger.info(f"始发地: {from_place}，中转地：{transfer_place}， 目的地: {to_place}")
 
     try:
-        # 获取所有城市的三字码
-        from_code = _get_location_codev2(from_place)
-        transfer_code = _get_location_codev2(transfer_place)
-        to_code = _get_location_codev2(to_place)
+        with ThreadPoolExecutor(max_workers=3, thread_name_prefix="transfer-search") as executor:
+            # 获取所有城市的三字码（离线索引未收录时并行在线查询）
+            from_code, transfer_code, to_code = executor.map(
+                _resolve_location_code, [from_place, transfer_place, to_place])
 
-        logger.info(f"三字码查询成功！始发地: {from_code}，中转地{transfer_code}， 目的地: {to_code}")
+            logger.info(f"三字码查询成功！始发地: {from_code}，中转地{transfer_code}， 目的地: {to_code}")
 
-        # 获取两段行程列表
-        first_trips = _get_direct_airline(from_code, transfer_code)
-        after_trips = _get_direct_airline(transfer_code, to_code)
+            # 并行获取两段行程列表
+            first_future = executor.submit(_get_direct_airline, from_code, transfer_code)
+            after_future = executor.submit(_get_direct_airline, transfer_code, to_code)
+            first_trips = first_future.result() or []
+            after_trips = after_future.result() or []
         logger.info(f"行程分段查询成功！ {from_place} - {transfer_place} {len(first_trips)}")
         logger.info(f"{transfer_place} - {to_place} {len(after_trips)}")
 
-        # 计算换乘路线
+        # 两程时刻之差包含出发地与目的地的时差，扣除后才是实际经过的时间
+        clock_shift = _clock_shift_minutes(from_code, to_code, departure_date) or 0
+
+        # 计算换乘路线：第二程按起飞时间排序，二分查找中转时间窗口
+        if pareto_only:
+            front = pareto_connections(first_trips, after_trips, min_transfer_time, max_transfer_time)
+            combinations = [(item.payload[:3], item.price, item.duration - clock_shift)
+                            for item in front.ranked(tie_breaker)]
+            logger.info(f"帕累托排序: 保留 {len(combinations)} 条非支配方案，剔除 {front.pruned} 条被支配组合")
+        else:
+            combinations = [((first.flight, second.flight, transfer_minutes),
+                             first.flight.price.economy + second.flight.price.economy,
+                             second.arrival - first.departure - clock_shift)
+                            for first, second, transfer_minutes
+                            in iter_connections(first_trips, after_trips, min_transfer_time, max_transfer_time)]
+
         select_trips = []
-        index=1
-        for trip1 in first_trips:
-            arrival_time = trip1.schedule.arrival_time
-            arrival_time = datetime.strptime(arrival_time, "%H:%M").time()
-            arrival_time = datetime.combine(datetime.today(), arrival_time)
-            for trip2 in after_trips:
-                departure_time = trip2.schedule.departure_time
-                departure_time = datetime.strptime(departure_time, "%H:%M").time()
-                departure_time = datetime.combine(datetime.today(), departure_time)
-                if (departure_time - arrival_time > timedelta(hours=min_transfer_time)
-                        and departure_time - arrival_time < timedelta(hours=max_transfer_time)):
-                    # 符合换乘时间要求，添加到结果列表
-                    logger.info(f"符合换乘时间要求: {trip1.flight_number} {arrival_time} - {trip2.flight_number} {departure_time}")
-                    transfer=FlightTransfer(
-                        transfer_id=f"{index}",
-                        first_flight=trip1,
-                        second_flight=trip2,
-                        departure_date=departure_date,
-                        transfer_time=round((departure_time - arrival_time).total_seconds() / 3600,3)
-                    )
-                    index += 1
-                    logger.info(f"添加中转航班: {transfer.first_flight.flight_number} -> {transfer.second_flight.flight_number}, 中转时间: {transfer.transfer_time}小时")
-                    select_trips.append(transfer)
+        for index, ((trip1, trip2, transfer_minutes), total_price, total_minutes) in enumerate(combinations, 1):
+            select_trips.append(FlightTransfer(
+                transfer_id=f"{index}",
+                first_flight=trip1,
+                second_flight=trip2,
+                departure_date=departure_date,
+                transfer_time=round(transfer_minutes / 60, 3),
+                transfer_place=transfer_place,
+                total_duration=round(total_minutes / 60, 3),
+                total_price=total_price
+            ))
 
         logger.info(f"查询到 {len(select_trips)} 条中转航班信息")
         return select_trips
@@ -82,6 +215,452 @@ def getTransferFlightsByThreePlace(from_place: str, transfer_place: str, to_plac
         logger.warning(f"查询中转航班信息失败：{from_place}-{transfer_place}-{to_place}, 错误: {str(e)}", exc_info=True)
 
 
+def _resolve_location_code(place: str) -> Optional[str]:
+    """
+    解析城市三字码：优先查离线机场索引，未收录时才在线查询，并把结果持久化供下次使用
+
+    Args:
+        place (str): 城市名称、别名、拼音或机场代码
+
+    Returns:
+        Optional[str]: 小写三字码；无法解析时返回 None
+    """
+    index = get_airport_index()
+    code = index.resolve_code(place)
+    if code:
+        logger.debug(f"离线索引命中三字码: {place} -> {code}")
+        return code
+
+    logger.info(f"离线索引未收录 {place}，在线查询三字码")
+    code = _get_location_codev2(place)
+    if code:
+        index.remember(place, code)
+    return code
+
+
+# 估算全程时长下限时使用的巡航速度（公里/小时），取偏高值保证下限不超过实际飞行时间
+_CRUISE_SPEED_KMH = 950.0
+
+# 与出发地/目的地距离小于该值的枢纽视为同一城市群，不作为中转地
+_SAME_METRO_KM = 100.0
+
+ITINERARY_SORT_KEYS = ("duration", "price")
+
+# 时刻表查询允许的最多航段数
+MAX_TIMETABLE_LEGS = 5
+
+
+def _clock_shift_minutes(from_code: str, to_code: str, departure_date: str) -> Optional[int]:
+    """
+    目的地与出发地当地时间的差值（分钟）
+
+    航班时刻都是当地时间，两程时刻之差减去该值才是实际经过的时间（向西飞行时为负值）。
+
+    Args:
+        from_code: 出发地三字码
+        to_code: 目的地三字码
+        departure_date: 出发日期（YYYY-MM-DD），用于确定夏令时
+
+    Returns:
+        分钟数；任一方缺少时区数据时返回None
+    """
+    index = get_airport_index()
+    zones = [index.timezone(from_code), index.timezone(to_code)]
+    if not all(zones):
+        return None
+    try:
+        noon = datetime.strptime(departure_date, '%Y-%m-%d').replace(hour=12)
+        origin, destination = (noon.replace(tzinfo=ZoneInfo(zone)).utcoffset() for zone in zones)
+    except (ValueError, ZoneInfoNotFoundError) as e:
+        logger.debug(f"无法计算 {from_code}-{to_code} 的时差: {str(e)}")
+        return None
+    return int((destination - origin).total_seconds() // 60)
+
+
+def _candidate_hubs(from_code: str, to_code: str, max_hubs: int) -> List[Tuple[Optional[float], str]]:
+    """
+    从离线枢纽列表中挑选候选中转地
+
+    有坐标时按经枢纽的大圆绕行距离升序排列，并剔除绕行比例超过 TRANSFER_HUB_MAX_DETOUR 的枢纽；
+    出发地或目的地缺少坐标时按参考数据中的顺序排在后面。
+
+    Args:
+        from_code: 出发地三字码
+        to_code: 目的地三字码
+        max_hubs: 最多返回的枢纽数量
+
+    Returns:
+        (经枢纽的大圆距离公里数或None, 枢纽三字码) 列表
+    """
+    index = get_airport_index()
+    origin = index.coordinates(from_code)
+    destination = index.coordinates(to_code)
+    max_detour = float(os.getenv('TRANSFER_HUB_MAX_DETOUR', '1.6'))
+    direct_km = great_circle_km(*origin, *destination) if origin and destination else None
+
+    ranked, unranked = [], []
+    for city in index.hub_cities():
+        code = city['city_code'].lower()
+        if code in (from_code, to_code):
+            continue
+        hub = index.coordinates(code)
+        if direct_km is None or hub is None:
+            unranked.append((None, code))
+            continue
+        first_km = great_circle_km(*origin, *hub)
+        second_km = great_circle_km(*hub, *destination)
+        if first_km < _SAME_METRO_KM or second_km < _SAME_METRO_KM:
+            continue
+        if direct_km > 0 and first_km + second_km > direct_km * max_detour:
+            continue
+        ranked.append((first_km + second_km, code))
+
+    ranked.sort()
+    return (ranked + unranked)[:max_hubs]
+
+
+def searchTransferItineraries(from_place: str, to_place: str, departure_date: Optional[str] = None,
+                              top_k: int = 5, sort_by: str = "duration", max_hubs: Optional[int] = None,
+                              min_transfer_time: float = 2.0, max_transfer_time: float = 5.0,
+                              pareto_only: bool = False) -> Dict[str, Any]:
+    """
+    自动选择中转地，查询从出发地到目的地的最优中转方案
+
+    从枢纽参考数据中按绕行距离挑选候选中转地，并行抓取所有 出发地->枢纽、枢纽->目的地 航段
+    （相同航段只抓取一次），逐个枢纽匹配衔接航班并保留前 top_k 条方案。按时长排序时，
+    枢纽按大圆距离估算的全程时长下限升序处理，一旦已有 top_k 条方案都不慢于下一个枢纽的下限，
+    即取消剩余航段抓取并提前返回（全程时长按出发地和目的地的时差换算为实际经过时间，
+    缺少时区数据时不提前结束）。pareto_only 为 True 时所有枢纽共用一个帕累托前沿，
+    只在价格/全程时长都非支配的方案中取前 top_k 条（不提前结束）。
+
+    Args:
+        from_place (str): 出发地城市或机场
+        to_place (str): 目的地城市或机场
+        departure_date (str): 出发日期（YYYY-MM-DD），默认今天
+        top_k (int): 返回的方案数量，默认 5
+        sort_by (str): 排序方式，"duration"（全程时长）或 "price"（两程价格合计）
+        max_hubs (int): 最多尝试的中转枢纽数量，默认读取 TRANSFER_MAX_HUBS（8）
+        min_transfer_time (float): 最小中转时间（单位：小时），默认 2 小时
+        max_transfer_time (float): 最大中转时间（单位：小时），默认 5 小时
+        pareto_only (bool): 只返回帕累托最优的方案，默认 False
+
+    Returns:
+        Dict[str, Any]: 包含排序后的中转方案、候选枢纽和实际查询枢纽的结果字典
+    """
+    logger.info(f"开始自动中转查询: {from_place} -> {to_place}, 排序: {sort_by}, top_k: {top_k}")
+    departure_date = departure_date or datetime.now().strftime('%Y-%m-%d')
+
+    if not from_place or not to_place:
+        return {
+            "status": "error",
+            "message": "出发地和目的地都不能为空",
+            "error_code": "INVALID_PARAMS"
+        }
+    if sort_by not in ITINERARY_SORT_KEYS:
+        return {
+            "status": "error",
+            "message": f"不支持的排序方式: {sort_by}，可选: {', '.join(ITINERARY_SORT_KEYS)}",
+            "error_code": "INVALID_PARAMS"
+        }
+    try:
+        top_k = int(top_k)
+        max_hubs = int(max_hubs or os.getenv('TRANSFER_MAX_HUBS', '8'))
+    except (TypeError, ValueError):
+        top_k = max_hubs = 0
+    if top_k <= 0 or max_hubs <= 0:
+        return {
+            "status": "error",
+            "message": "top_k 和 max_hubs 必须是正整数",
+            "error_code": "INVALID_PARAMS"
+        }
+
+    concurrency = int(os.getenv('TRANSFER_LEG_CONCURRENCY', '6'))
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="hub-search")
+    try:
+        from_code, to_code = executor.map(_resolve_location_code, [from_place, to_place])
+        if not from_code or not to_code:
+            return {
+                "status": "error",
+                "message": f"无法解析城市三字码: {from_place if not from_code else to_place}",
+                "error_code": "INVALID_LOCATION"
+            }
+
+        hubs = _candidate_hubs(from_code, to_code, max_hubs)
+        # 两程时刻之差包含出发地与目的地的时差，需扣除后才能与按实际时间估算的下限比较
+        clock_shift = _clock_shift_minutes(from_code, to_code, departure_date)
+        if clock_shift is None:
+            logger.info(f"缺少 {from_code}/{to_code} 的时区数据，全程时长按当地时刻计算，不提前结束")
+        logger.info(f"候选中转枢纽: {[code for _, code in hubs]}")
+
+        # 按枢纽处理顺序提交航段抓取，相同航段只提交一次，供多个枢纽共享
+        leg_futures: Dict[Tuple[str, str], Future] = {}
+        for _, hub in hubs:
+            for leg in ((from_code, hub), (hub, to_code)):
+                if leg not in leg_futures:
+                    leg_futures[leg] = executor.submit(_get_direct_airline, *leg)
+
+        # 最大堆（取负值）保存当前最优的 top_k 条方案，堆顶为其中最差的一条
+        best: List[tuple] = []
+        front = ParetoFront()
+        sequence = 0
+        searched_hubs = []
+        early_stopped = False
+        for via_km, hub in hubs:
+            if (not pareto_only and sort_by == "duration" and len(best) >= top_k and via_km is not None
+                    and clock_shift is not None):
+                lower_bound = via_km / _CRUISE_SPEED_KMH * 60 + min_transfer_time * 60
+                if -best[0][0] <= lower_bound:
+                    logger.info(f"已有 {top_k} 条方案不慢于剩余枢纽的时长下限，提前结束（跳过 {hub} 起的枢纽）")
+                    early_stopped = True
+                    break
+
+            try:
+                first_trips = leg_futures[(from_code, hub)].result() or []
+                after_trips = leg_futures[(hub, to_code)].result() or []
+            except Exception as e:
+                logger.warning(f"查询经 {hub} 的航段失败: {str(e)}")
+                continue
+            searched_hubs.append(hub)
+
+            if pareto_only:
+                pareto_connections(first_trips, after_trips, min_transfer_time, max_transfer_time,
+                                   front=front, context=hub)
+                continue
+            for first, second, transfer_minutes in iter_connections(
+                    first_trips, after_trips, min_transfer_time, max_transfer_time):
+                total_minutes = second.arrival - first.departure - (clock_shift or 0)
+                total_price = first.flight.price.economy + second.flight.price.economy
+                key = (total_minutes, total_price) if sort_by == "duration" else (total_price, total_minutes)
+                sequence += 1
+                entry = (-key[0], -key[1], -sequence,
+                         (hub, first.flight, second.flight, transfer_minutes, total_minutes, total_price))
+                if len(best) < top_k:
+                    heapq.heappush(best, entry)
+                elif entry > best[0]:
+                    heapq.heapreplace(best, entry)
+    except Exception as e:
+        logger.warning(f"自动中转查询失败：{from_place}-{to_place}, 错误: {str(e)}", exc_info=True)
+        return {
+            "status": "error",
+            "message": f"自动中转查询失败: {str(e)}",
+            "error_code": "SEARCH_FAILED"
+        }
+    finally:
+        # 提前结束时取消尚未开始的航段抓取
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if pareto_only:
+        ranked = [(item.payload[3],) + item.payload[:3] + (item.duration - (clock_shift or 0), item.price)
+                  for item in front.ranked(sort_by)[:top_k]]
+        logger.info(f"帕累托前沿 {len(front)} 条方案，剔除 {front.pruned} 条被支配组合")
+    else:
+        ranked = [entry[3] for entry in sorted(best, reverse=True)]
+
+    index = get_airport_index()
+    itineraries = []
+    for position, (hub, trip1, trip2, transfer_minutes, total_minutes, total_price) in enumerate(ranked, 1):
+        itineraries.append(FlightTransfer(
+            transfer_id=f"{position}",
+            first_flight=trip1,
+            second_flight=trip2,
+            departure_date=departure_date,
+            transfer_time=round(transfer_minutes / 60, 3),
+            transfer_place=index.display_name(hub) or hub.upper(),
+            total_duration=round(total_minutes / 60, 3),
+            total_price=total_price,
+        ).model_dump())
+
+    logger.info(f"自动中转查询完成: 查询 {len(searched_hubs)}/{len(hubs)} 个枢纽，返回 {len(itineraries)} 条方案")
+    return {
+        "status": "success",
+        "from_code": from_code,
+        "to_code": to_code,
+        "departure_date": departure_date,
+        "sort_by": sort_by,
+        "itinerary_count": len(itineraries),
+        "itineraries": itineraries,
+        "candidate_hubs": [hub.upper() for _, hub in hubs],
+        "searched_hubs": [hub.upper() for hub in searched_hubs],
+        "early_stopped": early_stopped,
+        "pareto_front_size": len(front) if pareto_only else None,
+        "message": f"找到 {len(itineraries)} 条中转方案" if itineraries else "未找到符合中转时间要求的方案",
+        "query_time": datetime.now().isoformat()
+    }
+
+
+def _journey_to_dict(journey: Journey, index: AirportIndex, clock_shift: int = 0) -> Dict[str, Any]:
+    """
+    将时刻表行程转换为工具返回的字典
+
+    Args:
+        journey: 时刻表行程（时刻为各站当地时间）
+        index: 机场索引，用于显示站名
+        clock_shift: 目的地与出发地当地时间的差值（分钟），从全程时长中扣除
+
+    Returns:
+        行程字典，total_duration 为实际经过的小时数
+    """
+    return {
+        "departure_time": format_clock_minutes(journey.departure),
+        "arrival_time": format_clock_minutes(journey.arrival),
+        "total_duration": round((journey.arrival - journey.departure - clock_shift) / 60, 3),
+        "leg_count": len(journey.legs),
+        "route": [index.display_name(journey.legs[0].origin) or journey.legs[0].origin.upper()] +
+                 [index.display_name(leg.destination) or leg.destination.upper() for leg in journey.legs],
+        "legs": [{
+            "origin": leg.origin.upper(),
+            "destination": leg.destination.upper(),
+            "departure_time": format_clock_minutes(leg.departure),
+            "arrival_time": format_clock_minutes(leg.arrival),
+            "flight": leg.flight.model_dump(),
+        } for leg in journey.legs],
+    }
+
+
+def _prepare_timetable_query(from_place: str, to_place: str, max_legs: int, min_transfer_time: float):
+    """
+    解析时刻表查询的公共参数
+
+    Returns:
+        (出发站代码, 到达站代码, 时刻表, 最短中转分钟数, 错误字典)；参数有误时前四项为None
+    """
+    if not from_place or not to_place:
+        return None, None, None, None, {
+            "status": "error",
+            "message": "出发地和目的地都不能为空",
+            "error_code": "INVALID_PARAMS"
+        }
+    if not isinstance(max_legs, int) or not 1 <= max_legs <= MAX_TIMETABLE_LEGS or min_transfer_time < 0:
+        return None, None, None, None, {
+            "status": "error",
+            "message": f"max_legs 必须在 1-{MAX_TIMETABLE_LEGS} 之间，min_transfer_time 不能为负数",
+            "error_code": "INVALID_PARAMS"
+        }
+
+    from_code, to_code = _resolve_location_code(from_place), _resolve_location_code(to_place)
+    if not from_code or not to_code:
+        return None, None, None, None, {
+            "status": "error",
+            "message": f"无法解析城市三字码: {from_place if not from_code else to_place}",
+            "error_code": "INVALID_LOCATION"
+        }
+
+    timetable = get_schedule_registry().timetable()
+    stations = set(timetable.stations)
+    if from_code not in stations or to_code not in stations:
+        return None, None, None, None, {
+            "status": "error",
+            "message": "时刻表中没有该出发地或目的地的航段，请先通过航班路线或中转查询抓取相关航段",
+            "error_code": "NO_SCHEDULE_DATA",
+            "timetable": timetable.get_stats()
+        }
+    return from_code, to_code, timetable, int(round(min_transfer_time * 60)), None
+
+
+def searchEarliestArrival(from_place: str, to_place: str, earliest_departure: str = "00:00",
+                          max_legs: int = 3, min_transfer_time: float = 1.0) -> Dict[str, Any]:
+    """
+    在已抓取的航段时刻表上查询最早到达的多段行程（连接扫描算法）
+
+    只使用此前航班路线查询、中转查询登记到时刻表中的航段，不会发起新的抓取。
+
+    Args:
+        from_place (str): 出发地城市或机场
+        to_place (str): 目的地城市或机场
+        earliest_departure (str): 最早出发时刻（HH:MM），默认 "00:00"
+        max_legs (int): 最多航段数，默认 3
+        min_transfer_time (float): 最短中转时间（单位：小时），默认 1 小时
+
+    Returns:
+        Dict[str, Any]: 按航段数列出的帕累托行程（航段更多的行程到达更早）
+    """
+    logger.info(f"开始最早到达查询: {from_place} -> {to_place}, 最早出发 {earliest_departure}, 最多 {max_legs} 段")
+    departure_after = parse_clock_minutes(earliest_departure or "00:00")
+    if departure_after is None:
+        return {
+            "status": "error",
+            "message": "出发时刻格式不正确，请使用HH:MM格式",
+            "error_code": "INVALID_TIME_FORMAT"
+        }
+
+    from_code, to_code, timetable, transfer_minutes, error = _prepare_timetable_query(
+        from_place, to_place, max_legs, min_transfer_time)
+    if error:
+        return error
+
+    started = time.perf_counter()
+    journeys = timetable.earliest_arrival(from_code, to_code, departure_after, max_legs, transfer_minutes)
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    index = get_airport_index()
+    # 时刻表不区分日期，按今天的时差换算全程时长
+    clock_shift = _clock_shift_minutes(from_code, to_code, datetime.now().strftime('%Y-%m-%d')) or 0
+    logger.info(f"最早到达查询完成: {len(journeys)} 条行程，扫描耗时 {elapsed_ms}ms")
+    return {
+        "status": "success",
+        "from_code": from_code,
+        "to_code": to_code,
+        "journey_count": len(journeys),
+        "journeys": [_journey_to_dict(journey, index, clock_shift) for journey in journeys],
+        "timetable": timetable.get_stats(),
+        "scan_ms": elapsed_ms,
+        "message": f"找到 {len(journeys)} 条行程" if journeys else "时刻表中没有可达的行程",
+        "query_time": datetime.now().isoformat()
+    }
+
+
+def getDepartureProfile(from_place: str, to_place: str, departure_after: str = "00:00",
+                        departure_before: str = "23:59", max_legs: int = 3,
+                        min_transfer_time: float = 1.0) -> Dict[str, Any]:
+    """
+    在已抓取的航段时刻表上查询出发时刻剖面：给出时段内每个出发时刻的最早到达行程
+
+    Args:
+        from_place (str): 出发地城市或机场
+        to_place (str): 目的地城市或机场
+        departure_after (str): 时段开始（HH:MM），默认 "00:00"
+        departure_before (str): 时段结束（HH:MM，含），默认 "23:59"
+        max_legs (int): 最多航段数，默认 3
+        min_transfer_time (float): 最短中转时间（单位：小时），默认 1 小时
+
+    Returns:
+        Dict[str, Any]: 按出发时间升序的非支配行程（不存在出发更晚且到达更早的行程）
+    """
+    logger.info(f"开始出发时刻剖面查询: {from_place} -> {to_place}, 时段 {departure_after}-{departure_before}")
+    window_start = parse_clock_minutes(departure_after or "00:00")
+    window_end = parse_clock_minutes(departure_before or "23:59")
+    if window_start is None or window_end is None:
+        return {
+            "status": "error",
+            "message": "出发时刻格式不正确，请使用HH:MM格式",
+            "error_code": "INVALID_TIME_FORMAT"
+        }
+
+    from_code, to_code, timetable, transfer_minutes, error = _prepare_timetable_query(
+        from_place, to_place, max_legs, min_transfer_time)
+    if error:
+        return error
+
+    started = time.perf_counter()
+    journeys = timetable.profile(from_code, to_code, window_start, window_end + 1, max_legs, transfer_minutes)
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+
+    index = get_airport_index()
+    clock_shift = _clock_shift_minutes(from_code, to_code, datetime.now().strftime('%Y-%m-%d')) or 0
+    logger.info(f"出发时刻剖面查询完成: {len(journeys)} 条行程，扫描耗时 {elapsed_ms}ms")
+    return {
+        "status": "success",
+        "from_code": from_code,
+        "to_code": to_code,
+        "journey_count": len(journeys),
+        "journeys": [_journey_to_dict(journey, index, clock_shift) for journey in journeys],
+        "timetable": timetable.get_stats(),
+        "scan_ms": elapsed_ms,
+        "message": f"找到 {len(journeys)} 条行程" if journeys else "时段内没有可达的行程",
+        "query_time": datetime.now().isoformat()
+    }
+
+
 def _get_location_code(place: str) -> str:
     '''
     获取城市对应的机场三字码（IATA Code）。
@@ -91,40 +670,37 @@ def _get_location_code(place: str) -> str:
         Optional[str]: 对应的机场三字码，如 "PEK" 或 "PVG"；如果找不到则返回 None。
     '''
 
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')  # 无头模式，不打开浏览器窗口
-    driver = webdriver.Chrome(options=options)
     try:
-        url = 'http://szdm.00cha.net/'
+        with get_transfer_driver_pool().lease() as driver:
+            url = 'http://szdm.00cha.net/'
 
-        driver.get(url)
-        time.sleep(1)
+            driver.get(url)
+            wait = WebDriverWait(driver, _page_timeout())
+            input_box = wait.until(EC.presence_of_element_located((By.NAME, "txtname")))
+            input_box.clear()
+            input_box.send_keys(place)
 
-        input_box = driver.find_element(By.NAME, "txtname")
-        input_box.clear()
-        input_box.send_keys(place)
+            search_button = driver.find_element(By.ID, "btnQuery")
+            search_button.click()
+            try:
+                results = wait.until(EC.presence_of_all_elements_located((By.CLASS_NAME, "tabled")))
+            except TimeoutException:
+                results = []
+            _log_page_transfer(driver, f"三字码查询 {place}")
 
-        search_button = driver.find_element(By.ID, "btnQuery")
-        search_button.click()
-        time.sleep(1)
-
-        results = driver.find_elements(By.CLASS_NAME, "tabled")
-      
-        code = ""
-        if len(results) == 0:
-            logger.warning("输入城市名错误！")
-        else:
-            text = results[0].text
-            code_array = [line.strip().split() for line in text.strip().splitlines()][1:]
-            country = code_array[0][-1]
-            select_array = [item for item in code_array if item[-1] == country]
-            sorted_codes = sorted(select_array, key=len)
-            code = sorted_codes[0][0]
-            return code[:3]
+            code = ""
+            if len(results) == 0:
+                logger.warning("输入城市名错误！")
+            else:
+                text = results[0].text
+                code_array = [line.strip().split() for line in text.strip().splitlines()][1:]
+                country = code_array[0][-1]
+                select_array = [item for item in code_array if item[-1] == country]
+                sorted_codes = sorted(select_array, key=len)
+                code = sorted_codes[0][0]
+                return code[:3]
     except Exception as e:
         logger.warning(f"查询{place}城市三字码错误" + str(e))
-    finally:
-        driver.close()
 
 
 def _get_location_codev2(place: str) -> str:
@@ -136,94 +712,219 @@ def _get_location_codev2(place: str) -> str:
         Optional[str]: 对应的机场三字码，如 "PEK" 或 "PVG"；如果找不到则返回 None。
     '''
 
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')  # 无头模式，不打开浏览器窗口
-    driver = webdriver.Chrome(options=options)
     try:
-        url = 'https://www.chahangxian.com/'  # 示例：百度汉语
-
-        # 打开网页
-        driver.get(url)
-        time.sleep(2)
-
-        # 输入一个字
-        search_box = driver.find_element(By.CLASS_NAME, "search")
-
-        # 百度汉语的输入框ID是kw
-        input_box = search_box.find_element(By.NAME, "keyword")  # 百度汉语的输入框ID是kw
-        input_box.clear()
-        input_box.send_keys(place)
-        input_box.send_keys(Keys.ENTER)
-        time.sleep(2)
-        return driver.current_url.split("/")[-2]
+        with get_transfer_driver_pool().lease() as driver:
+            url = 'https://www.chahangxian.com/'  # 示例：百度汉语
+
+            # 打开网页，等待搜索框出现
+            driver.get(url)
+            wait = WebDriverWait(driver, _page_timeout())
+            search_box = wait.until(EC.presence_of_element_located((By.CLASS_NAME, "search")))
+
+            # 百度汉语的输入框ID是kw
+            input_box = search_box.find_element(By.NAME, "keyword")  # 百度汉语的输入框ID是kw
+            input_box.clear()
+            input_box.send_keys(place)
+            input_box.send_keys(Keys.ENTER)
+            # 搜索后会跳转到城市页面，URL中包含三字码
+            wait.until(EC.url_changes(url))
+            _log_page_transfer(driver, f"三字码查询 {place}")
+            return driver.current_url.split("/")[-2]
     except Exception as e:
         logger.warning(f"查询{place}城市三字码错误" + str(e))
-    finally:
-        driver.close()
+
+
+# 航班块中的起降时刻，如 "08:05" 或 "01:20 +1天"
+_BLOCK_CLOCK = re.compile(r'^\d{1,2}:\d{2}(\s*\+\d+天)?$')
+
+
+def _build_direct_flight(message: List[str], airline: Optional[str], index: int) -> Flight:
+    """
+    由航班块的文本行构建直飞航班（HTTP解析和Selenium两条路径共用）
+
+    Args:
+        message: 航班块按行拆分的文本
+        airline: 航司名称（航司logo的alt文本）
+        index: 航班序号
+
+    Returns:
+        Flight对象
+
+    Raises:
+        ValueError: 文本行与预期的航班块结构不符（时刻不是 HH:MM 或价格不是数字）
+        IndexError: 文本行数不足
+    """
+    # 字段按行号读取，页面结构变化（隐藏元素、多出的行）会让所有字段错位，先校验时刻和价格
+    for position in (3, 7):
+        if not _BLOCK_CLOCK.match(message[position].strip()):
+            raise ValueError(f"第{position}行不是起降时刻: {message[position]!r}")
+    schedule = FlightSchedule(
+        departure_time=message[3],
+        arrival_time=message[7],
+        duration="",
+        timezone=""
+    )
+    mPrice = message[13].split(" ")[1].split("~")
+    price = FlightPrice(
+        economy=float(mPrice[0]),
+        business=float(mPrice[-1]),
+        first=0,
+    )
+    return Flight(
+        flight_id=f"{index}",
+        flight_number=message[0],
+        airline=airline,
+        aircraft=message[1],
+        origin=message[4],
+        destination=message[8],
+        schedule=schedule,
+        price=price,
+        seat_config=SeatConfiguration(),
+        services={},
+    )
 
 
 def _get_direct_airline(from_code: str, to_code: str) -> list:
     '''
-    :param from_code:
-    :param to_code:
-    :return:
+    查询两地之间的直飞航班，结果按 (出发地, 目的地) 缓存，多次中转查询共用
+
+    :param from_code: 出发地三字码
+    :param to_code: 目的地三字码
+    :return: 直飞航班列表；没有直飞航班时返回 None
     '''
-    options = webdriver.ChromeOptions()
-    options.add_argument('--headless')  # 无头模式，不打开浏览器窗口
-    driver = webdriver.Chrome(options=options)
+    key = (from_code.lower(), to_code.lower())
+    # 未命中缓存时，多个会话同时查询同一航段只抓取一次
+    result, cache_status = get_cache("transfer_legs").get_or_load(
+        key, lambda: get_singleflight("transfer_legs").do(key, lambda: _fetch_direct_airline(from_code, to_code))[0])
+    logger.debug(f"直飞航段 {from_code}-{to_code} 缓存状态: {cache_status}")
+    return result or None
+
+
+def _fetch_direct_airline(from_code: str, to_code: str) -> Optional[List[Flight]]:
+    '''
+    抓取两地之间的直飞航班：优先直接请求服务端渲染的航线页面，解析失败时回退到Selenium
+
+    :param from_code: 出发地三字码
+    :param to_code: 目的地三字码
+    :return: 直飞航班列表；抓取失败时返回 None（不写入缓存）
+    '''
+    store = get_flight_store()
+    result = _load_stored_direct_airline(store, from_code, to_code) if store else None
+    if result is None:
+        if os.getenv('TRANSFER_FETCH_MODE', 'http').lower() != 'selenium':
+            result = _get_direct_airline_http(from_code, to_code)
+            if result is None:
+                logger.info(f"HTTP解析航线页面失败，回退到Selenium {from_code}-{to_code}")
+        if result is None:
+            result = _get_direct_airline_selenium(from_code, to_code)
+        # 抓取成功的结果（包括没有直飞航班）写入持久化存储，供重启后和其他进程复用
+        if store and result is not None:
+            store.save_route(SOURCE_CHAHANGXIAN, from_code, to_code, SCHEDULE_DATE,
+                             [flight.model_dump(mode="json") for flight in result])
+    # 登记到时刻表，供多段行程查询复用
+    get_schedule_registry().record(from_code, to_code, result)
+    return result
+
+
+def _load_stored_direct_airline(store, from_code: str, to_code: str) -> Optional[List[Flight]]:
+    '''
+    从持久化存储读取未超过 FLIGHT_STORE_SCHEDULE_TTL 秒的直飞航段
+
+    :param store: FlightStore实例
+    :param from_code: 出发地三字码
+    :param to_code: 目的地三字码
+    :return: 直飞航班列表；没有记录、已过期或记录无法解析时返回 None
+    '''
+    stored = store.load_route(SOURCE_CHAHANGXIAN, from_code, to_code, SCHEDULE_DATE,
+                              max_age=float(os.getenv('FLIGHT_STORE_SCHEDULE_TTL', '86400')))
+    if stored is None:
+        return None
     try:
-        url = f"https://www.chahangxian.com/{from_code.lower()}-{to_code.lower()}/"
-        driver.get(url)
-        time.sleep(1)
+        flights = [Flight.model_validate(item) for item in stored[0]]
+    except ValueError as e:
+        logger.warning(f"持久化航段记录无法解析，重新抓取 {from_code}-{to_code}: {str(e)}")
+        return None
+    logger.info(f"直飞航段 {from_code}-{to_code} 读取持久化存储: {len(flights)} 个航班")
+    return flights
+
 
-        tabs = driver.find_elements(By.CLASS_NAME, "J_link")  # 修改为你目标网站的内容类名
-        if len(tabs) == 0:
+def _get_direct_airline_http(from_code: str, to_code: str) -> Optional[List[Flight]]:
+    '''
+    通过共享HTTP会话获取航线页面并解析直飞航班
+
+    :param from_code: 出发地三字码
+    :param to_code: 目的地三字码
+    :return: 直飞航班列表（没有航班块或只有中转航班时为空列表）；请求或解析失败时返回 None，由调用方回退到Selenium
+    '''
+    try:
+        url = _ROUTE_PAGE_URL.format(from_code.lower(), to_code.lower())
+        response = _get_http_session().get(url, timeout=float(os.getenv('TRANSFER_HTTP_TIMEOUT', '10')))
+        response.raise_for_status()
+        if not response.encoding or response.encoding.lower() == 'iso-8859-1':
+            response.encoding = response.apparent_encoding
+        blocks = parse_route_blocks(response.text)
+        logger.info(f"直飞查询(HTTP) {from_code}-{to_code} 页面 {len(response.content)} 字节, 航班块 {len(blocks)} 个")
+        if not blocks:
+            # 页面正常返回但没有航班块说明该航线没有航班，返回空列表以便缓存，不再回退到Selenium等待超时
             logger.warning(f"航班为空 {from_code}-{to_code}")
-        else:
-            result = []
-            index=1
-            for tab in tabs:
-                transfer = tab.find_elements(By.CLASS_NAME, "transfer")
-                if len(transfer) == 0:
-                    box = tab.find_element(By.CLASS_NAME, "airline-box")
-                    img = box.find_element(By.TAG_NAME, 'img')
-                    airline = img.get_attribute('alt')
-                    message = tab.text.splitlines()
-                    schedule = FlightSchedule(
-                        departure_time=message[3],
-                        arrival_time=message[7],
-                        duration="",
-                        timezone=""
-                    )
-                    mPrice = message[13].split(" ")[1].split("~")
-                    price = FlightPrice(
-                        economy=float(mPrice[0]),
-                        business=float(mPrice[-1]),
-                        first=0,
-                    )
-                    flight = Flight(
-                        flight_id=f"{index}",
-                        flight_number=message[0],
-                        airline=airline,
-                        aircraft=message[1],
-                        origin=message[4],
-                        destination=message[8],
-                        schedule=schedule,
-                        price=price,
-                        seat_config=SeatConfiguration(),
-                        services={},
-                    )
-                    index += 1
-                    result.append(flight)
-            if len(result) == 0:
-                logger.warning("没有直飞，建议转机")
+            return []
+
+        result = []
+        for block in blocks:
+            if block['is_transfer']:
+                continue
+            try:
+                result.append(_build_direct_flight(block['lines'], block['airline'], len(result) + 1))
+            except (IndexError, ValueError) as e:
+                # 任一直飞航班块不符合预期结构时页面可能已变化，整体交给Selenium，避免返回不完整的时刻表
+                logger.warning(f"航班块解析失败，放弃HTTP结果 {from_code}-{to_code}: {block['lines'][:2]} {str(e)}")
+                return None
+        if not result:
+            logger.warning("没有直飞，建议转机")
+        return result
+    except Exception as e:
+        logger.warning(f"直飞查询(HTTP)失败 {from_code}-{to_code}: {str(e)}")
+        return None
+
+
+def _get_direct_airline_selenium(from_code: str, to_code: str) -> list:
+    '''
+    通过Selenium渲染航线页面并解析直飞航班（HTTP路径的后备方案）
+
+    :param from_code: 出发地三字码
+    :param to_code: 目的地三字码
+    :return: 直飞航班列表；没有直飞航班时返回 None
+    '''
+    try:
+        with get_transfer_driver_pool().lease() as driver:
+            url = _ROUTE_PAGE_URL.format(from_code.lower(), to_code.lower())
+            driver.get(url)
+            try:
+                tabs = WebDriverWait(driver, _page_timeout()).until(
+                    EC.presence_of_all_elements_located((By.CLASS_NAME, "J_link")))  # 修改为你目标网站的内容类名
+            except TimeoutException:
+                tabs = []
+            _log_page_transfer(driver, f"直飞查询 {from_code}-{to_code}")
+            if len(tabs) == 0:
+                logger.warning(f"航班为空 {from_code}-{to_code}")
             else:
-                # print(len(result), result)
-                return result
+                result = []
+                index=1
+                for tab in tabs:
+                    transfer = tab.find_elements(By.CLASS_NAME, "transfer")
+                    if len(transfer) == 0:
+                        box = tab.find_element(By.CLASS_NAME, "airline-box")
+                        img = box.find_element(By.TAG_NAME, 'img')
+                        airline = img.get_attribute('alt')
+                        message = tab.text.splitlines()
+                        result.append(_build_direct_flight(message, airline, index))
+                        index += 1
+                if len(result) == 0:
+                    logger.warning("没有直飞，建议转机")
+                else:
+                    return result
     except Exception as e:
         logger.warning(f"直飞查询失败 {from_code}-{to_code}" + str(e))
-    finally:
-        driver.close()
 
 
 if __name__ == '__main__':
@@ -4,6 +4,7 @@ Simple OpenSky Tools - API航班跟踪工具
 提供基础的实时航班查询功能
 """
 
+import os
 import requests
 import json
 import logging
@@ -11,9 +12,21 @@ from datetime import datetime
 from typing import Dict, List, Optional, Any
 import time
 
+from ..utils.singleflight import get_singleflight
+from ..utils.opensky_snapshot import OpenSkySnapshotError, SnapshotPoller, StateSnapshot, StateSnapshotManager
+from ..utils.state_columns import StateColumns
+from ..utils.flight_history import FlightHistory, format_points
+from ..utils.states_stream import parse_states_stream
+
 # 初始化日志器
 logger = logging.getLogger(__name__)
 
+# 机场周边航班查询半径（公里）
+AIRPORT_SEARCH_RADIUS_KM = 30
+
+# 流式读取响应体的数据块大小（字节）
+STATES_CHUNK_SIZE = 64 * 1024
+
 
 class SimpleOpenSkyTracker:
     """航班跟踪器"""
@@ -25,6 +38,13 @@ class SimpleOpenSkyTracker:
         self.session.headers.update({
             'User-Agent': 'FlightTicketMCP/1.0'
         })
+        # 全球状态快照：按呼号查询和批量跟踪共用，每个刷新周期只下载一次
+        self.snapshots = StateSnapshotManager(
+            fetch=lambda: self._request_states(f"{self.base_url}/states/all", {}))
+        # 每次下载的快照都记入航班位置历史；后台轮询器按需启动
+        self.history = FlightHistory()
+        self.snapshots.subscribe(self.history.record)
+        self.poller = SnapshotPoller(self.snapshots)
         logger.info("SimpleOpenSky客户端初始化完成")
     
     def get_all_states(self, bbox: Optional[tuple] = None) -> Dict[str, Any]:
@@ -38,6 +58,14 @@ class SimpleOpenSkyTracker:
             包含航班状态的字典
         """
         try:
+            # 优先用全球快照的空间索引在本地查询，快照不可用时才按区域请求
+            snapshot = self._area_snapshot()
+            if snapshot is not None:
+                indices = snapshot.spatial.query_bbox(*bbox) if bbox else None
+                result = self._states_result(snapshot.columns.rows(indices), bbox)
+                result["snapshot_age_seconds"] = round(snapshot.age_seconds, 1)
+                return result
+            
             url = f"{self.base_url}/states/all"
             params = {}
             
@@ -49,17 +77,20 @@ class SimpleOpenSkyTracker:
                     'lomax': bbox[3]
                 })
             
-            logger.info(f"请求OpenSky API: {url}")
-            response = self.session.get(url, params=params, timeout=30)
+            # 多个会话同时查询相同区域时只请求一次，共享响应数据
+            key = tuple(sorted(params.items()))
+            (status_code, data), coalesced = get_singleflight("opensky_states").do(
+                key, lambda: self._request_states(url, params, bbox=bbox))
+            if coalesced:
+                logger.info(f"合并相同的进行中OpenSky请求: {params or '全部'}")
             
-            if response.status_code == 200:
-                data = response.json()
+            if status_code == 200:
                 return self._parse_states_response(data, bbox)
             else:
-                logger.warning(f"OpenSky API请求失败: {response.status_code}")
+                logger.warning(f"OpenSky API请求失败: {status_code}")
                 return {
                     "status": "error",
-                    "message": f"API请求失败: HTTP {response.status_code}"
+                    "message": f"API请求失败: HTTP {status_code}"
                 }
                 
         except requests.exceptions.Timeout:
@@ -80,8 +111,45 @@ class SimpleOpenSkyTracker:
                 "message": f"查询失败: {str(e)}"
             }
     
+    def _area_snapshot(self) -> Optional[StateSnapshot]:
+        """
+        获取用于区域查询的全球快照（过期时下载新快照）
+        
+        Returns:
+            StateSnapshot；未启用 OPENSKY_AREA_FROM_SNAPSHOT 或快照获取失败时返回None，由调用方按区域请求
+        """
+        if os.getenv('OPENSKY_AREA_FROM_SNAPSHOT', 'true').lower() != 'true':
+            return None
+        try:
+            return self.snapshots.get()
+        except Exception as e:
+            logger.warning(f"全球状态快照不可用，改为按区域请求: {e}")
+            return None
+    
+    def _request_states(self, url: str, params: Dict[str, Any], bbox: Optional[tuple] = None,
+                        callsigns: Optional[List[str]] = None) -> tuple:
+        """
+        请求 /states/all，流式解析响应体（不一次性构建整个全球响应）
+        
+        Args:
+            url: 请求地址
+            params: 请求参数
+            bbox: 可选的边界框，解析时只保留框内的状态向量
+            callsigns: 可选的呼号片段列表，解析时只保留匹配的状态向量
+            
+        Returns:
+            (HTTP状态码, {"time", "states"} 或None)
+        """
+        logger.info(f"请求OpenSky API: {url}")
+        with self.session.get(url, params=params, timeout=30, stream=True) as response:
+            if response.status_code != 200:
+                return response.status_code, None
+            data = parse_states_stream(response.iter_content(chunk_size=STATES_CHUNK_SIZE), bbox=bbox,
+                                       callsigns=callsigns)
+            return response.status_code, data
+    
     def _parse_states_response(self, data: Dict, bbox: Optional[tuple] = None) -> Dict[str, Any]:
-        """解析OpenSky API响应数据"""
+        """解析OpenSky API响应数据（按列解析状态向量，再构建返回的航班字典）"""
         try:
             if not data or 'states' not in data or data['states'] is None:
                 return {
@@ -93,22 +161,7 @@ class SimpleOpenSkyTracker:
                     "query_time": datetime.now().isoformat()
                 }
             
-            flights = []
-            for state_array in data['states']:
-                if state_array and len(state_array) >= 17:  # 确保有足够的数据
-                    flight_info = self._parse_state_vector(state_array)
-                    if flight_info:
-                        flights.append(flight_info)
-            
-            return {
-                "status": "success",
-                "message": f"成功获取 {len(flights)} 架航班信息",
-                "flights": flights,
-                "flight_count": len(flights),
-                "bbox": bbox,
-                "query_time": datetime.now().isoformat(),
-                "data_source": "opensky_network_rest"
-            }
+            return self._states_result(StateColumns(data['states']).rows(), bbox)
             
         except Exception as e:
             logger.error(f"解析航班数据失败: {e}")
@@ -117,92 +170,180 @@ class SimpleOpenSkyTracker:
                 "message": f"数据解析失败: {str(e)}"
             }
     
-    def _parse_state_vector(self, state_array: List) -> Optional[Dict[str, Any]]:
+    def _states_result(self, flights: List[Dict[str, Any]], bbox: Optional[tuple] = None) -> Dict[str, Any]:
+        """组装航班状态查询结果"""
+        return {
+            "status": "success",
+            "message": f"成功获取 {len(flights)} 架航班信息",
+            "flights": flights,
+            "flight_count": len(flights),
+            "bbox": bbox,
+            "query_time": datetime.now().isoformat(),
+            "data_source": "opensky_network_rest"
+        }
+    
+    def get_global_snapshot(self) -> tuple:
         """
-        解析单个状态向量
+        获取共享的全球状态快照
         
-        OpenSky API状态向量格式:
-        [0] icao24, [1] callsign, [2] origin_country, [3] time_position,
-        [4] last_contact, [5] longitude, [6] latitude, [7] baro_altitude,
-        [8] on_ground, [9] velocity, [10] true_track, [11] vertical_rate,
-        [12] sensors, [13] geo_altitude, [14] squawk, [15] spi, [16] position_source
+        Returns:
+            (StateSnapshot, None)；获取失败时返回 (None, 错误信息字典)
         """
         try:
-            if len(state_array) < 17:
-                return None
-                
-            icao24 = state_array[0]
-            callsign = state_array[1].strip() if state_array[1] else None
-            origin_country = state_array[2]
-            longitude = state_array[5]
-            latitude = state_array[6]
-            baro_altitude = state_array[7]  # 气压高度
-            on_ground = state_array[8]
-            velocity = state_array[9]  # 地面速度 m/s
-            true_track = state_array[10]  # 真航迹角
-            vertical_rate = state_array[11]  # 垂直速度 m/s
-            geo_altitude = state_array[13]  # 几何高度
-            last_contact = state_array[4]
-            
-            # 计算航班状态
-            status = "UNKNOWN"
-            if on_ground:
-                status = "ON_GROUND"
-            elif velocity and velocity > 100:  # 100 m/s ≈ 360 km/h
-                status = "AIRBORNE"
-            elif velocity and velocity > 10:
-                status = "TAXI"
-            else:
-                status = "STATIONARY"
-            
-            # 选择更可靠的高度数据
-            altitude = baro_altitude if baro_altitude else geo_altitude
-            
-            return {
-                "icao24": icao24,
-                "callsign": callsign,
-                "origin_country": origin_country,
-                "position": {
-                    "longitude": longitude,
-                    "latitude": latitude,
-                    "altitude_meters": altitude,
-                    "altitude_feet": round(altitude * 3.28084) if altitude else None
-                },
-                "velocity": {
-                    "ground_speed_ms": velocity,
-                    "ground_speed_kmh": round(velocity * 3.6) if velocity else None,
-                    "vertical_rate_ms": vertical_rate
-                },
-                "true_track": true_track,
-                "on_ground": on_ground,
-                "status": status,
-                "last_contact": datetime.fromtimestamp(last_contact).isoformat() if last_contact else None,
-                "last_contact_seconds_ago": int(time.time() - last_contact) if last_contact else None
-            }
-            
+            return self.snapshots.get(), None
+        except OpenSkySnapshotError as e:
+            logger.warning(f"OpenSky全球状态获取失败: {e}")
+            return None, {"status": "error", "message": str(e)}
+        except requests.exceptions.Timeout:
+            return None, {"status": "error", "message": "请求超时，OpenSky服务器响应过慢"}
+        except requests.exceptions.RequestException as e:
+            logger.error(f"OpenSky API请求异常: {e}")
+            return None, {"status": "error", "message": f"网络请求失败: {str(e)}"}
         except Exception as e:
-            logger.warning(f"解析状态向量失败: {e}")
-            return None
+            logger.error(f"获取航班状态失败: {e}")
+            return None, {"status": "error", "message": f"查询失败: {str(e)}"}
     
-    def search_flights_by_callsign(self, callsign_pattern: str) -> Dict[str, Any]:
-        """根据呼号模式搜索航班"""
-        all_states = self.get_all_states()
-        
-        if all_states.get("status") != "success":
-            return all_states
-        
-        matching_flights = []
-        for flight in all_states.get("flights", []):
-            if flight.get("callsign"):
-                if callsign_pattern.upper() in flight["callsign"].upper():
-                    matching_flights.append(flight)
-        
+    def _callsign_result(self, snapshot: StateSnapshot, callsign_pattern: str,
+                         matching_flights: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """组装单个呼号的查询结果"""
         return {
             "status": "success",
             "message": f"找到 {len(matching_flights)} 架匹配航班",
             "search_pattern": callsign_pattern,
             "flights": matching_flights,
             "flight_count": len(matching_flights),
+            "snapshot_age_seconds": round(snapshot.age_seconds, 1),
+            "query_time": datetime.now().isoformat(),
+            "data_source": "opensky_network_rest"
+        }
+    
+    def search_flights_by_callsign(self, callsign_pattern: str) -> Dict[str, Any]:
+        """根据呼号模式搜索航班（查询共享快照的呼号索引）"""
+        snapshot, error = self.get_global_snapshot()
+        if error:
+            return error
+        return self._callsign_result(snapshot, callsign_pattern, snapshot.find_callsign(callsign_pattern))
+    
+    def search_flights_by_callsigns(self, callsign_patterns: List[str]) -> List[Dict[str, Any]]:
+        """
+        批量根据呼号搜索航班，所有呼号共用同一个快照
+        
+        Args:
+            callsign_patterns: 呼号或呼号片段列表
+            
+        Returns:
+            与输入顺序对应的查询结果列表
+        """
+        snapshot, error = self.get_global_snapshot()
+        if error:
+            return [dict(error) for _ in callsign_patterns]
+        matches = snapshot.find_callsigns(callsign_patterns)
+        return [self._callsign_result(snapshot, pattern, matches[pattern]) for pattern in callsign_patterns]
+    
+    def _history_error(self, identifier: str) -> Dict[str, Any]:
+        """航班没有历史记录时的错误信息"""
+        message = f"没有航班 {identifier} 的位置历史"
+        if not self.poller.running:
+            message += "，后台轮询未启用（设置 OPENSKY_POLLER_ENABLED=true 可持续记录所有航班的轨迹）"
+        return {"status": "error", "message": message, "query_time": datetime.now().isoformat()}
+    
+    def _track_result(self, track, points, message: str) -> Dict[str, Any]:
+        """组装轨迹/历史查询结果"""
+        return {
+            "status": "success",
+            "message": message,
+            "icao24": track.icao24,
+            "callsign": track.callsign or None,
+            "origin_country": track.origin_country,
+            "in_latest_snapshot": track.removed_at is None,
+            "points": format_points(points),
+            "point_count": len(points),
+            "query_time": datetime.now().isoformat(),
+            "data_source": "opensky_network_rest"
+        }
+    
+    def get_trajectory(self, identifier: str, limit: int = 60) -> Dict[str, Any]:
+        """
+        查询航班最近的轨迹
+        
+        Args:
+            identifier: 呼号或 icao24 地址
+            limit: 最多返回的位置点数（最新的点）
+            
+        Returns:
+            按时间先后排列的位置点
+        """
+        # 快照过期时顺带刷新（后台轮询运行时直接读内存）
+        self.get_global_snapshot()
+        found = self.history.trajectory(identifier, limit)
+        if found is None:
+            return self._history_error(identifier)
+        track, points = found
+        return self._track_result(track, points, f"航班 {identifier} 最近 {len(points)} 个位置点")
+    
+    def get_history(self, identifier: str, start_time: Optional[str] = None,
+                    end_time: Optional[str] = None) -> Dict[str, Any]:
+        """
+        查询航班在时间窗口内的位置历史
+        
+        Args:
+            identifier: 呼号或 icao24 地址
+            start_time: 开始时间 (ISO格式，如 "2025-06-01T08:00:00")，默认不限
+            end_time: 结束时间 (ISO格式)，默认不限
+            
+        Returns:
+            时间窗口内按时间先后排列的位置点
+        """
+        try:
+            start = datetime.fromisoformat(start_time).timestamp() if start_time else None
+            end = datetime.fromisoformat(end_time).timestamp() if end_time else None
+        except ValueError:
+            return {"status": "error", "message": "时间格式错误，请使用ISO格式，如 2025-06-01T08:00:00"}
+        self.get_global_snapshot()
+        found = self.history.history(identifier, start, end)
+        if found is None:
+            return self._history_error(identifier)
+        track, points = found
+        result = self._track_result(track, points, f"航班 {identifier} 在时间窗口内有 {len(points)} 个位置点")
+        result.update({"start_time": start_time, "end_time": end_time})
+        return result
+    
+    def get_changes(self, since: Optional[str] = None, bbox: Optional[tuple] = None) -> Dict[str, Any]:
+        """
+        查询某时刻之后位置有更新、新出现或消失的航班
+        
+        Args:
+            since: 时间 (ISO格式)，通常传入上一次调用返回的 server_time；默认为最近一次快照更新的变化
+            bbox: 可选的边界框 (min_lat, max_lat, min_lon, max_lon)，只返回最新位置在框内的更新
+            
+        Returns:
+            更新的航班（完整实时状态）和消失的航班 icao24 列表，以及下一次查询使用的 server_time
+        """
+        try:
+            since_ts = datetime.fromisoformat(since).timestamp() if since else None
+        except ValueError:
+            return {"status": "error", "message": "时间格式错误，请使用ISO格式，如 2025-06-01T08:00:00"}
+        _, error = self.get_global_snapshot()
+        snapshot = self.history.latest_snapshot
+        if snapshot is None:
+            return error or {"status": "error", "message": "暂无航班状态数据"}
+        if since_ts is None:
+            # 最近一次快照中有变化的航班，其变化时间等于该快照的下载时间
+            since_ts = snapshot.fetched_at - 1e-6
+        updated, removed = self.history.changed_since(since_ts, bbox)
+        flights = [flight for flight in (snapshot.find_icao24(icao24) for icao24 in updated) if flight]
+        return {
+            "status": "success",
+            "message": f"有 {len(flights)} 架航班更新，{len(removed)} 架航班消失",
+            "since": since,
+            "server_time": datetime.fromtimestamp(snapshot.fetched_at).isoformat(),
+            "flights": flights,
+            "flight_count": len(flights),
+            "removed_icao24": removed,
+            "removed_count": len(removed),
+            "bbox": bbox,
+            "snapshot_age_seconds": round(snapshot.age_seconds, 1),
+            "poller_running": self.poller.running,
             "query_time": datetime.now().isoformat(),
             "data_source": "opensky_network_rest"
         }
@@ -288,12 +429,22 @@ class SimpleOpenSkyTracker:
         delta = 0.25  # 约30公里
         bbox = (lat - delta, lat + delta, lon - delta, lon + delta)
         
-        result = self.get_all_states(bbox)
+        snapshot = self._area_snapshot()
+        if snapshot is not None:
+            # 在快照的空间索引上按半径查询，航班按距离机场由近到远排列
+            indices, distances = snapshot.spatial.query_radius(lat, lon, AIRPORT_SEARCH_RADIUS_KM)
+            flights = snapshot.columns.rows(indices)
+            for flight, distance in zip(flights, distances.tolist()):
+                flight["distance_km"] = round(distance, 1)
+            result = self._states_result(flights, bbox)
+            result["snapshot_age_seconds"] = round(snapshot.age_seconds, 1)
+        else:
+            result = self.get_all_states(bbox)
         
         if result.get("status") == "success":
             result["airport_code"] = airport_code.upper()
             result["airport_coordinates"] = {"latitude": lat, "longitude": lon}
-            result["search_radius_km"] = 30
+            result["search_radius_km"] = AIRPORT_SEARCH_RADIUS_KM
             result["message"] = f"{airport_code}机场周边找到 {result.get('flight_count', 0)} 架航班"
         
         return result
@@ -367,11 +518,8 @@ def trackMultipleFlights(flight_numbers: List[str], date: str = None) -> Dict[st
     
     logger.info(f"批量查询航班状态: {flight_numbers}")
     
-    results = []
-    for flight_number in flight_numbers:
-        result = getFlightStatus(flight_number)
-        results.append(result)
-        time.sleep(1)  # 避免API频率限制
+    # 所有航班共用一次全球状态下载，逐个查呼号索引
+    results = simple_tracker.search_flights_by_callsigns(flight_numbers)
     
     successful_count = sum(1 for r in results if r.get("status") == "success" and r.get("flight_count", 0) > 0)
     
@@ -385,3 +533,73 @@ def trackMultipleFlights(flight_numbers: List[str], date: str = None) -> Dict[st
         "data_source": "opensky_network_rest",
         "note": "OpenSky仅提供实时数据，无法查询历史航班信息"
     }
+
+
+def start_state_poller():
+    """启动OpenSky后台轮询（按 OPENSKY_POLL_INTERVAL 刷新全球状态并记录航班轨迹）"""
+    simple_tracker.poller.start()
+
+
+def getFlightTrajectory(flight_number: str, limit: int = 60) -> Dict[str, Any]:
+    """
+    查询航班最近的飞行轨迹
+    
+    Args:
+        flight_number: 航班呼号 (如: "CCA1234") 或 icao24 地址
+        limit: 最多返回的位置点数（取最新的点）
+        
+    Returns:
+        包含按时间先后排列的位置点的字典
+    """
+    return simple_tracker.get_trajectory(flight_number, limit)
+
+
+def getFlightHistory(flight_number: str, start_time: str = None, end_time: str = None) -> Dict[str, Any]:
+    """
+    查询航班在时间窗口内的位置历史
+    
+    Args:
+        flight_number: 航班呼号 (如: "CCA1234") 或 icao24 地址
+        start_time: 开始时间 (ISO格式)
+        end_time: 结束时间 (ISO格式)
+        
+    Returns:
+        包含时间窗口内位置点的字典
+    """
+    return simple_tracker.get_history(flight_number, start_time, end_time)
+
+
+def getFlightChanges(since: str = None, min_lat: float = None, max_lat: float = None,
+                     min_lon: float = None, max_lon: float = None) -> Dict[str, Any]:
+    """
+    查询某时刻之后有变化的航班（增量查询）
+    
+    Args:
+        since: 时间 (ISO格式)，传入上一次返回的 server_time
+        min_lat: 最小纬度（四个边界都提供时按区域过滤）
+        max_lat: 最大纬度
+        min_lon: 最小经度
+        max_lon: 最大经度
+        
+    Returns:
+        包含更新航班、消失航班和 server_time 的字典
+    """
+    bounds = (min_lat, max_lat, min_lon, max_lon)
+    bbox = bounds if all(value is not None for value in bounds) else None
+    return simple_tracker.get_changes(since, bbox)
+
+
+def getOpenSkyStats() -> Dict[str, Any]:
+    """
+    获取全球状态快照、后台轮询和航班位置历史的统计信息
+    
+    Returns:
+        包含快照、轮询器和历史记录统计的字典
+    """
+    return {
+        "status": "success",
+        "snapshot": simple_tracker.snapshots.get_stats(),
+        "poller": simple_tracker.poller.get_stats(),
+        "history": simple_tracker.history.get_stats(),
+        "query_time": datetime.now().isoformat()
+    }
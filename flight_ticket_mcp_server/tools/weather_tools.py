@@ -4,12 +4,19 @@ Weather Tools - 天气查询工具
 提供根据经纬度查询天气信息的功能，使用Open-Meteo API
 """
 
+import os
+import time
+import threading
 import requests
 import json
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 
+from ..utils.singleflight import get_singleflight
+from ..utils.weather_cache import WeatherSliceCache
+from ..utils.geocode_cache import GEOCODE_AIRPORT_INDEX, GEOCODE_NEGATIVE, geocode_key, get_geocode_cache
+
 # 导入地理编码库
 try:
     from geopy.geocoders import Nominatim
@@ -24,6 +31,9 @@ except ImportError:
 # 初始化日志器
 logger = logging.getLogger(__name__)
 
+# 查询使用的Open-Meteo天气模式
+WEATHER_MODEL = "cma_grapes_global"
+
 def getWeatherByLocation(latitude: float, longitude: float, start_date: str = None, end_date: str = None) -> Dict[str, Any]:
     """
     根据经纬度查询天气信息
@@ -102,24 +112,23 @@ def getWeatherByLocation(latitude: float, longitude: float, start_date: str = No
         # 构建API请求URL
         base_url = "https://api.open-meteo.com/v1/forecast"
         params = {
-            "latitude": latitude,
-            "longitude": longitude,
             "hourly": "temperature_2m",
-            "models": "cma_grapes_global",
+            "models": WEATHER_MODEL,
             "timezone": "Asia/Shanghai",
-            "start_date": start_date,
-            "end_date": end_date
         }
         
-        logger.info(f"请求Open-Meteo API: {base_url}")
-        logger.debug(f"请求参数: {params}")
+        def fetch(grid_latitude: float, grid_longitude: float, fetch_start: str, fetch_end: str) -> Dict[str, Any]:
+            request_params = dict(params, latitude=grid_latitude, longitude=grid_longitude,
+                                  start_date=fetch_start, end_date=fetch_end)
+            logger.info(f"请求Open-Meteo API: {base_url}")
+            logger.debug(f"请求参数: {request_params}")
+            return _fetch_weather_data(base_url, request_params)
         
         try:
-            # 发送HTTP请求
-            response = requests.get(base_url, params=params, timeout=30)
-            response.raise_for_status()
-            
-            weather_data = response.json()
+            # 同一模式网格点和日期的数据按每日片段缓存，附近坐标和重叠的日期范围直接复用
+            weather_data, cache_status = WeatherSliceCache(WEATHER_MODEL).get_range(
+                latitude, longitude, start_date, end_date, fetch)
+            logger.debug(f"天气数据缓存状态: {cache_status}")
             logger.debug(f"API响应数据: {json.dumps(weather_data, indent=2, ensure_ascii=False)}")
             
             # 调试：检查温度数据质量
@@ -142,6 +151,7 @@ def getWeatherByLocation(latitude: float, longitude: float, start_date: str = No
                 "hourly_units": weather_data.get("hourly_units", {}),
                 "hourly_data": weather_data.get("hourly", {}),
                 "formatted_output": _format_weather_result(weather_data, latitude, longitude, start_date, end_date),
+                "cache_status": cache_status,
                 "query_time": datetime.now().isoformat()
             }
             
@@ -195,6 +205,13 @@ def getWeatherByLocation(latitude: float, longitude: float, start_date: str = No
         }
 
 
+def _fetch_weather_data(base_url: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """请求Open-Meteo API并返回解析后的JSON"""
+    response = requests.get(base_url, params=params, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+
 def _format_weather_result(weather_data: Dict[str, Any], latitude: float, longitude: float, start_date: str, end_date: str) -> str:
     """
     格式化天气查询结果
@@ -326,6 +343,46 @@ CITY_COORDINATES = {
     "台北": {"latitude": 25.0330, "longitude": 121.5654, "name": "台北"},
 }
 
+_geocode_lock = threading.Lock()
+_last_geocode_at = 0.0
+
+
+def _geocode_city(city_name: str) -> Optional[Dict[str, Any]]:
+    """
+    通过geopy(Nominatim)查询城市坐标并写入地理编码缓存
+
+    相邻两次在线查询至少间隔 GEOCODE_MIN_INTERVAL 秒，遵守Nominatim的限速要求；
+    找不到的结果同样缓存，请求失败时抛出异常且不缓存。
+    
+    Args:
+        city_name: 城市名
+        
+    Returns:
+        坐标字典 {"latitude", "longitude", "name"}；找不到时返回None
+    """
+    global _last_geocode_at
+    with _geocode_lock:
+        wait = _last_geocode_at + float(os.getenv('GEOCODE_MIN_INTERVAL', '1.0')) - time.time()
+        if wait > 0:
+            time.sleep(wait)
+        try:
+            logger.info(f"使用geopy查找城市 '{city_name}' 的坐标...")
+            location = geolocator.geocode(city_name, timeout=10)
+        finally:
+            _last_geocode_at = time.time()
+    
+    coord = None
+    if location:
+        coord = {
+            "latitude": location.latitude,
+            "longitude": location.longitude,
+            "name": location.address if location.address else city_name
+        }
+        logger.debug(f"geopy返回的完整地址: {location.address}")
+    get_geocode_cache().store(city_name, coord)
+    return coord
+
+
 def getWeatherByCity(city_name: str, start_date: str = None, end_date: str = None) -> Dict[str, Any]:
     """
     根据城市名查询天气信息
@@ -362,22 +419,28 @@ def getWeatherByCity(city_name: str, start_date: str = None, end_date: str = Non
                 logger.info(f"从预设字典找到城市 '{city_name}' 的坐标: 纬度={city_coord['latitude']}, 经度={city_coord['longitude']}")
                 break
         
-        #如果预设字典中没有，尝试使用geopy进行地理编码
-        if not city_coord and GEOPY_AVAILABLE and geolocator:
+        # 预设字典中没有时，查询机场参考数据和持久化的地理编码缓存（包括找不到的结果）
+        geocode_status = None
+        if not city_coord:
+            cached_coord, geocode_status = get_geocode_cache().lookup(city_name)
+            if cached_coord:
+                city_coord = cached_coord
+                city_display_name = cached_coord["name"]
+                coordinate_source = "airport_index" if geocode_status == GEOCODE_AIRPORT_INDEX else "geocode_cache"
+                logger.info(f"从{coordinate_source}找到城市 '{city_name}' 的坐标: 纬度={city_coord['latitude']}, 经度={city_coord['longitude']}")
+            elif geocode_status == GEOCODE_NEGATIVE:
+                coordinate_source = "geocode_cache"
+                logger.info(f"地理编码缓存记录城市 '{city_name}' 无法找到，跳过在线查询")
+        
+        #如果缓存中也没有，尝试使用geopy进行地理编码
+        if not city_coord and geocode_status != GEOCODE_NEGATIVE and GEOPY_AVAILABLE and geolocator:
             try:
-                logger.info(f"使用geopy查找城市 '{city_name}' 的坐标...")
-                location = geolocator.geocode(city_name, timeout=10)
-                
-                if location:
-                    city_coord = {
-                        "latitude": location.latitude,
-                        "longitude": location.longitude,
-                        "name": city_name
-                    }
-                    city_display_name = location.address if location.address else city_name
+                # 多个会话同时查询同一城市时只请求一次
+                city_coord, _ = get_singleflight("geocode").do(geocode_key(city_name), lambda: _geocode_city(city_name))
+                if city_coord:
+                    city_display_name = city_coord["name"]
                     coordinate_source = "geopy"
                     logger.info(f"通过geopy找到城市 '{city_name}' 的坐标: 纬度={city_coord['latitude']}, 经度={city_coord['longitude']}")
-                    logger.debug(f"geopy返回的完整地址: {location.address}")
                 else:
                     logger.warning(f"geopy无法找到城市 '{city_name}' 的坐标")
                     
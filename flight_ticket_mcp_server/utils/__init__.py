@@ -4,6 +4,6 @@ Utils - 工具函数模块
 包含数据验证、日期处理、API客户端等实用工具
 """
 
-from . import validators, date_utils, api_client, cities_dict
+from . import validators, date_utils, api_client, cities_dict, browser_pool, page_readiness, browser_profile, airport_index, route_page_parser, result_cache, singleflight, flight_store, geocode_cache, weather_cache, opensky_snapshot, state_columns, spatial_index, flight_history, states_stream, callsign_index
 
-__all__ = ["validators", "date_utils", "api_client", "cities_dict"] 
\ No newline at end of file
+__all__ = ["validators", "date_utils", "api_client", "cities_dict", "browser_pool", "page_readiness", "browser_profile", "airport_index", "route_page_parser", "result_cache", "singleflight", "flight_store", "geocode_cache", "weather_cache", "opensky_snapshot", "state_columns", "spatial_index", "flight_history", "states_stream", "callsign_index"] 
\ No newline at end of file
@@ -0,0 +1,287 @@
+"""
+Airport Index - 离线城市/机场代码索引
+
+加载随包发布的全球城市与机场参考数据（airports.json），并合并国内城市字典，
+在内存中建立 名称/别名/拼音/IATA/ICAO -> 代码 的索引，无需联网即可完成三字码解析。
+在线查询得到的新代码会写入本地缓存文件，下次启动时自动加载
+"""
+
+import os
+import re
+import json
+import math
+import logging
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .cities_dict import CITIES_DICT
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+# 随包发布的参考数据
+DATASET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'airports.json')
+
+# 地球平均半径（公里）
+EARTH_RADIUS_KM = 6371.0
+
+# 匹配 "上海(SHA)" / "怀化（芷江）(HJJ)" 这类带代码的完整格式
+_NAME_WITH_CODE = re.compile(r'^(.+?)[(（]([A-Za-z]{3})[)）]$')
+
+
+def _normalize(name: str) -> str:
+    """统一名称格式：去空白、连字符和撇号，转小写，去掉结尾的"市" """
+    key = re.sub(r"[\s\-_'·.]", '', str(name)).lower()
+    if len(key) > 2 and key.endswith('市'):
+        key = key[:-1]
+    return key
+
+
+def great_circle_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """计算两点之间的大圆距离（公里）"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class AirportIndex:
+    """城市/机场代码内存索引"""
+
+    def __init__(self, dataset_path: Optional[str] = None, cache_path: Optional[str] = None):
+        """
+        初始化索引并加载数据
+
+        Args:
+            dataset_path: 参考数据文件路径，默认使用随包发布的 airports.json
+            cache_path: 在线查询结果缓存文件路径，默认读取环境变量 AIRPORT_CODE_CACHE_PATH
+        """
+        self.dataset_path = dataset_path or DATASET_PATH
+        self.cache_path = cache_path or os.getenv('AIRPORT_CODE_CACHE_PATH', 'cache/airport_codes.json')
+        self._lock = threading.Lock()
+        self._cities: List[Dict[str, Any]] = []
+        self._city_by_key: Dict[str, Dict[str, Any]] = {}
+        self._city_by_code: Dict[str, Dict[str, Any]] = {}
+        self._airport_by_code: Dict[str, Dict[str, Any]] = {}
+        self._learned: Dict[str, str] = {}
+        self._load_dataset()
+        self._merge_cities_dict()
+        self._load_learned_codes()
+        logger.info(f"机场索引加载完成: {self.get_stats()}")
+
+    # ---------- 加载 ----------
+
+    def _add_city(self, city: Dict[str, Any]):
+        """登记城市及其所有可检索名称"""
+        self._cities.append(city)
+        code = city['city_code'].lower()
+        self._city_by_code.setdefault(code, city)
+        names = [city.get('city'), city.get('city_en'), city.get('pinyin'), city['city_code']]
+        names.extend(city.get('aliases') or [])
+        for name in names:
+            if name:
+                self._city_by_key.setdefault(_normalize(name), city)
+
+    def _load_dataset(self):
+        """加载随包发布的参考数据"""
+        try:
+            with open(self.dataset_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"加载机场参考数据失败: {str(e)}")
+            return
+
+        for city in data.get('cities', []):
+            self._add_city(city)
+            for airport in city.get('airports') or []:
+                record = dict(airport, city=city['city'], city_code=city['city_code'],
+                              country=city.get('country'), country_code=city.get('country_code'),
+                              timezone=city.get('timezone'), hub=city.get('hub', False))
+                self._airport_by_code.setdefault(airport['iata'].lower(), record)
+                if airport.get('icao'):
+                    self._airport_by_code.setdefault(airport['icao'].lower(), record)
+
+    def _merge_cities_dict(self):
+        """合并国内城市字典中参考数据未收录的城市（仅有名称和代码）"""
+        for full_name, code in CITIES_DICT.items():
+            match = _NAME_WITH_CODE.match(full_name)
+            name = match.group(1) if match else full_name
+            # "怀化（芷江）" 这类名称同时登记括号内的机场所在地
+            names = [name] + [part for part in re.split(r'[（）()]', name) if part and part != name]
+            if code not in self._city_by_code:
+                self._add_city({
+                    'city': names[1] if len(names) > 1 else name,
+                    'city_code': code.upper(),
+                    'country': '中国',
+                    'country_code': 'CN',
+                    # 国内航班时刻统一使用北京时间
+                    'timezone': 'Asia/Shanghai',
+                    'hub': False,
+                    'airports': [],
+                })
+            for alias in names:
+                self._city_by_key.setdefault(_normalize(alias), self._city_by_code[code])
+
+    def _load_learned_codes(self):
+        """加载在线查询得到并持久化的代码"""
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                self._learned = {_normalize(k): v.lower() for k, v in json.load(f).items() if v}
+        except (OSError, ValueError, AttributeError) as e:
+            logger.warning(f"读取三字码缓存失败: {str(e)}")
+
+    # ---------- 查询 ----------
+
+    def lookup_city(self, name: str) -> Optional[Dict[str, Any]]:
+        """
+        按名称、别名、拼音或城市代码查找城市
+
+        Args:
+            name: 城市名称，如 "北京"、"Beijing"、"beijing"、"BJS"、"北京(BJS)"
+
+        Returns:
+            城市记录字典；未收录时返回None
+        """
+        if not name:
+            return None
+        match = _NAME_WITH_CODE.match(name.strip())
+        if match:
+            city = self._city_by_code.get(match.group(2).lower())
+            if city:
+                return city
+            name = match.group(1)
+        return self._city_by_key.get(_normalize(name))
+
+    def get_airport(self, code: str) -> Optional[Dict[str, Any]]:
+        """
+        按IATA或ICAO代码查找机场
+
+        Returns:
+            机场记录（含所属城市、国家、坐标）；未收录时返回None
+        """
+        return self._airport_by_code.get(str(code).strip().lower()) if code else None
+
+    def resolve_code(self, name: str) -> Optional[str]:
+        """
+        将城市名/机场代码解析为小写三字码
+
+        机场IATA代码原样返回，ICAO代码转换为IATA代码，城市名称返回城市三字码，
+        都未命中时再查找在线查询缓存。
+
+        Args:
+            name: 城市名称、别名、拼音或机场代码
+
+        Returns:
+            小写三字码，如 "bjs"、"pvg"；无法解析时返回None
+        """
+        if not name:
+            return None
+        city = self.lookup_city(name)
+        if city:
+            return city['city_code'].lower()
+        airport = self.get_airport(name)
+        if airport:
+            return airport['iata'].lower()
+        return self._learned.get(_normalize(name))
+
+    def display_name(self, name: str) -> Optional[str]:
+        """返回 "城市(代码)" 格式的完整名称，如 "迪拜(DXB)" """
+        city = self.lookup_city(name)
+        if city:
+            return f"{city['city']}({city['city_code'].upper()})"
+        airport = self.get_airport(name)
+        if airport:
+            return f"{airport['city']}({airport['iata'].upper()})"
+        return None
+
+    def coordinates(self, name: str) -> Optional[Tuple[float, float]]:
+        """
+        返回城市（取其首个机场）或机场的经纬度
+
+        Returns:
+            (纬度, 经度)；未收录或缺少坐标时返回None
+        """
+        city = self.lookup_city(name)
+        airports = (city.get('airports') or []) if city else []
+        airport = airports[0] if airports else self.get_airport(name)
+        if airport and airport.get('latitude') is not None and airport.get('longitude') is not None:
+            return float(airport['latitude']), float(airport['longitude'])
+        return None
+
+    def timezone(self, name: str) -> Optional[str]:
+        """
+        返回城市或机场所在的时区（航班时刻使用的当地时间）
+
+        Returns:
+            IANA 时区名，如 "Asia/Shanghai"；未收录时返回None
+        """
+        city = self.lookup_city(name)
+        if city:
+            return city.get('timezone')
+        airport = self.get_airport(name)
+        return airport.get('timezone') if airport else None
+
+    def iter_airports(self) -> Iterator[Dict[str, Any]]:
+        """遍历参考数据中的所有机场（每个机场只返回一次）"""
+        seen = set()
+        for airport in self._airport_by_code.values():
+            if airport['iata'] not in seen:
+                seen.add(airport['iata'])
+                yield airport
+
+    def hub_cities(self) -> List[Dict[str, Any]]:
+        """返回标记为枢纽的城市列表"""
+        return [city for city in self._cities if city.get('hub')]
+
+    # ---------- 在线结果持久化 ----------
+
+    def remember(self, name: str, code: str):
+        """
+        记录在线查询得到的代码并写入缓存文件
+
+        Args:
+            name: 查询时使用的名称
+            code: 查询得到的三字码
+        """
+        if not name or not code:
+            return
+        with self._lock:
+            self._learned[_normalize(name)] = code.lower()
+            try:
+                directory = os.path.dirname(self.cache_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                tmp_path = f"{self.cache_path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(self._learned, f, ensure_ascii=False, indent=2)
+                os.replace(tmp_path, self.cache_path)
+                logger.info(f"已缓存三字码: {name} -> {code.lower()}")
+            except OSError as e:
+                logger.warning(f"写入三字码缓存失败: {str(e)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回索引规模统计"""
+        return {
+            "cities": len(self._cities),
+            "airports": sum(1 for _ in self.iter_airports()),
+            "hubs": len(self.hub_cities()),
+            "index_keys": len(self._city_by_key),
+            "learned_codes": len(self._learned),
+        }
+
+
+_default_index: Optional[AirportIndex] = None
+_default_index_lock = threading.Lock()
+
+
+def get_airport_index() -> AirportIndex:
+    """获取进程共享的机场索引（首次调用时加载）"""
+    global _default_index
+    if _default_index is None:
+        with _default_index_lock:
+            if _default_index is None:
+                _default_index = AirportIndex()
+    return _default_index
@@ -0,0 +1,383 @@
+"""
+Browser Pool - 浏览器实例池
+
+提供进程级的预热浏览器池：租借/归还、健康检查、按页面数或内存阈值回收，
+并统计等待时间和利用率等信息
+"""
+
+import os
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+
+class BrowserPoolTimeout(TimeoutError):
+    """在限定时间内未能租借到浏览器实例"""
+
+
+def pool_config_from_env(prefix: str = "BROWSER_POOL", **defaults) -> Dict[str, Any]:
+    """
+    从环境变量读取浏览器池配置
+
+    Args:
+        prefix: 环境变量前缀，如 BROWSER_POOL 对应 BROWSER_POOL_SIZE 等
+        **defaults: 覆盖内置默认值
+
+    Returns:
+        可直接传给 BrowserPool 的配置字典
+    """
+    config = {
+        "size": 2,
+        "max_pages": 50,
+        "max_memory_mb": 512.0,
+        "acquire_timeout": 60.0,
+    }
+    config.update(defaults)
+
+    config["size"] = max(1, int(os.getenv(f"{prefix}_SIZE", config["size"])))
+    config["max_pages"] = int(os.getenv(f"{prefix}_MAX_PAGES", config["max_pages"]))
+    config["max_memory_mb"] = float(os.getenv(f"{prefix}_MAX_MEMORY_MB", config["max_memory_mb"]))
+    config["acquire_timeout"] = float(os.getenv(f"{prefix}_ACQUIRE_TIMEOUT", config["acquire_timeout"]))
+    return config
+
+
+class _PooledBrowser:
+    """池中的单个浏览器实例及其使用记录"""
+
+    def __init__(self, browser_id: int, browser: Any):
+        self.browser_id = browser_id
+        self.browser = browser
+        self.created_at = time.time()
+        self.pages_served = 0
+        self.leased_at: Optional[float] = None
+
+
+class BrowserPool:
+    """
+    有界浏览器池
+
+    浏览器的创建、关闭、健康检查和内存探测都通过回调注入，
+    因此同一套池逻辑可同时服务 DrissionPage 和 Selenium。
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], closer: Callable[[Any], None],
+                 size: int = 2, max_pages: int = 50, max_memory_mb: float = 512.0,
+                 acquire_timeout: float = 60.0,
+                 health_check: Optional[Callable[[Any], bool]] = None,
+                 memory_probe: Optional[Callable[[Any], Optional[float]]] = None,
+                 reset: Optional[Callable[[Any], None]] = None):
+        """
+        初始化浏览器池
+
+        Args:
+            name: 池名称（用于日志和统计）
+            factory: 创建一个浏览器实例的函数
+            closer: 关闭浏览器实例的函数
+            size: 池中浏览器实例的最大数量
+            max_pages: 单个实例服务多少次后回收，<=0 表示不限制
+            max_memory_mb: 实例内存超过该阈值（MB）后回收，<=0 表示不限制
+            acquire_timeout: 租借等待的默认超时时间（秒）
+            health_check: 租出前的健康检查函数，返回False时实例会被替换
+            memory_probe: 返回实例当前内存占用（MB）的函数
+            reset: 归还时清理实例状态的函数
+        """
+        self.name = name
+        self.size = max(1, int(size))
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.acquire_timeout = acquire_timeout
+
+        self._factory = factory
+        self._closer = closer
+        self._health_check = health_check
+        self._memory_probe = memory_probe
+        self._reset = reset
+
+        self._cond = threading.Condition()
+        self._idle: List[_PooledBrowser] = []
+        self._leased: Dict[int, _PooledBrowser] = {}
+        self._pending = 0  # 正在创建中的实例数量
+        self._next_id = 1
+        self._closed = False
+
+        self._started_at = time.time()
+        self._stats = {
+            "leases": 0,
+            "timeouts": 0,
+            "created": 0,
+            "create_failures": 0,
+            "recycled_by_pages": 0,
+            "recycled_by_memory": 0,
+            "discarded_unhealthy": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+            "busy_seconds": 0.0,
+        }
+
+        logger.info(f"浏览器池 {name} 初始化完成: size={self.size}, max_pages={max_pages}, "
+                    f"max_memory_mb={max_memory_mb}")
+
+    # ------------------------------------------------------------------
+    # 租借与归还
+    # ------------------------------------------------------------------
+
+    @contextmanager
+    def lease(self, timeout: Optional[float] = None):
+        """
+        租借一个浏览器实例，退出上下文时自动归还
+
+        Args:
+            timeout: 等待空闲实例的超时时间（秒），默认使用池配置
+
+        Yields:
+            浏览器实例
+        """
+        entry = self._acquire(self.acquire_timeout if timeout is None else timeout)
+        try:
+            yield entry.browser
+        finally:
+            self._release(entry)
+
+    def _acquire(self, timeout: float) -> _PooledBrowser:
+        """获取一个健康的实例，必要时新建"""
+        wait_start = time.time()
+        deadline = wait_start + timeout
+
+        while True:
+            entry = None
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise RuntimeError(f"浏览器池 {self.name} 已关闭")
+                    if self._idle:
+                        # 健康检查期间计入租出数量，避免其他线程误判池未满而多建实例
+                        entry = self._idle.pop()
+                        self._leased[entry.browser_id] = entry
+                        break
+                    if self._total() < self.size:
+                        self._pending += 1
+                        break
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        self._stats["timeouts"] += 1
+                        raise BrowserPoolTimeout(f"浏览器池 {self.name} 在 {timeout} 秒内无空闲实例")
+                    self._cond.wait(remaining)
+
+            created = entry is None
+            if created:
+                entry = self._create_reserved()
+                if entry is None:
+                    raise RuntimeError(f"浏览器池 {self.name} 创建浏览器实例失败")
+            elif not self._is_healthy(entry):
+                logger.warning(f"浏览器池 {self.name} 实例 #{entry.browser_id} 健康检查失败，替换新实例")
+                with self._cond:
+                    self._leased.pop(entry.browser_id, None)
+                self._discard(entry, "discarded_unhealthy")
+                continue
+
+            waited = time.time() - wait_start
+            with self._cond:
+                if created:
+                    self._pending -= 1
+                entry.leased_at = time.time()
+                self._leased[entry.browser_id] = entry
+                self._stats["leases"] += 1
+                self._stats["total_wait_seconds"] += waited
+                self._stats["max_wait_seconds"] = max(self._stats["max_wait_seconds"], waited)
+            logger.debug(f"浏览器池 {self.name} 租出实例 #{entry.browser_id}，等待 {waited:.3f}s")
+            return entry
+
+    def _release(self, entry: _PooledBrowser):
+        """归还实例，达到回收条件时关闭"""
+        entry.pages_served += 1
+
+        recycle_reason = None
+        if self.max_pages > 0 and entry.pages_served >= self.max_pages:
+            recycle_reason = "recycled_by_pages"
+        elif self.max_memory_mb > 0 and self._memory_probe:
+            memory_mb = self._safe_call(self._memory_probe, entry.browser)
+            if memory_mb is not None and memory_mb > self.max_memory_mb:
+                logger.info(f"浏览器池 {self.name} 实例 #{entry.browser_id} 内存 {memory_mb:.1f}MB 超过阈值")
+                recycle_reason = "recycled_by_memory"
+
+        if recycle_reason is None and self._reset:
+            try:
+                self._reset(entry.browser)
+            except Exception as e:
+                logger.warning(f"浏览器池 {self.name} 实例 #{entry.browser_id} 重置失败: {e}")
+                recycle_reason = "discarded_unhealthy"
+
+        with self._cond:
+            self._leased.pop(entry.browser_id, None)
+            if entry.leased_at:
+                self._stats["busy_seconds"] += time.time() - entry.leased_at
+                entry.leased_at = None
+            if recycle_reason is None and not self._closed:
+                self._idle.append(entry)
+                self._cond.notify()
+                return
+
+        if recycle_reason is None:
+            recycle_reason = "closed_on_release"
+        logger.info(f"浏览器池 {self.name} 回收实例 #{entry.browser_id} ({recycle_reason}, "
+                    f"已服务 {entry.pages_served} 次)")
+        self._discard(entry, recycle_reason)
+        if not self._closed:
+            self._spawn_replacement()
+
+    # ------------------------------------------------------------------
+    # 实例生命周期
+    # ------------------------------------------------------------------
+
+    def prewarm(self, count: Optional[int] = None) -> int:
+        """
+        预先启动浏览器实例，使后续查询可直接使用热实例
+
+        Args:
+            count: 期望的空闲实例数量，默认填满整个池
+
+        Returns:
+            本次新建的实例数量
+        """
+        target = self.size if count is None else min(self.size, count)
+        created = 0
+        while True:
+            with self._cond:
+                if self._closed or len(self._idle) + self._pending >= target or self._total() >= self.size:
+                    break
+                self._pending += 1
+            entry = self._create_reserved()
+            if entry is None:
+                break
+            with self._cond:
+                self._pending -= 1
+                self._idle.append(entry)
+                self._cond.notify()
+            created += 1
+        logger.info(f"浏览器池 {self.name} 预热完成，新建 {created} 个实例")
+        return created
+
+    def _create_reserved(self) -> Optional[_PooledBrowser]:
+        """
+        创建实例（调用前已在锁内预留名额）
+
+        创建失败时释放名额；创建成功时名额仍计入 _pending，由调用方在放入空闲或租出列表的同一锁内释放，
+        保证实例在任何时刻都被计入池的总数
+        """
+        try:
+            browser = self._factory()
+        except Exception as e:
+            logger.error(f"浏览器池 {self.name} 创建实例失败: {e}")
+            with self._cond:
+                self._pending -= 1
+                self._stats["create_failures"] += 1
+                self._cond.notify()
+            return None
+
+        with self._cond:
+            entry = _PooledBrowser(self._next_id, browser)
+            self._next_id += 1
+            self._stats["created"] += 1
+        logger.info(f"浏览器池 {self.name} 新建实例 #{entry.browser_id}")
+        return entry
+
+    def _spawn_replacement(self):
+        """在后台补充一个实例，保持池处于预热状态"""
+        with self._cond:
+            if self._closed or self._total() >= self.size:
+                return
+            self._pending += 1
+
+        def _worker():
+            entry = self._create_reserved()
+            if entry is None:
+                return
+            with self._cond:
+                self._pending -= 1
+                if self._closed:
+                    closed_entry = entry
+                else:
+                    self._idle.append(entry)
+                    self._cond.notify()
+                    return
+            self._safe_call(self._closer, closed_entry.browser)
+
+        threading.Thread(target=_worker, name=f"{self.name}-replenish", daemon=True).start()
+
+    def _discard(self, entry: _PooledBrowser, reason: str):
+        """关闭实例并记录统计"""
+        self._safe_call(self._closer, entry.browser)
+        with self._cond:
+            self._stats[reason] = self._stats.get(reason, 0) + 1
+            self._cond.notify()
+
+    def _is_healthy(self, entry: _PooledBrowser) -> bool:
+        if not self._health_check:
+            return True
+        return bool(self._safe_call(self._health_check, entry.browser))
+
+    def _safe_call(self, func: Callable, *args):
+        try:
+            return func(*args)
+        except Exception as e:
+            logger.debug(f"浏览器池 {self.name} 回调执行失败: {e}")
+            return None
+
+    def _total(self) -> int:
+        return len(self._idle) + len(self._leased) + self._pending
+
+    def shutdown(self):
+        """关闭池中所有空闲实例，已租出的实例在归还时关闭"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for entry in idle:
+            self._safe_call(self._closer, entry.browser)
+        logger.info(f"浏览器池 {self.name} 已关闭，释放 {len(idle)} 个空闲实例")
+
+    # ------------------------------------------------------------------
+    # 统计
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取池统计信息
+
+        Returns:
+            包含实例数量、等待时间和利用率的字典
+        """
+        with self._cond:
+            now = time.time()
+            uptime = max(now - self._started_at, 1e-9)
+            busy = self._stats["busy_seconds"] + sum(
+                now - entry.leased_at for entry in self._leased.values() if entry.leased_at
+            )
+            leases = self._stats["leases"]
+            return {
+                "name": self.name,
+                "size": self.size,
+                "idle": len(self._idle),
+                "in_use": len(self._leased),
+                "starting": self._pending,
+                "closed": self._closed,
+                "max_pages": self.max_pages,
+                "max_memory_mb": self.max_memory_mb,
+                "leases": leases,
+                "timeouts": self._stats["timeouts"],
+                "created": self._stats["created"],
+                "create_failures": self._stats["create_failures"],
+                "recycled_by_pages": self._stats["recycled_by_pages"],
+                "recycled_by_memory": self._stats["recycled_by_memory"],
+                "discarded_unhealthy": self._stats["discarded_unhealthy"],
+                "avg_wait_seconds": round(self._stats["total_wait_seconds"] / leases, 4) if leases else 0.0,
+                "max_wait_seconds": round(self._stats["max_wait_seconds"], 4),
+                "current_utilization": round(len(self._leased) / self.size, 3),
+                "average_utilization": round(busy / (uptime * self.size), 3),
+                "uptime_seconds": round(uptime, 1),
+            }
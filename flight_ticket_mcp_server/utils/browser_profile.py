@@ -0,0 +1,204 @@
+"""
+Browser Profile - 精简抓取浏览器配置
+
+为 DrissionPage 和 Selenium 两套抓取引擎提供统一的"精简抓取配置"：
+屏蔽图片、字体、媒体和统计脚本等无关资源，关闭GPU和扩展，限制渲染进程内存，
+并统计每个页面实际传输的字节数
+"""
+
+import os
+import json
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+
+def _extension_patterns(*extensions: str) -> List[str]:
+    """
+    生成只匹配指定文件扩展名的URL模式（Chrome Network.setBlockedURLs 通配符语法）
+
+    扩展名必须位于URL末尾或查询参数之前，避免 "*.ico*" 误伤 ".icon"、".avianca" 等路径和域名
+
+    Args:
+        *extensions: 不带点的扩展名
+
+    Returns:
+        URL模式列表
+    """
+    patterns = []
+    for extension in extensions:
+        patterns.extend([f"*.{extension}", f"*.{extension}?*"])
+    return patterns
+
+
+# 按资源类型屏蔽的URL模式
+IMAGE_URL_PATTERNS = _extension_patterns("png", "jpg", "jpeg", "gif", "webp", "svg", "ico", "bmp")
+FONT_URL_PATTERNS = _extension_patterns("woff", "woff2", "ttf", "otf", "eot")
+MEDIA_URL_PATTERNS = _extension_patterns("mp4", "webm", "mp3", "m4a", "ogg", "avi")
+TRACKER_URL_PATTERNS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*hm.baidu.com*",
+    "*cnzz.com*",
+    "*/bf.gif*",
+]
+
+# 统计当前页面传输字节数的脚本（基于 Resource Timing API）
+_TRANSFER_STATS_JS = """
+const entries = performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource'));
+let transfer = 0, decoded = 0;
+for (const entry of entries) {
+    transfer += entry.transferSize || 0;
+    decoded += entry.decodedBodySize || 0;
+}
+return JSON.stringify({transfer_bytes: transfer, decoded_bytes: decoded, resource_count: entries.length});
+"""
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).lower() in ('true', '1', 'yes')
+
+
+class LeanScrapingProfile:
+    """精简抓取配置"""
+
+    def __init__(self, enabled: bool = True, block_images: bool = True, block_fonts: bool = True,
+                 block_media: bool = True, block_trackers: bool = True,
+                 extra_block_patterns: Optional[List[str]] = None, renderer_memory_mb: int = 512):
+        """
+        初始化精简抓取配置
+
+        Args:
+            enabled: 是否启用精简配置，关闭时只保留无头等原有设置
+            block_images: 是否屏蔽图片（含航司logo）
+            block_fonts: 是否屏蔽网页字体
+            block_media: 是否屏蔽音视频
+            block_trackers: 是否屏蔽统计和广告脚本
+            extra_block_patterns: 额外屏蔽的URL通配符
+            renderer_memory_mb: 渲染进程JS堆上限（MB），<=0 表示不限制
+        """
+        self.enabled = enabled
+        self.block_images = block_images
+        self.block_fonts = block_fonts
+        self.block_media = block_media
+        self.block_trackers = block_trackers
+        self.extra_block_patterns = extra_block_patterns or []
+        self.renderer_memory_mb = renderer_memory_mb
+
+    @classmethod
+    def from_env(cls) -> "LeanScrapingProfile":
+        """从环境变量读取配置"""
+        extra = os.getenv('SCRAPER_BLOCK_URL_PATTERNS', '')
+        return cls(
+            enabled=_env_flag('SCRAPER_LEAN_PROFILE', True),
+            block_images=_env_flag('SCRAPER_BLOCK_IMAGES', True),
+            block_fonts=_env_flag('SCRAPER_BLOCK_FONTS', True),
+            block_media=_env_flag('SCRAPER_BLOCK_MEDIA', True),
+            block_trackers=_env_flag('SCRAPER_BLOCK_TRACKERS', True),
+            extra_block_patterns=[p.strip() for p in extra.split(',') if p.strip()],
+            renderer_memory_mb=int(os.getenv('SCRAPER_RENDERER_MEMORY_MB', '512')),
+        )
+
+    def blocked_url_patterns(self) -> List[str]:
+        """需要屏蔽的URL通配符列表"""
+        if not self.enabled:
+            return []
+        patterns = []
+        if self.block_images:
+            patterns.extend(IMAGE_URL_PATTERNS)
+        if self.block_fonts:
+            patterns.extend(FONT_URL_PATTERNS)
+        if self.block_media:
+            patterns.extend(MEDIA_URL_PATTERNS)
+        if self.block_trackers:
+            patterns.extend(TRACKER_URL_PATTERNS)
+        patterns.extend(self.extra_block_patterns)
+        return patterns
+
+    def chrome_arguments(self) -> List[str]:
+        """精简配置对应的Chrome启动参数"""
+        if not self.enabled:
+            return []
+        args = [
+            '--disable-gpu',
+            '--disable-extensions',
+            '--disable-background-networking',
+            '--disable-component-update',
+            '--disable-default-apps',
+            '--disable-sync',
+            '--no-first-run',
+            '--mute-audio',
+            '--disable-dev-shm-usage',
+        ]
+        if self.block_images:
+            args.append('--blink-settings=imagesEnabled=false')
+        if self.renderer_memory_mb > 0:
+            args.append(f'--js-flags=--max-old-space-size={self.renderer_memory_mb}')
+        return args
+
+    def apply_to_chromium_options(self, co):
+        """将启动参数应用到 DrissionPage 的 ChromiumOptions"""
+        for arg in self.chrome_arguments():
+            co.set_argument(arg)
+        if self.enabled and self.block_images:
+            co.set_pref('profile.managed_default_content_settings.images', 2)
+        return co
+
+    def apply_to_selenium_options(self, options):
+        """将启动参数应用到 Selenium 的 ChromeOptions"""
+        for arg in self.chrome_arguments():
+            options.add_argument(arg)
+        if self.enabled and self.block_images:
+            options.add_experimental_option('prefs', {'profile.managed_default_content_settings.images': 2})
+        return options
+
+    def apply_to_drission_page(self, page):
+        """在 DrissionPage 页面上启用URL屏蔽"""
+        patterns = self.blocked_url_patterns()
+        if patterns:
+            page.set.blocked_urls(patterns)
+            logger.debug(f"已屏蔽 {len(patterns)} 条资源URL规则")
+
+    def apply_to_selenium_driver(self, driver):
+        """在 Selenium 驱动上启用URL屏蔽（通过CDP）"""
+        patterns = self.blocked_url_patterns()
+        if patterns:
+            driver.execute_cdp_cmd('Network.enable', {})
+            driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+            logger.debug(f"已屏蔽 {len(patterns)} 条资源URL规则")
+
+
+_default_profile: Optional[LeanScrapingProfile] = None
+
+
+def get_lean_profile() -> LeanScrapingProfile:
+    """获取进程共享的精简抓取配置"""
+    global _default_profile
+    if _default_profile is None:
+        _default_profile = LeanScrapingProfile.from_env()
+        logger.info(f"精简抓取配置: enabled={_default_profile.enabled}, "
+                    f"屏蔽规则 {len(_default_profile.blocked_url_patterns())} 条")
+    return _default_profile
+
+
+def measure_transferred_bytes(run_js: Callable[[str], Any]) -> Dict[str, Any]:
+    """
+    统计当前页面的传输字节数
+
+    跨域资源未返回 Timing-Allow-Origin 时浏览器会将其大小记为0，因此结果是下限估计。
+
+    Args:
+        run_js: 执行脚本的函数，如 page.run_js 或 driver.execute_script
+
+    Returns:
+        包含 transfer_bytes、decoded_bytes 和 resource_count 的字典
+    """
+    try:
+        raw = run_js(_TRANSFER_STATS_JS)
+        return json.loads(raw) if raw else {}
+    except Exception as e:
+        logger.debug(f"统计页面传输字节数失败: {str(e)}")
+        return {}
@@ -0,0 +1,156 @@
+"""
+Callsign Index - 呼号的前缀和 n-gram 索引
+
+在快照的规范化呼号列（去空白、转大写，最长8个字符）上建立两种索引：
+按呼号排序的行下标，用于前缀查询（如航空公司代码 "CCA*"）；
+长度1~3的 n-gram 倒排表（压缩为整数编码后排序存储），用于子串查询，
+长片段先求各三元组倒排表的交集，再只对候选行校验，查询不再扫描全部呼号
+"""
+
+import logging
+from typing import List
+
+import numpy as np
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+# 通配符：以 * 结尾的查询按前缀匹配
+PREFIX_WILDCARD = "*"
+
+# 呼号最大长度（与状态列的定长字符串一致）
+CALLSIGN_LENGTH = 8
+
+# 每个字符占用的编码位数（Unicode 码位最大 0x10FFFF）
+_CHAR_BITS = 21
+
+# 大于任何呼号字符的码位，用于前缀查询的上界
+_MAX_CHAR = chr(0x10FFFF)
+
+
+def _gram_codes(chars: np.ndarray, offset: int, length: int) -> np.ndarray:
+    """
+    把每行从 offset 开始、长 length 的 n-gram 编码为整数（不足3个字符的低位补0）
+
+    Args:
+        chars: 呼号的码位矩阵 (行数, CALLSIGN_LENGTH)
+        offset: 起始位置
+        length: n-gram 长度（1~3）
+
+    Returns:
+        每行的 n-gram 编码
+    """
+    codes = np.zeros(len(chars), dtype=np.int64)
+    for position in range(3):
+        codes <<= _CHAR_BITS
+        if position < length:
+            codes |= chars[:, offset + position].astype(np.int64)
+    return codes
+
+
+def _encode(gram: str) -> int:
+    """编码单个长度1~3的 n-gram，与 _gram_codes 一致"""
+    code = 0
+    for position in range(3):
+        code <<= _CHAR_BITS
+        if position < len(gram):
+            code |= ord(gram[position])
+    return code
+
+
+class CallsignIndex:
+    """规范化呼号列上的前缀和 n-gram 索引"""
+
+    def __init__(self, keys: np.ndarray):
+        """
+        构建索引
+
+        Args:
+            keys: 规范化的呼号列（去空白、转大写），空字符串表示无呼号
+        """
+        self.keys = np.asarray(keys, dtype=f'U{CALLSIGN_LENGTH}')
+        # 前缀索引：按呼号排序的行下标
+        self._order = np.argsort(self.keys, kind='stable')
+        self._sorted = self.keys[self._order]
+
+        # n-gram 倒排表：按 (编码, 行下标) 排序，每个编码对应一段连续的行下标
+        chars = self.keys.view(np.uint32).reshape(len(self.keys), CALLSIGN_LENGTH)
+        all_rows = np.arange(len(self.keys), dtype=np.int64)
+        codes, rows = [], []
+        for length in range(1, 4):
+            for offset in range(CALLSIGN_LENGTH - length + 1):
+                # 末尾补齐的空字符不属于呼号，包含它的 n-gram 不进入索引
+                present = chars[:, offset + length - 1] != 0
+                codes.append(_gram_codes(chars, offset, length)[present])
+                rows.append(all_rows[present])
+        codes = np.concatenate(codes) if codes else np.empty(0, dtype=np.int64)
+        rows = np.concatenate(rows) if rows else np.empty(0, dtype=np.int64)
+        order = np.lexsort((rows, codes))
+        codes, rows = codes[order], rows[order]
+        # 同一呼号中重复出现的 n-gram 只保留一次
+        keep = np.ones(len(codes), dtype=bool)
+        keep[1:] = (codes[1:] != codes[:-1]) | (rows[1:] != rows[:-1])
+        self._gram_codes, self._gram_rows = codes[keep], rows[keep]
+        self._gram_keys, self._gram_starts = np.unique(self._gram_codes, return_index=True)
+        self._gram_ends = np.append(self._gram_starts[1:], len(self._gram_codes))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _postings(self, gram: str) -> np.ndarray:
+        """包含 n-gram 的行下标（升序）"""
+        code = _encode(gram)
+        position = np.searchsorted(self._gram_keys, code)
+        if position >= len(self._gram_keys) or self._gram_keys[position] != code:
+            return np.empty(0, dtype=np.int64)
+        return self._gram_rows[self._gram_starts[position]:self._gram_ends[position]]
+
+    def prefix(self, key: str) -> np.ndarray:
+        """呼号以 key 开头的行下标（升序），如航空公司代码 "CCA" """
+        if not key or len(key) > CALLSIGN_LENGTH:
+            return np.empty(0, dtype=np.int64)
+        lo = np.searchsorted(self._sorted, key, side='left')
+        hi = np.searchsorted(self._sorted, key + _MAX_CHAR, side='left')
+        return np.sort(self._order[lo:hi])
+
+    def contains(self, key: str) -> np.ndarray:
+        """
+        呼号包含 key 的行下标（升序）
+
+        Args:
+            key: 规范化的呼号片段
+
+        Returns:
+            行下标数组
+        """
+        if not key or len(key) > CALLSIGN_LENGTH:
+            return np.empty(0, dtype=np.int64)
+        if len(key) <= 3:
+            return self._postings(key).copy()
+        # 从最短的三元组倒排表开始求交集，候选行再校验整个片段
+        postings = sorted((self._postings(key[i:i + 3]) for i in range(len(key) - 2)), key=len)
+        candidates = postings[0]
+        for other in postings[1:]:
+            if not len(candidates):
+                break
+            candidates = np.intersect1d(candidates, other, assume_unique=True)
+        if not len(candidates):
+            return candidates
+        return candidates[np.char.find(self.keys[candidates], key) >= 0]
+
+    def search(self, key: str) -> List[int]:
+        """
+        按查询语法查找：以 * 结尾为前缀查询，否则按子串匹配（如 "CCA1" 也匹配 CCA12、CCA123），
+        呼号与查询完全相同的行排在最前
+
+        Args:
+            key: 规范化的呼号或片段（如 "CCA1234"、"CCA*"、"1234"）
+
+        Returns:
+            匹配的行下标列表（前缀查询升序；子串查询先完全匹配的行，其余升序）
+        """
+        if key.endswith(PREFIX_WILDCARD):
+            return self.prefix(key.rstrip(PREFIX_WILDCARD)).tolist()
+        rows = self.contains(key)
+        exact = self.keys[rows] == key
+        return np.concatenate((rows[exact], rows[~exact])).tolist()
@@ -2,6 +2,8 @@
 """
 城市名称到机场代码映射字典
 格式：{"城市名(机场代码)": "机场代码小写"}
+
+字典未收录的名称会继续在离线机场索引（airport_index）中查找
 """
 
 CITIES_DICT = {
@@ -320,7 +322,9 @@ def get_airport_code(city_input):
     if code_lower in AIRPORT_TO_CITY:
         return code_lower
     
-    return None
+    # 查找离线机场索引（全球城市、别名、拼音、IATA/ICAO代码）
+    from .airport_index import get_airport_index
+    return get_airport_index().resolve_code(city_input)
 
 def get_city_name(city_input):
     """
@@ -343,11 +347,13 @@ def get_city_name(city_input):
     if code_lower in AIRPORT_TO_CITY:
         return AIRPORT_TO_CITY[code_lower]
     
-    return None
+    # 查找离线机场索引
+    from .airport_index import get_airport_index
+    return get_airport_index().display_name(city_input)
 
 if __name__ == "__main__":
     # 测试示例
-    test_inputs = ["上海(SHA)", "上海", "SHA", "sha", "北京", "BJS"]
+    test_inputs = ["上海(SHA)", "上海", "SHA", "sha", "北京", "BJS", "迪拜", "Vienna", "PVG"]
     
     print("测试城市字典功能：")
     for test_input in test_inputs:
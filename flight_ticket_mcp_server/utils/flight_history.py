@@ -0,0 +1,320 @@
+"""
+Flight History - 每架航班最近位置的环形缓冲区
+
+每次下载全球状态快照后，按 icao24 把新的位置点追加到该航班的环形缓冲区
+（NumPy 结构化数组，按需加倍扩容到容量上限后循环覆盖最旧的点），
+提供最近轨迹、时间窗口历史和"某时刻之后有变化的航班"增量查询；
+长时间未出现的航班被清除，内存占用有上限
+"""
+
+import os
+import time
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .opensky_snapshot import StateSnapshot, normalize_callsign
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+# 轨迹点字段：时间戳用 float64，其余用 float32（经纬度精度约1米）
+TRACK_POINT_DTYPE = np.dtype([
+    ('time', 'f8'),
+    ('latitude', 'f4'),
+    ('longitude', 'f4'),
+    ('altitude', 'f4'),
+    ('velocity', 'f4'),
+    ('true_track', 'f4'),
+    ('vertical_rate', 'f4'),
+    ('on_ground', '?'),
+])
+
+# 新航班缓冲区的初始点数
+_INITIAL_POINTS = 8
+
+
+def _optional(value: float, digits: int) -> Optional[float]:
+    """NaN 转为 None，其余四舍五入为 Python float"""
+    return None if value != value else round(float(value), digits)
+
+
+class TrackBuffer:
+    """单架航班的位置环形缓冲区"""
+
+    __slots__ = ('icao24', 'callsign', 'origin_country', 'capacity', 'last_seen', 'changed_at',
+                 'removed_at', '_points', '_start', '_count')
+
+    def __init__(self, icao24: str, capacity: int):
+        self.icao24 = icao24
+        self.callsign = ''
+        self.origin_country = ''
+        self.capacity = capacity
+        # 最后一次出现在快照中的时间、最后一次有新位置点的时间、从快照中消失的时间
+        self.last_seen = 0.0
+        self.changed_at = 0.0
+        self.removed_at: Optional[float] = None
+        self._points = np.zeros(min(_INITIAL_POINTS, capacity), dtype=TRACK_POINT_DTYPE)
+        self._start = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def last_time(self) -> Optional[float]:
+        """最新位置点的时间戳"""
+        if not self._count:
+            return None
+        return float(self._points['time'][(self._start + self._count - 1) % len(self._points)])
+
+    def append(self, point: Tuple):
+        """追加一个位置点，缓冲区已满时覆盖最旧的点"""
+        size = len(self._points)
+        if self._count < size:
+            # 未满时 _start 始终为0
+            self._points[self._count] = point
+            self._count += 1
+        elif size < self.capacity:
+            grown = np.zeros(min(size * 2, self.capacity), dtype=TRACK_POINT_DTYPE)
+            grown[:size] = self._points
+            self._points = grown
+            self._points[self._count] = point
+            self._count += 1
+        else:
+            self._points[self._start] = point
+            self._start = (self._start + 1) % size
+
+    def points(self) -> np.ndarray:
+        """按时间先后排列的全部位置点"""
+        if self._start == 0:
+            return self._points[:self._count]
+        return np.concatenate((self._points[self._start:], self._points[:self._start]))
+
+    def window(self, start: Optional[float] = None, end: Optional[float] = None) -> np.ndarray:
+        """时间戳位于 [start, end] 内的位置点"""
+        points = self.points()
+        times = points['time']
+        lo = np.searchsorted(times, start, side='left') if start is not None else 0
+        hi = np.searchsorted(times, end, side='right') if end is not None else len(points)
+        return points[lo:hi]
+
+
+def format_points(points: np.ndarray) -> List[Dict[str, Any]]:
+    """把位置点数组转为返回给客户端的字典列表"""
+    return [{
+        "time": datetime.fromtimestamp(point['time']).isoformat(),
+        "latitude": _optional(point['latitude'], 5),
+        "longitude": _optional(point['longitude'], 5),
+        "altitude_meters": _optional(point['altitude'], 1),
+        "ground_speed_ms": _optional(point['velocity'], 1),
+        "true_track": _optional(point['true_track'], 1),
+        "vertical_rate_ms": _optional(point['vertical_rate'], 2),
+        "on_ground": bool(point['on_ground']),
+    } for point in points]
+
+
+class FlightHistory:
+    """按 icao24 保存的航班位置历史"""
+
+    def __init__(self, capacity: Optional[int] = None, max_idle: Optional[float] = None):
+        """
+        Args:
+            capacity: 每架航班最多保留的位置点数，默认读取环境变量 OPENSKY_HISTORY_POINTS
+            max_idle: 航班从快照中消失多久（秒）后清除其历史，默认读取 OPENSKY_HISTORY_TTL
+        """
+        self.capacity = int(capacity if capacity is not None else os.getenv('OPENSKY_HISTORY_POINTS', '120'))
+        self.max_idle = float(max_idle if max_idle is not None else os.getenv('OPENSKY_HISTORY_TTL', '1800'))
+        self._lock = threading.Lock()
+        self._tracks: Dict[str, TrackBuffer] = {}
+        self._by_callsign: Dict[str, str] = {}
+        self._snapshot: Optional[StateSnapshot] = None
+        self._recorded_since: Optional[float] = None
+        self._stats = {"snapshots": 0, "points": 0, "evicted": 0}
+
+    def __len__(self) -> int:
+        return len(self._tracks)
+
+    @property
+    def latest_snapshot(self) -> Optional[StateSnapshot]:
+        """最近一次记录的快照"""
+        return self._snapshot
+
+    def record(self, snapshot: StateSnapshot):
+        """
+        记录一个快照：有新位置的航班追加位置点，消失的航班打上消失时间，清除长时间未出现的航班
+
+        Args:
+            snapshot: 新下载的全球状态快照
+        """
+        started = time.time()
+        columns = snapshot.columns
+        now = snapshot.fetched_at
+        times = np.where(np.isnan(columns.last_contact), float(snapshot.api_time or now), columns.last_contact)
+        has_position = ~(np.isnan(columns.latitude) | np.isnan(columns.longitude))
+        points = np.zeros(len(columns), dtype=TRACK_POINT_DTYPE)
+        points['time'] = times
+        points['latitude'] = columns.latitude
+        points['longitude'] = columns.longitude
+        points['altitude'] = columns.altitude
+        points['velocity'] = columns.velocity
+        points['true_track'] = columns.true_track
+        points['vertical_rate'] = columns.vertical_rate
+        points['on_ground'] = columns.on_ground
+
+        appended = 0
+        with self._lock:
+            if self._snapshot is not None and snapshot.fetched_at <= self._snapshot.fetched_at:
+                return
+            seen = set()
+            for index, icao24 in enumerate(columns.icao24.tolist()):
+                if not icao24 or icao24 in seen:
+                    continue
+                seen.add(icao24)
+                track = self._tracks.get(icao24)
+                if track is None:
+                    track = self._tracks[icao24] = TrackBuffer(icao24, self.capacity)
+                    track.changed_at = now
+                callsign = str(columns.callsign[index])
+                if callsign:
+                    track.callsign = callsign
+                    self._by_callsign[str(columns.callsign_key[index])] = icao24
+                track.origin_country = columns.origin_country[index]
+                track.last_seen = now
+                if track.removed_at is not None:
+                    track.removed_at = None
+                    track.changed_at = now
+                last_time = track.last_time
+                if has_position[index] and (last_time is None or points['time'][index] > last_time):
+                    track.append(points[index])
+                    track.changed_at = now
+                    appended += 1
+
+            evicted = []
+            for icao24, track in self._tracks.items():
+                if icao24 in seen:
+                    continue
+                if track.removed_at is None:
+                    track.removed_at = now
+                elif now - track.last_seen > self.max_idle:
+                    evicted.append(icao24)
+            for icao24 in evicted:
+                track = self._tracks.pop(icao24)
+                key = normalize_callsign(track.callsign)
+                if self._by_callsign.get(key) == icao24:
+                    del self._by_callsign[key]
+
+            self._snapshot = snapshot
+            if self._recorded_since is None:
+                self._recorded_since = now
+            self._stats["snapshots"] += 1
+            self._stats["points"] += appended
+            self._stats["evicted"] += len(evicted)
+        logger.debug(f"航班历史已记录: {appended} 个新位置点，跟踪 {len(self._tracks)} 架航班，"
+                     f"清除 {len(evicted)} 架，耗时 {time.time() - started:.3f} 秒")
+
+    def resolve(self, identifier: str) -> Optional[TrackBuffer]:
+        """
+        按 icao24 地址或呼号查找航班的缓冲区（同一呼号对应多架航班时取最近出现的）
+
+        Args:
+            identifier: icao24 地址（如 "780a3b"）或呼号（如 "CCA1234"）
+
+        Returns:
+            TrackBuffer，没有记录时返回None
+        """
+        with self._lock:
+            track = self._tracks.get(str(identifier or '').strip().lower())
+            if track is None:
+                icao24 = self._by_callsign.get(normalize_callsign(identifier))
+                track = self._tracks.get(icao24) if icao24 else None
+            return track
+
+    def trajectory(self, identifier: str, limit: Optional[int] = None) -> Optional[Tuple[TrackBuffer, np.ndarray]]:
+        """
+        最近的轨迹
+
+        Args:
+            identifier: icao24 地址或呼号
+            limit: 最多返回的位置点数（取最新的点），默认全部
+
+        Returns:
+            (TrackBuffer, 按时间先后排列的位置点)，没有记录时返回None
+        """
+        track = self.resolve(identifier)
+        if track is None:
+            return None
+        with self._lock:
+            points = track.points()
+        if limit is not None and limit > 0:
+            points = points[-limit:]
+        return track, points.copy()
+
+    def history(self, identifier: str, start: Optional[float] = None,
+                end: Optional[float] = None) -> Optional[Tuple[TrackBuffer, np.ndarray]]:
+        """
+        时间窗口内的位置历史
+
+        Args:
+            identifier: icao24 地址或呼号
+            start: 开始时间戳，默认不限
+            end: 结束时间戳，默认不限
+
+        Returns:
+            (TrackBuffer, 窗口内的位置点)，没有记录时返回None
+        """
+        track = self.resolve(identifier)
+        if track is None:
+            return None
+        with self._lock:
+            points = track.window(start, end)
+        return track, points.copy()
+
+    def changed_since(self, since: float,
+                      bbox: Optional[Sequence[float]] = None) -> Tuple[List[str], List[str]]:
+        """
+        某时刻之后有变化的航班
+
+        Args:
+            since: 时间戳（通常为上一次增量查询返回的服务器时间）
+            bbox: 可选的边界框 (min_lat, max_lat, min_lon, max_lon)，按最新位置过滤更新的航班
+
+        Returns:
+            (有新位置或新出现的航班 icao24 列表, 从快照中消失的航班 icao24 列表)
+        """
+        with self._lock:
+            updated = []
+            removed = []
+            for icao24, track in self._tracks.items():
+                if track.removed_at is not None:
+                    if track.removed_at > since:
+                        removed.append(icao24)
+                    continue
+                if track.changed_at <= since:
+                    continue
+                if bbox is not None:
+                    points = track.points()
+                    if not len(points):
+                        continue
+                    last = points[-1]
+                    if not (bbox[0] <= last['latitude'] <= bbox[1] and bbox[2] <= last['longitude'] <= bbox[3]):
+                        continue
+                updated.append(icao24)
+        return updated, removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回历史记录统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({
+                "aircraft": len(self._tracks),
+                "buffered_points": sum(len(track) for track in self._tracks.values()),
+                "capacity_per_aircraft": self.capacity,
+                "max_idle": self.max_idle,
+                "recorded_since": datetime.fromtimestamp(self._recorded_since).isoformat()
+                if self._recorded_since else None,
+            })
+        return stats
@@ -0,0 +1,225 @@
+"""
+Flight Store - 持久化的航班时刻与票价存储
+
+使用内嵌 SQLite（WAL 模式）保存携程航班路线和 chahangxian 直飞航段的抓取结果及抓取时间，
+按 出发地/目的地/日期 建立索引。进程重启后或同一主机上的多个进程
+可直接复用未过期的抓取结果，无需重新打开页面
+"""
+
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+# 数据来源
+SOURCE_CTRIP = "ctrip"
+SOURCE_CHAHANGXIAN = "chahangxian"
+
+# chahangxian 航段为每日执行的时刻，不区分日期
+SCHEDULE_DATE = ""
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS route_fetches (
+    source TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    flight_date TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    flight_count INTEGER NOT NULL,
+    PRIMARY KEY (source, origin, destination, flight_date)
+);
+CREATE TABLE IF NOT EXISTS flights (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT NOT NULL,
+    origin TEXT NOT NULL,
+    destination TEXT NOT NULL,
+    flight_date TEXT NOT NULL,
+    flight_number TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    fetched_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_flights_route ON flights (origin, destination, flight_date, source);
+CREATE INDEX IF NOT EXISTS idx_flights_date ON flights (flight_date);
+CREATE INDEX IF NOT EXISTS idx_route_fetches_time ON route_fetches (fetched_at);
+"""
+
+
+class FlightStore:
+    """基于 SQLite 的航班抓取结果存储，每个线程使用独立连接"""
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        初始化存储并创建表结构
+
+        Args:
+            path: 数据库文件路径，默认读取环境变量 FLIGHT_STORE_PATH
+        """
+        self.path = path or os.getenv('FLIGHT_STORE_PATH', 'cache/flight_store.sqlite3')
+        self.busy_timeout = float(os.getenv('FLIGHT_STORE_BUSY_TIMEOUT', '5'))
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "writes": 0, "errors": 0}
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+        logger.info(f"航班存储已就绪: {self.path}")
+
+    def _connect(self) -> sqlite3.Connection:
+        """返回当前线程的连接（首次使用时创建并开启WAL）"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.busy_timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def save_route(self, source: str, origin: str, destination: str, flight_date: str,
+                   flights: List[Dict[str, Any]], fetched_at: Optional[float] = None):
+        """
+        保存一次航线抓取结果（替换同一航线和日期的旧结果）
+
+        Args:
+            source: 数据来源，SOURCE_CTRIP 或 SOURCE_CHAHANGXIAN
+            origin: 出发地代码
+            destination: 目的地代码
+            flight_date: 出发日期（YYYY-MM-DD），每日时刻使用 SCHEDULE_DATE
+            flights: 可JSON序列化的航班字典列表
+            fetched_at: 抓取时间戳，默认当前时间
+        """
+        fetched_at = fetched_at or time.time()
+        key = (source, origin.lower(), destination.lower(), flight_date)
+        rows = [key + (str(flight.get('航班号') or flight.get('flight_number') or '').upper(), position,
+                       json.dumps(flight, ensure_ascii=False), fetched_at)
+                for position, flight in enumerate(flights)]
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM flights WHERE source=? AND origin=? AND destination=? AND flight_date=?", key)
+                conn.executemany(
+                    "INSERT INTO flights (source, origin, destination, flight_date, flight_number, position, payload,"
+                    " fetched_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.execute("INSERT OR REPLACE INTO route_fetches VALUES (?, ?, ?, ?, ?, ?)",
+                             key + (fetched_at, len(rows)))
+            self._count("writes")
+            logger.debug(f"航班存储写入 {key}: {len(rows)} 条")
+        except sqlite3.Error as e:
+            self._count("errors")
+            logger.warning(f"航班存储写入失败 {key}: {str(e)}")
+
+    def load_route(self, source: str, origin: str, destination: str, flight_date: str,
+                   max_age: float) -> Optional[Tuple[List[Dict[str, Any]], float]]:
+        """
+        读取未过期的航线抓取结果
+
+        Args:
+            source: 数据来源
+            origin: 出发地代码
+            destination: 目的地代码
+            flight_date: 出发日期，每日时刻使用 SCHEDULE_DATE
+            max_age: 最长可接受的数据年龄（秒）
+
+        Returns:
+            (按原顺序排列的航班字典列表, 抓取时间戳)；没有记录或已过期时返回None
+        """
+        key = (source, origin.lower(), destination.lower(), flight_date)
+        try:
+            conn = self._connect()
+            fetch = conn.execute("SELECT fetched_at FROM route_fetches WHERE source=? AND origin=? AND destination=?"
+                                 " AND flight_date=?", key).fetchone()
+            if fetch is None:
+                self._count("misses")
+                return None
+            if time.time() - fetch[0] > max_age:
+                self._count("expired")
+                return None
+            rows = conn.execute("SELECT payload FROM flights WHERE source=? AND origin=? AND destination=?"
+                                " AND flight_date=? ORDER BY position", key).fetchall()
+        except sqlite3.Error as e:
+            self._count("errors")
+            logger.warning(f"航班存储读取失败 {key}: {str(e)}")
+            return None
+        self._count("hits")
+        return [json.loads(row[0]) for row in rows], fetch[0]
+
+    def purge(self, older_than: float) -> int:
+        """
+        删除抓取时间早于 older_than 秒之前的记录
+
+        Returns:
+            删除的航线抓取记录数
+        """
+        cutoff = time.time() - older_than
+        try:
+            conn = self._connect()
+            with conn:
+                conn.execute("DELETE FROM flights WHERE fetched_at < ?", (cutoff,))
+                removed = conn.execute("DELETE FROM route_fetches WHERE fetched_at < ?", (cutoff,)).rowcount
+        except sqlite3.Error as e:
+            self._count("errors")
+            logger.warning(f"航班存储清理失败: {str(e)}")
+            return 0
+        if removed:
+            logger.info(f"航班存储清理过期航线 {removed} 条")
+        return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回存储规模和读写统计"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        try:
+            conn = self._connect()
+            stats["routes"] = conn.execute("SELECT COUNT(*) FROM route_fetches").fetchone()[0]
+            stats["flights"] = conn.execute("SELECT COUNT(*) FROM flights").fetchone()[0]
+        except sqlite3.Error as e:
+            logger.warning(f"读取航班存储统计失败: {str(e)}")
+        stats["path"] = self.path
+        return stats
+
+
+_flight_store: Optional[FlightStore] = None
+_flight_store_lock = threading.Lock()
+# 数据库打开失败后不再重试，避免每次请求重复打开和记录错误
+_flight_store_failed = False
+
+
+def flight_store_enabled() -> bool:
+    """是否启用持久化航班存储（环境变量 FLIGHT_STORE_ENABLED）"""
+    return os.getenv('FLIGHT_STORE_ENABLED', 'true').lower() == 'true'
+
+
+def get_flight_store() -> Optional[FlightStore]:
+    """
+    获取进程共享的航班存储（首次调用时创建，并清理超过 FLIGHT_STORE_RETENTION 秒的旧记录）
+
+    Returns:
+        FlightStore实例；未启用或数据库无法打开时返回None
+    """
+    global _flight_store, _flight_store_failed
+    if not flight_store_enabled() or _flight_store_failed:
+        return None
+    if _flight_store is None:
+        with _flight_store_lock:
+            if _flight_store is None and not _flight_store_failed:
+                try:
+                    store = FlightStore()
+                    store.purge(float(os.getenv('FLIGHT_STORE_RETENTION', '604800')))
+                    _flight_store = store
+                except (sqlite3.Error, OSError) as e:
+                    logger.warning(f"航班存储不可用，本进程内跳过持久化: {str(e)}")
+                    _flight_store_failed = True
+                    return None
+    return _flight_store
@@ -0,0 +1,163 @@
+"""
+Geocode Cache - 持久化的城市地理编码缓存
+
+城市名按规范化后的键缓存经纬度，找到和找不到（负缓存）的结果分别设置有效期，
+写入本地JSON文件，重启后继续使用；机场参考数据中已有坐标的城市直接命中，
+不需要请求在线地理编码服务（Nominatim 限速约每秒1次）
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from .airport_index import get_airport_index
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+# 查询状态
+GEOCODE_AIRPORT_INDEX = "airport_index"
+GEOCODE_HIT = "hit"
+GEOCODE_NEGATIVE = "negative"
+GEOCODE_MISS = "miss"
+
+
+def geocode_key(name: str) -> str:
+    """规范化城市名：合并空白、转小写，去掉结尾的"市"/"省" """
+    key = re.sub(r'\s+', ' ', str(name)).strip().lower()
+    if len(key) > 2 and key[-1] in '市省':
+        key = key[:-1]
+    return key
+
+
+class GeocodeCache:
+    """带正/负结果TTL的地理编码缓存"""
+
+    def __init__(self, path: Optional[str] = None, ttl: Optional[float] = None,
+                 negative_ttl: Optional[float] = None):
+        """
+        初始化缓存并加载缓存文件
+
+        Args:
+            path: 缓存文件路径，默认读取环境变量 GEOCODE_CACHE_PATH
+            ttl: 找到坐标的结果有效期（秒），默认读取 GEOCODE_CACHE_TTL
+            negative_ttl: 找不到坐标的结果有效期（秒），默认读取 GEOCODE_NEGATIVE_TTL
+        """
+        self.path = path or os.getenv('GEOCODE_CACHE_PATH', 'cache/geocode_cache.json')
+        self.ttl = float(ttl if ttl is not None else os.getenv('GEOCODE_CACHE_TTL', '2592000'))
+        self.negative_ttl = float(negative_ttl if negative_ttl is not None
+                                  else os.getenv('GEOCODE_NEGATIVE_TTL', '86400'))
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._stats = {"airport_index_hits": 0, "hits": 0, "negative_hits": 0, "misses": 0, "writes": 0}
+        self._load()
+
+    def _load(self):
+        """加载缓存文件，丢弃已过期的条目"""
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取地理编码缓存失败: {str(e)}")
+            return
+        now = time.time()
+        self._entries = {key: entry for key, entry in entries.items()
+                         if isinstance(entry, dict) and entry.get('expires_at', 0) > now}
+        logger.info(f"地理编码缓存加载完成: {len(self._entries)} 条")
+
+    def _save(self):
+        """写入缓存文件（调用方持有锁）"""
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning(f"写入地理编码缓存失败: {str(e)}")
+
+    def lookup(self, name: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        查询城市坐标，依次使用机场参考数据和缓存
+
+        Args:
+            name: 城市名
+
+        Returns:
+            (坐标字典 {"latitude", "longitude", "name"}, 状态)；状态为 "airport_index"、"hit"、
+            "negative"（缓存了找不到的结果，坐标为None）或 "miss"（需在线查询，坐标为None）
+        """
+        index = get_airport_index()
+        coordinates = index.coordinates(name)
+        if coordinates:
+            city = index.lookup_city(name)
+            with self._lock:
+                self._stats["airport_index_hits"] += 1
+            return {"latitude": coordinates[0], "longitude": coordinates[1],
+                    "name": city['city'] if city else name}, GEOCODE_AIRPORT_INDEX
+
+        key = geocode_key(name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry['expires_at'] <= time.time():
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None, GEOCODE_MISS
+            if not entry.get('found'):
+                self._stats["negative_hits"] += 1
+                return None, GEOCODE_NEGATIVE
+            self._stats["hits"] += 1
+            return {"latitude": entry['latitude'], "longitude": entry['longitude'],
+                    "name": entry.get('name') or name}, GEOCODE_HIT
+
+    def store(self, name: str, coord: Optional[Dict[str, Any]]):
+        """
+        记录在线查询结果并写入缓存文件
+
+        Args:
+            name: 查询时使用的城市名
+            coord: 坐标字典 {"latitude", "longitude", "name"}；找不到时传None（负缓存）
+        """
+        now = time.time()
+        if coord:
+            entry = {"found": True, "latitude": coord['latitude'], "longitude": coord['longitude'],
+                     "name": coord.get('name') or name, "cached_at": now, "expires_at": now + self.ttl}
+        else:
+            entry = {"found": False, "cached_at": now, "expires_at": now + self.negative_ttl}
+        with self._lock:
+            self._entries[geocode_key(name)] = entry
+            self._stats["writes"] += 1
+            self._save()
+        logger.info(f"已缓存城市 '{name}' 的地理编码结果: {'找到' if coord else '未找到'}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回缓存统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        stats.update({"path": self.path, "ttl": self.ttl, "negative_ttl": self.negative_ttl})
+        return stats
+
+
+_geocode_cache: Optional[GeocodeCache] = None
+_geocode_cache_lock = threading.Lock()
+
+
+def get_geocode_cache() -> GeocodeCache:
+    """获取进程共享的地理编码缓存（首次调用时加载）"""
+    global _geocode_cache
+    if _geocode_cache is None:
+        with _geocode_cache_lock:
+            if _geocode_cache is None:
+                _geocode_cache = GeocodeCache()
+    return _geocode_cache
@@ -0,0 +1,273 @@
+"""
+OpenSky Snapshot - 共享的全球航班状态快照
+
+全球 /states/all 数据（上万架航班）在每个刷新周期内只下载和解析一次，
+按呼号（前缀和 n-gram 子串索引）、icao24 和经纬度网格建立索引，按呼号查询、批量跟踪、机场和区域查询都直接查索引，
+不再为每次查询重复下载数据；可选的后台轮询器按固定间隔刷新快照，工具调用只读内存
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .singleflight import get_singleflight
+from .state_columns import StateColumns
+from .spatial_index import GridIndex
+from .callsign_index import CallsignIndex
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+# 后台轮询时快照在轮询间隔之外额外视为新鲜的秒数（覆盖一次下载的耗时）
+POLL_GRACE_SECONDS = 30
+
+
+class OpenSkySnapshotError(Exception):
+    """全球状态快照获取失败且没有可用的旧快照"""
+
+
+def normalize_callsign(callsign: Optional[str]) -> str:
+    """统一呼号格式：去空白、转大写"""
+    return "".join(str(callsign or "").split()).upper()
+
+
+class StateSnapshot:
+    """一次全球状态下载的列式数据及其呼号、icao24 索引"""
+
+    def __init__(self, columns: StateColumns, api_time: Optional[int] = None,
+                 fetched_at: Optional[float] = None):
+        """
+        构建快照
+
+        Args:
+            columns: 状态向量的列式数据
+            api_time: 接口返回的数据时间戳
+            fetched_at: 下载时间戳，默认当前时间
+        """
+        self.columns = columns
+        self.api_time = api_time
+        self.fetched_at = fetched_at or time.time()
+        self.by_icao24: Dict[str, int] = {icao24: index for index, icao24 in enumerate(columns.icao24.tolist())
+                                          if icao24}
+        self._spatial: Optional[GridIndex] = None
+        self._callsign_index: Optional[CallsignIndex] = None
+
+    @classmethod
+    def from_response(cls, data: Optional[Dict[str, Any]]) -> "StateSnapshot":
+        """由 /states/all 的响应JSON构建快照"""
+        data = data or {}
+        return cls(StateColumns(data.get('states')), api_time=data.get('time'))
+
+    def __len__(self) -> int:
+        return len(self.columns)
+
+    @property
+    def age_seconds(self) -> float:
+        """快照距今的秒数"""
+        return time.time() - self.fetched_at
+
+    @property
+    def spatial(self) -> GridIndex:
+        """经纬度空间索引（首次使用时构建）"""
+        if self._spatial is None:
+            self._spatial = GridIndex(self.columns.latitude, self.columns.longitude)
+        return self._spatial
+
+    @property
+    def callsign_index(self) -> CallsignIndex:
+        """呼号前缀和子串索引（首次使用时构建）"""
+        if self._callsign_index is None:
+            self._callsign_index = CallsignIndex(self.columns.callsign_key)
+        return self._callsign_index
+
+    def find_callsign_rows(self, pattern: str) -> List[int]:
+        """
+        按呼号查找行下标：以 * 结尾时按前缀查询，否则按子串查 n-gram 索引（完全匹配的行排在最前）
+
+        Args:
+            pattern: 呼号、呼号片段或前缀（如 "CCA1234"、"1234"、"CCA*"）
+
+        Returns:
+            匹配的行下标列表
+        """
+        key = normalize_callsign(pattern)
+        if not key:
+            return []
+        return self.callsign_index.search(key)
+
+    def find_callsign(self, pattern: str) -> List[Dict[str, Any]]:
+        """按呼号查找航班，只为匹配的行构建字典"""
+        return self.columns.rows(self.find_callsign_rows(pattern))
+
+    def find_callsigns(self, patterns: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+        """批量按呼号查找，返回 呼号 -> 匹配航班列表"""
+        return {pattern: self.find_callsign(pattern) for pattern in patterns}
+
+    def find_icao24(self, icao24: str) -> Optional[Dict[str, Any]]:
+        """按 icao24 地址查找航班"""
+        index = self.by_icao24.get(str(icao24 or "").strip().lower())
+        return self.columns.row(index) if index is not None else None
+
+
+class StateSnapshotManager:
+    """按刷新周期维护全球状态快照，同一时刻只有一个下载"""
+
+    def __init__(self, fetch: Callable[[], Tuple[int, Optional[Dict[str, Any]]]],
+                 refresh_interval: Optional[float] = None, max_stale: Optional[float] = None):
+        """
+        Args:
+            fetch: 下载全球状态的函数，返回 (HTTP状态码, 解析后的JSON或None)
+            refresh_interval: 快照刷新间隔（秒），默认读取 OPENSKY_SNAPSHOT_INTERVAL
+            max_stale: 刷新失败时仍可使用旧快照的最长时间（秒），默认读取 OPENSKY_SNAPSHOT_MAX_STALE
+        """
+        self._fetch = fetch
+        self.refresh_interval = float(refresh_interval if refresh_interval is not None
+                                      else os.getenv('OPENSKY_SNAPSHOT_INTERVAL', '10'))
+        self.max_stale = float(max_stale if max_stale is not None
+                               else os.getenv('OPENSKY_SNAPSHOT_MAX_STALE', '60'))
+        self._snapshot: Optional[StateSnapshot] = None
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "reused": 0, "downloads": 0, "failures": 0, "stale_served": 0}
+        self._listeners: List[Callable[[StateSnapshot], None]] = []
+        # 后台轮询间隔（秒），轮询器运行时由其设置
+        self.poll_interval: Optional[float] = None
+
+    def subscribe(self, listener: Callable[[StateSnapshot], None]):
+        """注册快照更新回调，每次下载新快照后以新快照调用"""
+        self._listeners.append(listener)
+
+    def _fresh_window(self) -> float:
+        """快照视为新鲜的秒数：后台轮询时放宽到轮询间隔，避免工具调用触发下载"""
+        if self.poll_interval:
+            return max(self.refresh_interval, self.poll_interval + POLL_GRACE_SECONDS)
+        return self.refresh_interval
+
+    def get(self) -> StateSnapshot:
+        """
+        返回未超过刷新间隔的快照，过期时下载新快照
+
+        Returns:
+            StateSnapshot
+
+        Raises:
+            OpenSkySnapshotError: 接口返回非200且没有可用旧快照
+            requests.exceptions.RequestException: 网络请求失败且没有可用旧快照
+        """
+        with self._lock:
+            self._stats["requests"] += 1
+            snapshot = self._snapshot
+            if snapshot is not None and snapshot.age_seconds < self._fresh_window():
+                self._stats["reused"] += 1
+                return snapshot
+        return self._get_or_refresh()
+
+    def refresh(self) -> StateSnapshot:
+        """
+        立即下载新快照（后台轮询使用），与进行中的下载合并
+        
+        Returns:
+            StateSnapshot
+        """
+        return get_singleflight("opensky_snapshot").do("global", self._refresh)[0]
+
+    def _get_or_refresh(self) -> StateSnapshot:
+        """下载新快照，失败时在允许范围内退回旧快照"""
+        try:
+            return self.refresh()
+        except Exception as e:
+            with self._lock:
+                self._stats["failures"] += 1
+                snapshot = self._snapshot
+                if snapshot is not None and snapshot.age_seconds < self.max_stale:
+                    self._stats["stale_served"] += 1
+                    logger.warning(f"全球状态快照刷新失败，使用 {int(snapshot.age_seconds)} 秒前的快照: {str(e)}")
+                    return snapshot
+            raise
+
+    def _refresh(self) -> StateSnapshot:
+        """下载并解析全球状态，替换当前快照"""
+        started = time.time()
+        status_code, data = self._fetch()
+        if status_code != 200:
+            raise OpenSkySnapshotError(f"API请求失败: HTTP {status_code}")
+        snapshot = StateSnapshot.from_response(data)
+        with self._lock:
+            self._snapshot = snapshot
+            self._stats["downloads"] += 1
+        logger.info(f"全球状态快照已更新: {len(snapshot)} 架航班，{int((snapshot.columns.callsign_key != '').sum())} 架有呼号，"
+                    f"耗时 {time.time() - started:.2f} 秒")
+        for listener in self._listeners:
+            try:
+                listener(snapshot)
+            except Exception as e:
+                logger.error(f"快照更新回调失败: {str(e)}", exc_info=True)
+        return snapshot
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回快照统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            snapshot = self._snapshot
+        stats.update({
+            "refresh_interval": self.refresh_interval,
+            "poll_interval": self.poll_interval,
+            "flights": len(snapshot) if snapshot else 0,
+            "age_seconds": round(snapshot.age_seconds, 1) if snapshot else None,
+        })
+        return stats
+
+
+class SnapshotPoller:
+    """后台线程按固定间隔刷新全球状态快照"""
+
+    def __init__(self, manager: StateSnapshotManager, interval: Optional[float] = None):
+        """
+        Args:
+            manager: 要刷新的快照管理器
+            interval: 轮询间隔（秒），默认读取环境变量 OPENSKY_POLL_INTERVAL
+        """
+        self.manager = manager
+        self.interval = float(interval if interval is not None else os.getenv('OPENSKY_POLL_INTERVAL', '60'))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._failures = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """启动轮询线程（已在运行时忽略）"""
+        if self.running:
+            return
+        self._stop.clear()
+        self.manager.poll_interval = self.interval
+        self._thread = threading.Thread(target=self._run, name="opensky-poller", daemon=True)
+        self._thread.start()
+        logger.info(f"OpenSky后台轮询已启动，间隔 {self.interval} 秒")
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止轮询线程，恢复按需下载"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._thread = None
+        self.manager.poll_interval = None
+        logger.info("OpenSky后台轮询已停止")
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.manager.refresh()
+                self._failures = 0
+            except Exception as e:
+                self._failures += 1
+                logger.warning(f"OpenSky后台轮询失败（连续 {self._failures} 次）: {str(e)}")
+            # 连续失败时按指数退避，最长为10个轮询间隔
+            self._stop.wait(self.interval * min(10, 2 ** self._failures) if self._failures else self.interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回轮询器状态"""
+        return {"running": self.running, "interval": self.interval, "consecutive_failures": self._failures}
@@ -0,0 +1,191 @@
+"""
+Page Readiness - 页面就绪检测引擎
+
+在页面内注入 MutationObserver 和网络请求计数器，以事件驱动的方式判断
+航班列表何时渲染完成，替代固定时长的 sleep 和轮询，并记录每个等待阶段的耗时
+"""
+
+import json
+import time
+import logging
+from typing import Any, Dict, Optional
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+
+# 注入页面的状态追踪脚本（可重复执行）
+_INSTALL_JS = """
+if (!window.__ftReadiness) {
+    const st = {lastMutation: performance.now(), lastNetwork: performance.now(), inflight: 0};
+    window.__ftReadiness = st;
+    new MutationObserver(() => { st.lastMutation = performance.now(); })
+        .observe(document.documentElement, {childList: true, subtree: true});
+    const done = () => { st.inflight = Math.max(0, st.inflight - 1); st.lastNetwork = performance.now(); };
+    const send = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        st.inflight += 1; st.lastNetwork = performance.now();
+        this.addEventListener('loadend', done, {once: true});
+        return send.apply(this, arguments);
+    };
+    if (window.fetch) {
+        const origFetch = window.fetch;
+        window.fetch = function () {
+            st.inflight += 1; st.lastNetwork = performance.now();
+            return origFetch.apply(this, arguments).finally(done);
+        };
+    }
+}
+return true;
+"""
+
+# 等待条件满足的脚本：返回Promise，条件满足或超时后resolve
+#   arguments: selector, minCount, quietMs, timeoutMs, requireNetworkIdle
+_WAIT_JS = """
+const [selector, minCount, quietMs, timeoutMs, requireIdle] = arguments;
+const st = window.__ftReadiness;
+return new Promise(resolve => {
+    const start = performance.now();
+    const check = () => {
+        const now = performance.now();
+        const count = selector ? document.querySelectorAll(selector).length : 0;
+        let quiet = now - st.lastMutation >= quietMs;
+        if (requireIdle) {
+            quiet = quiet && st.inflight === 0 && now - st.lastNetwork >= quietMs;
+        }
+        const timedOut = now - start >= timeoutMs;
+        if ((count >= minCount && quiet) || timedOut) {
+            resolve(JSON.stringify({count: count, timed_out: timedOut && !(count >= minCount && quiet),
+                                    inflight: st.inflight}));
+        } else {
+            setTimeout(check, Math.max(20, Math.min(quietMs / 2, 100)));
+        }
+    };
+    check();
+});
+"""
+
+_DOCUMENT_READY_JS = """
+const timeoutMs = arguments[0];
+return new Promise(resolve => {
+    if (document.readyState === 'complete') { resolve(true); return; }
+    const timer = setTimeout(() => resolve(false), timeoutMs);
+    window.addEventListener('load', () => { clearTimeout(timer); resolve(true); }, {once: true});
+});
+"""
+
+_SCROLL_TO_BOTTOM_JS = "window.scrollTo(0, document.documentElement.scrollHeight); return true;"
+
+
+class PageReadinessEngine:
+    """页面就绪检测引擎"""
+
+    def __init__(self, page, item_selector: str = '.flight-item', quiet_ms: int = 400,
+                 growth_timeout: float = 2.0, max_scroll_rounds: int = 12):
+        """
+        初始化就绪检测引擎
+
+        Args:
+            page: DrissionPage页面对象
+            item_selector: 列表项的CSS选择器，用于判断内容是否继续增长
+            quiet_ms: DOM无变化多久（毫秒）视为渲染稳定
+            growth_timeout: 每次滚动后等待新列表项出现的最长时间（秒）
+            max_scroll_rounds: 最多滚动次数
+        """
+        self.page = page
+        self.item_selector = item_selector
+        self.quiet_ms = quiet_ms
+        self.growth_timeout = growth_timeout
+        self.max_scroll_rounds = max_scroll_rounds
+        self.timings: Dict[str, float] = {}
+        self.item_count = 0
+
+    def _record(self, phase: str, start: float):
+        elapsed = round(time.time() - start, 3)
+        self.timings[phase] = round(self.timings.get(phase, 0.0) + elapsed, 3)
+        logger.debug(f"页面就绪阶段 {phase} 耗时 {elapsed}s")
+
+    def _wait(self, min_count: int, timeout: float, require_idle: bool = False) -> Dict[str, Any]:
+        """在页面内等待直到列表项数量达到min_count且DOM稳定，或超时"""
+        raw = self.page.run_js(_WAIT_JS, self.item_selector, min_count, self.quiet_ms,
+                               int(timeout * 1000), require_idle, timeout=timeout + 5)
+        state = json.loads(raw) if raw else {"count": 0, "timed_out": True, "inflight": 0}
+        self.item_count = state.get("count", self.item_count)
+        return state
+
+    def install(self) -> bool:
+        """注入DOM变化和网络请求追踪脚本"""
+        start = time.time()
+        try:
+            return bool(self.page.run_js(_INSTALL_JS))
+        finally:
+            self._record("install", start)
+
+    def wait_for_document_ready(self, timeout: float = 30) -> bool:
+        """等待 document.readyState 变为 complete"""
+        start = time.time()
+        try:
+            ready = bool(self.page.run_js(_DOCUMENT_READY_JS, int(timeout * 1000), timeout=timeout + 5))
+            if not ready:
+                logger.warning("页面加载超时，继续执行...")
+            return ready
+        finally:
+            self._record("document_ready", start)
+
+    def wait_for_items(self, timeout: float = 30) -> bool:
+        """
+        等待第一批列表项渲染完成
+
+        Returns:
+            是否在超时前出现了列表项
+        """
+        start = time.time()
+        try:
+            state = self._wait(1, timeout)
+            logger.info(f"首批列表项就绪: {state.get('count', 0)} 项")
+            return state.get("count", 0) > 0
+        finally:
+            self._record("first_items", start)
+
+    def scroll_until_stable(self, on_growth=None) -> int:
+        """
+        滚动到页面底部，直到列表项数量不再增长
+
+        Args:
+            on_growth: 可选回调，每次列表项增长后以当前数量调用
+
+        Returns:
+            最终的列表项数量
+        """
+        start = time.time()
+        try:
+            previous = self.item_count
+            for round_no in range(1, self.max_scroll_rounds + 1):
+                self.page.run_js(_SCROLL_TO_BOTTOM_JS)
+                state = self._wait(previous + 1, self.growth_timeout)
+                count = state.get("count", previous)
+                logger.debug(f"第{round_no}次滚动后列表项数量: {count}")
+                if count <= previous:
+                    break
+                previous = count
+                if on_growth:
+                    on_growth(count)
+            return previous
+        finally:
+            self._record("scroll", start)
+
+    def wait_for_network_idle(self, timeout: float = 5) -> bool:
+        """等待页面无进行中的XHR/fetch请求且DOM稳定"""
+        start = time.time()
+        try:
+            state = self._wait(0, timeout, require_idle=True)
+            return not state.get("timed_out")
+        finally:
+            self._record("network_idle", start)
+
+    def get_timings(self) -> Dict[str, Any]:
+        """返回各阶段耗时（秒）和总耗时"""
+        timings = dict(self.timings)
+        timings["total"] = round(sum(self.timings.values()), 3)
+        timings["item_count"] = self.item_count
+        return timings
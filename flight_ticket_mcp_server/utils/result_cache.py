@@ -0,0 +1,228 @@
+"""
+Result Cache - 带TTL和LRU淘汰的查询结果缓存
+
+每个工具使用一个按名称区分的缓存实例（航班路线、中转航段、天气等），
+条目过期后在 stale 窗口内仍可立即返回旧值，同时在后台刷新（stale-while-revalidate），
+并统计命中、过期命中、未命中、淘汰等计数
+"""
+
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+# 缓存查询状态
+CACHE_HIT = "hit"
+CACHE_STALE = "stale"
+CACHE_MISS = "miss"
+
+
+class _CacheEntry:
+    __slots__ = ("value", "stored_at", "expires_at", "stale_until")
+
+    def __init__(self, value: Any, ttl: float, stale_ttl: float):
+        now = time.time()
+        self.value = value
+        self.stored_at = now
+        self.expires_at = now + ttl
+        self.stale_until = now + ttl + stale_ttl
+
+
+class TTLCache:
+    """线程安全的TTL + LRU缓存"""
+
+    def __init__(self, name: str, ttl: Optional[float] = None, max_size: Optional[int] = None,
+                 stale_ttl: Optional[float] = None):
+        """
+        初始化缓存
+
+        Args:
+            name: 缓存名称（用于日志和统计）
+            ttl: 条目有效期（秒），默认读取环境变量 FLIGHT_CACHE_DURATION
+            max_size: 最大条目数，默认读取环境变量 RESPONSE_CACHE_SIZE
+            stale_ttl: 过期后仍可返回旧值并后台刷新的时长（秒），默认读取 CACHE_STALE_DURATION，0 表示不返回旧值
+        """
+        self.name = name
+        self.ttl = float(ttl if ttl is not None else os.getenv('FLIGHT_CACHE_DURATION', '300'))
+        self.max_size = int(max_size if max_size is not None else os.getenv('RESPONSE_CACHE_SIZE', '1000'))
+        self.stale_ttl = float(stale_ttl if stale_ttl is not None else os.getenv('CACHE_STALE_DURATION', str(self.ttl)))
+        self._entries: "OrderedDict[Hashable, _CacheEntry]" = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "refreshes": 0,
+            "refresh_failures": 0,
+        }
+
+    def get(self, key: Hashable) -> Tuple[Any, str]:
+        """
+        查询缓存
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            (值, 状态)；状态为 "hit"（有效）、"stale"（已过期但在stale窗口内）或 "miss"（值为None）
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None, CACHE_MISS
+            if now < entry.expires_at:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry.value, CACHE_HIT
+            if now < entry.stale_until:
+                self._entries.move_to_end(key)
+                self._stats["stale_hits"] += 1
+                return entry.value, CACHE_STALE
+            del self._entries[key]
+            self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            return None, CACHE_MISS
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """
+        写入缓存，超出容量时淘汰最久未使用的条目
+
+        Args:
+            key: 缓存键
+            value: 缓存值
+            ttl: 本条目的有效期（秒），默认使用缓存的ttl
+        """
+        if self.max_size <= 0:
+            return
+        entry = _CacheEntry(value, self.ttl if ttl is None else ttl, self.stale_ttl)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                self._stats["evictions"] += 1
+                logger.debug(f"缓存 {self.name} 淘汰条目: {evicted}")
+
+    def invalidate(self, key: Hashable):
+        """删除指定条目"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def refresh_async(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None):
+        """
+        在后台线程中重新加载条目（同一键同时只有一个刷新任务）
+
+        Args:
+            key: 缓存键
+            loader: 加载函数，返回None时不写入缓存
+            ttl: 本条目的有效期（秒）
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                value = loader()
+                if value is not None:
+                    self.set(key, value, ttl)
+                with self._lock:
+                    self._stats["refreshes"] += 1
+                logger.debug(f"缓存 {self.name} 后台刷新完成: {key}")
+            except Exception as e:
+                with self._lock:
+                    self._stats["refresh_failures"] += 1
+                logger.warning(f"缓存 {self.name} 后台刷新失败 {key}: {str(e)}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, name=f"cache-refresh-{self.name}", daemon=True).start()
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Tuple[Any, str]:
+        """
+        查询缓存，未命中时同步加载；过期命中时立即返回旧值并在后台刷新
+
+        Args:
+            key: 缓存键
+            loader: 加载函数，返回None时不写入缓存（用于表示失败）
+            ttl: 本条目的有效期（秒）
+
+        Returns:
+            (值, 状态)
+        """
+        value, state = self.get(key)
+        if state == CACHE_HIT:
+            return value, state
+        if state == CACHE_STALE:
+            self.refresh_async(key, loader, ttl)
+            return value, state
+        value = loader()
+        if value is not None:
+            self.set(key, value, ttl)
+        return value, CACHE_MISS
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回缓存统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+            stats["refreshing"] = len(self._refreshing)
+        lookups = stats["hits"] + stats["stale_hits"] + stats["misses"]
+        stats.update({
+            "name": self.name,
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "stale_ttl": self.stale_ttl,
+            "hit_rate": round((stats["hits"] + stats["stale_hits"]) / lookups, 4) if lookups else 0.0,
+        })
+        return stats
+
+
+_caches: Dict[str, TTLCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name: str, ttl: Optional[float] = None, max_size: Optional[int] = None,
+              stale_ttl: Optional[float] = None) -> TTLCache:
+    """
+    获取（首次调用时创建）指定名称的进程共享缓存
+
+    Args:
+        name: 缓存名称，如 "flight_routes"、"transfer_legs"、"weather"
+        ttl / max_size / stale_ttl: 首次创建时使用的配置，默认读取环境变量
+
+    Returns:
+        TTLCache实例
+    """
+    cache = _caches.get(name)
+    if cache is None:
+        with _caches_lock:
+            cache = _caches.get(name)
+            if cache is None:
+                cache = TTLCache(name, ttl=ttl, max_size=max_size, stale_ttl=stale_ttl)
+                _caches[name] = cache
+    return cache
+
+
+def get_all_cache_stats() -> Dict[str, Dict[str, Any]]:
+    """返回所有已创建缓存的统计"""
+    with _caches_lock:
+        caches = list(_caches.values())
+    return {cache.name: cache.get_stats() for cache in caches}
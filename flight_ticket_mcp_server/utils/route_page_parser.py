@@ -0,0 +1,144 @@
+"""
+Route Page Parser - 航线页面HTML解析
+
+基于标准库 html.parser 流式解析 chahangxian.com 服务端渲染的航线页面，
+提取每个 J_link 航班块的文本行（按块级元素换行，与浏览器 innerText 一致）、
+airline-box 中航司logo的alt文本以及是否为中转航班，无需启动浏览器
+"""
+
+import re
+import logging
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+# 在渲染文本中产生换行的块级元素
+_BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'fieldset',
+    'figcaption', 'figure', 'footer', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header',
+    'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'tbody', 'td', 'th',
+    'thead', 'tr', 'ul',
+}
+
+# 没有结束标签的空元素
+_VOID_TAGS = {
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param',
+    'source', 'track', 'wbr',
+}
+
+# 内容不参与渲染文本的元素
+_SKIP_TAGS = {'script', 'style', 'noscript', 'template'}
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _classes(attrs) -> List[str]:
+    for name, value in attrs:
+        if name == 'class' and value:
+            return value.split()
+    return []
+
+
+class _RouteBlockParser(HTMLParser):
+    """流式提取 J_link 航班块"""
+
+    def __init__(self, block_class: str = 'J_link', airline_class: str = 'airline-box',
+                 transfer_class: str = 'transfer'):
+        super().__init__(convert_charrefs=True)
+        self.block_class = block_class
+        self.airline_class = airline_class
+        self.transfer_class = transfer_class
+        self.blocks: List[Dict[str, Any]] = []
+        self._stack: List[str] = []
+        self._block_depth: Optional[int] = None
+        self._airline_depth: Optional[int] = None
+        self._skip_depth: Optional[int] = None
+        self._block: Optional[Dict[str, Any]] = None
+        self._line: List[str] = []
+
+    def _flush_line(self):
+        if self._block is None:
+            return
+        text = _WHITESPACE.sub(' ', ''.join(self._line)).strip()
+        if text:
+            self._block['lines'].append(text)
+        self._line = []
+
+    def handle_starttag(self, tag, attrs):
+        classes = _classes(attrs)
+
+        if self._block is None and self.block_class in classes:
+            self._block = {'lines': [], 'airline': None, 'is_transfer': False}
+            self._block_depth = len(self._stack)
+            self._line = []
+        elif self._block is not None:
+            if tag in _BLOCK_TAGS:
+                self._flush_line()
+            if self.transfer_class in classes:
+                self._block['is_transfer'] = True
+            if self.airline_class in classes and self._airline_depth is None:
+                self._airline_depth = len(self._stack)
+            if tag == 'img' and self._airline_depth is not None and self._block['airline'] is None:
+                self._block['airline'] = dict(attrs).get('alt')
+            if tag in _SKIP_TAGS and self._skip_depth is None:
+                self._skip_depth = len(self._stack)
+
+        if tag not in _VOID_TAGS:
+            self._stack.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag not in self._stack:
+            return
+        # 容错：自动闭合未显式结束的子元素
+        while self._stack:
+            popped = self._stack.pop()
+            depth = len(self._stack)
+            if self._skip_depth is not None and depth <= self._skip_depth:
+                self._skip_depth = None
+            if self._airline_depth is not None and depth <= self._airline_depth:
+                self._airline_depth = None
+            if self._block is not None:
+                if popped in _BLOCK_TAGS:
+                    self._flush_line()
+                if depth <= self._block_depth:
+                    self._flush_line()
+                    self.blocks.append(self._block)
+                    self._block = None
+                    self._block_depth = None
+            if popped == tag:
+                break
+
+    def handle_data(self, data):
+        if self._block is not None and self._skip_depth is None:
+            self._line.append(data)
+
+    def close(self):
+        super().close()
+        if self._block is not None:
+            self._flush_line()
+            self.blocks.append(self._block)
+            self._block = None
+
+
+def parse_route_blocks(html: str) -> List[Dict[str, Any]]:
+    """
+    解析航线页面中的航班块
+
+    Args:
+        html: 页面HTML
+
+    Returns:
+        航班块列表，每项包含 lines（渲染文本行）、airline（航司logo的alt）、is_transfer（是否中转）
+    """
+    parser = _RouteBlockParser()
+    parser.feed(html)
+    parser.close()
+    logger.debug(f"解析到 {len(parser.blocks)} 个航班块")
+    return parser.blocks
@@ -0,0 +1,134 @@
+"""
+Single Flight - 相同上游请求合并
+
+同一时刻按相同（规范化后的）参数发起的多个请求只执行一次，
+其余调用等待同一个进行中的 Future 并共享结果或异常，
+用于减少多个会话同时查询同一航线、城市或区域时对上游的重复请求
+"""
+
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """按键合并进行中的调用"""
+
+    def __init__(self, name: str):
+        """
+        Args:
+            name: 分组名称（用于日志和统计）
+        """
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._shared: Dict[Hashable, Any] = {}
+        self._stats = {"calls": 0, "executions": 0, "coalesced": 0}
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        执行 fn，若相同键的调用正在进行则等待其结果
+
+        Args:
+            key: 规范化后的请求键
+            fn: 实际执行上游请求的函数
+
+        Returns:
+            (结果, 是否复用了其他调用的结果)；fn 抛出的异常会传递给所有等待者
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            future = self._calls.get(key)
+            if future is not None:
+                self._stats["coalesced"] += 1
+                leader = False
+            else:
+                future = Future()
+                self._calls[key] = future
+                self._stats["executions"] += 1
+                leader = True
+
+        if not leader:
+            logger.debug(f"{self.name} 合并请求，等待进行中的调用: {key}")
+            return future.result(), True
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def share(self, key: Hashable, start: Callable[[], Any]) -> Tuple[Any, bool]:
+        """
+        共享一个在后台进行的任务对象（如边加载边分页的结果集）
+
+        相同键的任务仍在进行时直接返回该对象；否则调用 start 创建并登记，
+        任务结束时须调用 done(key) 注销。start 在锁内调用，应只做创建和启动线程等轻量操作。
+
+        Args:
+            key: 规范化后的请求键
+            start: 创建并启动任务、返回任务对象的函数
+
+        Returns:
+            (任务对象, 是否复用了进行中的任务)
+        """
+        with self._lock:
+            self._stats["calls"] += 1
+            task = self._shared.get(key)
+            if task is not None:
+                self._stats["coalesced"] += 1
+                logger.debug(f"{self.name} 合并请求，复用进行中的任务: {key}")
+                return task, True
+            task = start()
+            self._shared[key] = task
+            self._stats["executions"] += 1
+            return task, False
+
+    def done(self, key: Hashable, task: Any = None):
+        """
+        注销 share 登记的任务
+
+        Args:
+            key: 请求键
+            task: 结束的任务对象；传入时只有登记的正是该对象才注销
+        """
+        with self._lock:
+            if task is None or self._shared.get(key) is task:
+                self._shared.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回合并统计"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["in_flight"] = len(self._calls) + len(self._shared)
+        stats["name"] = self.name
+        return stats
+
+
+_groups: Dict[str, SingleFlight] = {}
+_groups_lock = threading.Lock()
+
+
+def get_singleflight(name: str) -> SingleFlight:
+    """获取（首次调用时创建）指定名称的进程共享合并分组"""
+    group = _groups.get(name)
+    if group is None:
+        with _groups_lock:
+            group = _groups.setdefault(name, SingleFlight(name))
+    return group
+
+
+def get_all_singleflight_stats() -> Dict[str, Dict[str, Any]]:
+    """返回所有合并分组的统计"""
+    with _groups_lock:
+        groups = list(_groups.values())
+    return {group.name: group.get_stats() for group in groups}
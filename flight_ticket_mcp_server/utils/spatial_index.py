@@ -0,0 +1,169 @@
+"""
+Spatial Index - 实时航班的空间索引
+
+在全球状态快照的经纬度列上建立均匀网格索引（按网格编号排序的行下标 + 每格起止位置），
+边界框查询只检查覆盖的网格内的行；机场半径查询先取外接网格再按大圆距离精确过滤。
+安装 scipy 时半径查询改用单位球面坐标上的 KD 树
+"""
+
+import os
+import math
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .airport_index import EARTH_RADIUS_KM
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+# 导入可选的KD树实现
+try:
+    from scipy.spatial import cKDTree
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+# 每度纬度对应的公里数
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+
+def _unit_vectors(latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+    """经纬度转单位球面上的三维坐标"""
+    phi = np.radians(latitude)
+    lam = np.radians(longitude)
+    return np.column_stack((np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)))
+
+
+def haversine_km(lat: float, lon: float, latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """向量化计算一点到多点的大圆距离（公里）"""
+    phi1 = math.radians(lat)
+    phi2 = np.radians(latitudes)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(longitudes - lon)
+    a = np.sin(d_phi / 2) ** 2 + math.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+
+class GridIndex:
+    """经纬度均匀网格索引"""
+
+    def __init__(self, latitude: np.ndarray, longitude: np.ndarray, cell_degrees: Optional[float] = None,
+                 use_kdtree: Optional[bool] = None):
+        """
+        构建索引，缺少位置的行不进入索引
+
+        Args:
+            latitude: 纬度列
+            longitude: 经度列
+            cell_degrees: 网格边长（度），默认读取环境变量 OPENSKY_GRID_CELL_DEGREES
+            use_kdtree: 半径查询是否使用KD树，默认在安装了 scipy 时启用
+        """
+        self.cell_degrees = float(cell_degrees if cell_degrees is not None
+                                  else os.getenv('OPENSKY_GRID_CELL_DEGREES', '1.0'))
+        self.latitude = latitude
+        self.longitude = longitude
+        self._rows_per_lat = int(math.ceil(180 / self.cell_degrees))
+        self._cols = int(math.ceil(360 / self.cell_degrees))
+
+        valid = np.flatnonzero(~(np.isnan(latitude) | np.isnan(longitude)))
+        cells = self._cell_ids(latitude[valid], longitude[valid])
+        order = np.argsort(cells, kind='stable')
+        self._rows = valid[order]
+        self._cells = cells[order]
+
+        self._kdtree = None
+        if use_kdtree if use_kdtree is not None else SCIPY_AVAILABLE:
+            if SCIPY_AVAILABLE:
+                self._kdtree = cKDTree(_unit_vectors(latitude[self._rows], longitude[self._rows]))
+            else:
+                logger.warning("scipy库未安装，半径查询使用网格索引")
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _cell_ids(self, latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+        """计算网格编号（行优先）"""
+        row = np.clip(((latitude + 90) // self.cell_degrees).astype(np.int64), 0, self._rows_per_lat - 1)
+        col = np.clip(((longitude + 180) // self.cell_degrees).astype(np.int64), 0, self._cols - 1)
+        return row * self._cols + col
+
+    def _candidates(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> np.ndarray:
+        """返回覆盖边界框的所有网格中的行下标"""
+        row_lo = max(0, int((min_lat + 90) // self.cell_degrees))
+        row_hi = min(self._rows_per_lat - 1, int((max_lat + 90) // self.cell_degrees))
+        col_lo = max(0, int((min_lon + 180) // self.cell_degrees))
+        col_hi = min(self._cols - 1, int((max_lon + 180) // self.cell_degrees))
+        if row_lo > row_hi or col_lo > col_hi:
+            return np.empty(0, dtype=np.int64)
+        # 每一行网格的编号连续，可用一次二分查找取出整段
+        parts = []
+        for row in range(row_lo, row_hi + 1):
+            start = np.searchsorted(self._cells, row * self._cols + col_lo, side='left')
+            end = np.searchsorted(self._cells, row * self._cols + col_hi, side='right')
+            if end > start:
+                parts.append(self._rows[start:end])
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def query_bbox(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> np.ndarray:
+        """
+        查询边界框内的行
+
+        Args:
+            min_lat / max_lat / min_lon / max_lon: 边界框；min_lon 大于 max_lon 时视为跨越180度经线
+
+        Returns:
+            行下标数组（升序）
+        """
+        if min_lon > max_lon:
+            return np.union1d(self.query_bbox(min_lat, max_lat, min_lon, 180.0),
+                              self.query_bbox(min_lat, max_lat, -180.0, max_lon))
+        rows = self._candidates(min_lat, max_lat, min_lon, max_lon)
+        lat = self.latitude[rows]
+        lon = self.longitude[rows]
+        mask = (lat >= min_lat) & (lat <= max_lat) & (lon >= min_lon) & (lon <= max_lon)
+        return np.sort(rows[mask])
+
+    def query_radius(self, lat: float, lon: float, radius_km: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        查询距离某点 radius_km 公里内的行
+
+        Args:
+            lat: 中心纬度
+            lon: 中心经度
+            radius_km: 半径（公里）
+
+        Returns:
+            (按距离升序的行下标数组, 对应的距离数组（公里）)
+        """
+        if self._kdtree is not None:
+            # 球面距离 d 对应的弦长为 2·sin(d / 2R)
+            chord = 2 * math.sin(min(math.pi, radius_km / EARTH_RADIUS_KM) / 2)
+            hits = self._kdtree.query_ball_point(_unit_vectors(np.array([lat]), np.array([lon]))[0], chord)
+            rows = self._rows[np.asarray(hits, dtype=np.int64)]
+        else:
+            angle = radius_km / EARTH_RADIUS_KM
+            lat_delta = radius_km / KM_PER_DEGREE
+            min_lat, max_lat = lat - lat_delta, lat + lat_delta
+            # 圆内各点与中心的最大经度差：sin(Δλ) = sin(d/R) / cos(φ)，圆覆盖极点时取全部经度
+            ratio = math.sin(min(angle, math.pi / 2)) / max(1e-12, math.cos(math.radians(lat)))
+            if angle >= math.pi / 2 or ratio >= 1 or max_lat >= 90 or min_lat <= -90:
+                lon_delta = 180.0
+            else:
+                lon_delta = math.degrees(math.asin(ratio))
+            if lon_delta >= 180:
+                rows = self._candidates(min_lat, max_lat, -180.0, 180.0)
+            else:
+                min_lon, max_lon = lon - lon_delta, lon + lon_delta
+                rows = self._candidates(min_lat, max_lat, max(min_lon, -180.0), min(max_lon, 180.0))
+                if min_lon < -180:
+                    rows = np.concatenate((rows, self._candidates(min_lat, max_lat, min_lon + 360, 180.0)))
+                if max_lon > 180:
+                    rows = np.concatenate((rows, self._candidates(min_lat, max_lat, -180.0, max_lon - 360)))
+
+        distances = haversine_km(lat, lon, self.latitude[rows], self.longitude[rows])
+        keep = distances <= radius_km
+        rows, distances = rows[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        return rows[order], distances[order]
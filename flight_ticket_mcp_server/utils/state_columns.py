@@ -0,0 +1,152 @@
+"""
+State Columns - OpenSky 状态向量的列式存储
+
+把 /states/all 返回的状态向量一次性转成 NumPy 列（经纬度、高度、速度、航迹、垂直速度、
+最后联系时间等），呼号和 icao24 为定长字符串列；航班状态分类和单位换算（英尺、km/h、ft/min）
+都按列一次计算，只为最终返回给客户端的行构建字典；区域查询由 spatial_index 在经纬度列上完成
+"""
+
+import time
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+# 状态向量字段位置：
+# [0] icao24, [1] callsign, [2] origin_country, [3] time_position,
+# [4] last_contact, [5] longitude, [6] latitude, [7] baro_altitude,
+# [8] on_ground, [9] velocity, [10] true_track, [11] vertical_rate,
+# [12] sensors, [13] geo_altitude, [14] squawk, [15] spi, [16] position_source
+STATE_VECTOR_FIELDS = 17
+
+# 航班状态（按判断优先级排列）
+STATUS_ON_GROUND = "ON_GROUND"
+STATUS_AIRBORNE = "AIRBORNE"
+STATUS_TAXI = "TAXI"
+STATUS_STATIONARY = "STATIONARY"
+STATUS_NAMES = np.array([STATUS_ON_GROUND, STATUS_AIRBORNE, STATUS_TAXI, STATUS_STATIONARY])
+
+# 状态分类的速度阈值（m/s）：100 m/s ≈ 360 km/h
+AIRBORNE_SPEED_MS = 100.0
+TAXI_SPEED_MS = 10.0
+
+FEET_PER_METER = 3.28084
+KMH_PER_MS = 3.6
+SECONDS_PER_MINUTE = 60
+
+
+def _float_column(rows: Sequence[Sequence[Any]], position: int) -> np.ndarray:
+    """取出一列数值，None 转为 NaN"""
+    return np.array([row[position] for row in rows], dtype=np.float64)
+
+
+def _optional(value: float) -> Optional[float]:
+    """NaN 转为 None，其余转为 Python float"""
+    return None if value != value else float(value)
+
+
+def _rounded(values: np.ndarray) -> np.ndarray:
+    """取整后的换算列，原值缺失或为0时为 NaN（输出为 None）"""
+    with np.errstate(invalid='ignore'):
+        return np.where(np.isnan(values) | (values == 0), np.nan, np.rint(values))
+
+
+class StateColumns:
+    """一组状态向量的列式表示"""
+
+    def __init__(self, states: Optional[Sequence[Sequence[Any]]]):
+        """
+        由接口返回的 states 数组构建列，字段不足的状态向量被跳过
+
+        Args:
+            states: /states/all 响应中的 states 列表
+        """
+        rows = [row for row in (states or []) if row and len(row) >= STATE_VECTOR_FIELDS]
+        skipped = len(states or []) - len(rows)
+        if skipped:
+            logger.debug(f"跳过字段不完整的状态向量 {skipped} 个")
+
+        self.icao24 = np.array([str(row[0] or '').lower() for row in rows], dtype='U8')
+        self.callsign = np.array([str(row[1] or '').strip() for row in rows], dtype='U8')
+        # 去空白、转大写的呼号，用于匹配
+        self.callsign_key = np.char.upper(np.char.replace(self.callsign, ' ', ''))
+        self.origin_country = np.array([row[2] or '' for row in rows], dtype=object)
+        self.last_contact = _float_column(rows, 4)
+        self.longitude = _float_column(rows, 5)
+        self.latitude = _float_column(rows, 6)
+        baro_altitude = _float_column(rows, 7)
+        self.on_ground = np.array([bool(row[8]) for row in rows], dtype=bool)
+        self.velocity = _float_column(rows, 9)
+        self.true_track = _float_column(rows, 10)
+        self.vertical_rate = _float_column(rows, 11)
+        geo_altitude = _float_column(rows, 13)
+
+        # 气压高度缺失或为0时使用几何高度
+        self.altitude = np.where(np.isnan(baro_altitude) | (baro_altitude == 0), geo_altitude, baro_altitude)
+        self.status_code = self._classify()
+
+        # 单位换算按列一次完成
+        self.altitude_feet = _rounded(self.altitude * FEET_PER_METER)
+        self.ground_speed_kmh = _rounded(self.velocity * KMH_PER_MS)
+        self.vertical_rate_fpm = _rounded(self.vertical_rate * FEET_PER_METER * SECONDS_PER_MINUTE)
+
+    def __len__(self) -> int:
+        return len(self.icao24)
+
+    def _classify(self) -> np.ndarray:
+        """向量化的航班状态分类，返回 STATUS_NAMES 中的下标"""
+        speed = np.nan_to_num(self.velocity, nan=0.0)
+        return np.select(
+            [self.on_ground, speed > AIRBORNE_SPEED_MS, speed > TAXI_SPEED_MS],
+            [0, 1, 2], default=3).astype(np.int8)
+
+    # ---------- 输出 ----------
+
+    def row(self, index: int, now: Optional[float] = None) -> Dict[str, Any]:
+        """
+        构建单行的航班信息字典
+
+        Args:
+            index: 行下标
+            now: 计算 last_contact_seconds_ago 使用的当前时间戳
+
+        Returns:
+            航班信息字典
+        """
+        now = now if now is not None else time.time()
+        altitude_feet = _optional(self.altitude_feet[index])
+        ground_speed_kmh = _optional(self.ground_speed_kmh[index])
+        vertical_rate_fpm = _optional(self.vertical_rate_fpm[index])
+        last_contact = _optional(self.last_contact[index])
+        return {
+            "icao24": str(self.icao24[index]),
+            "callsign": str(self.callsign[index]) or None,
+            "origin_country": self.origin_country[index],
+            "position": {
+                "longitude": _optional(self.longitude[index]),
+                "latitude": _optional(self.latitude[index]),
+                "altitude_meters": _optional(self.altitude[index]),
+                "altitude_feet": int(altitude_feet) if altitude_feet is not None else None
+            },
+            "velocity": {
+                "ground_speed_ms": _optional(self.velocity[index]),
+                "ground_speed_kmh": int(ground_speed_kmh) if ground_speed_kmh is not None else None,
+                "vertical_rate_ms": _optional(self.vertical_rate[index]),
+                "vertical_rate_fpm": int(vertical_rate_fpm) if vertical_rate_fpm is not None else None
+            },
+            "true_track": _optional(self.true_track[index]),
+            "on_ground": bool(self.on_ground[index]),
+            "status": str(STATUS_NAMES[self.status_code[index]]),
+            "last_contact": datetime.fromtimestamp(last_contact).isoformat() if last_contact else None,
+            "last_contact_seconds_ago": int(now - last_contact) if last_contact else None
+        }
+
+    def rows(self, indices: Optional[Sequence[int]] = None) -> List[Dict[str, Any]]:
+        """构建指定行（默认全部）的航班信息字典列表"""
+        now = time.time()
+        indices = range(len(self)) if indices is None else indices
+        return [self.row(int(index), now) for index in indices]
@@ -0,0 +1,161 @@
+"""
+States Stream - /states/all 响应的流式解析
+
+按块读取响应体，定位 "states" 数组后逐个解码状态向量（每行一个小JSON数组），
+边解码边按边界框和呼号过滤，只保留匹配的行；缓冲区只保存尚未解码的尾部，
+峰值内存取决于匹配的行数，而不是整个全球响应
+"""
+
+import re
+import json
+import codecs
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+_STATES_KEY = re.compile(r'"states"\s*:\s*(\[|null)')
+_TIME_KEY = re.compile(r'"time"\s*:\s*(-?\d+)')
+_SEPARATORS = re.compile(r'[\s,]*')
+
+# 解析阶段：定位 states 数组、逐行解码、数组之后的剩余部分
+_HEAD = "head"
+_ROWS = "rows"
+_TAIL = "tail"
+
+
+class StatesStreamParser:
+    """增量解析 /states/all 响应，逐行过滤状态向量"""
+
+    def __init__(self, bbox: Optional[Sequence[float]] = None, callsigns: Optional[Iterable[str]] = None):
+        """
+        Args:
+            bbox: 可选的边界框 (min_lat, max_lat, min_lon, max_lon)，只保留位置在框内的行
+            callsigns: 可选的呼号或呼号片段（已去空白、转大写），只保留呼号包含其中之一的行
+        """
+        self.bbox = tuple(bbox) if bbox else None
+        self.callsigns = [pattern for pattern in (callsigns or []) if pattern]
+        self.api_time: Optional[int] = None
+        self.states: Optional[List[List[Any]]] = []
+        self.rows_seen = 0
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._phase = _HEAD
+
+    def _keep(self, row: List[Any]) -> bool:
+        """行是否满足过滤条件"""
+        if self.bbox is not None:
+            try:
+                lon, lat = row[5], row[6]
+            except IndexError:
+                return False
+            if lat is None or lon is None:
+                return False
+            if not (self.bbox[0] <= lat <= self.bbox[1] and self.bbox[2] <= lon <= self.bbox[3]):
+                return False
+        if self.callsigns:
+            callsign = "".join(str(row[1] or "").split()).upper() if len(row) > 1 else ""
+            if not any(pattern in callsign for pattern in self.callsigns):
+                return False
+        return True
+
+    def feed(self, text: str):
+        """
+        送入一段响应文本
+
+        Args:
+            text: 已解码的响应文本片段
+        """
+        self._buffer += text
+        if self._phase == _HEAD:
+            match = _STATES_KEY.search(self._buffer)
+            if match is None:
+                return
+            self._read_time(self._buffer[:match.start()])
+            if match.group(1) == "null":
+                self.states = None
+                self._phase = _TAIL
+                self._buffer = self._buffer[match.end():]
+                return
+            self._phase = _ROWS
+            self._buffer = self._buffer[match.end():]
+        if self._phase == _ROWS:
+            self._decode_rows()
+
+    def _decode_rows(self):
+        """解码缓冲区中所有完整的状态向量，保留未完整的尾部"""
+        buffer = self._buffer
+        position = 0
+        while True:
+            position = _SEPARATORS.match(buffer, position).end()
+            if position >= len(buffer):
+                break
+            char = buffer[position]
+            if char == "]":
+                self._phase = _TAIL
+                position += 1
+                break
+            try:
+                row, end = self._decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                # 状态向量被数据块截断，等待下一块
+                break
+            position = end
+            self.rows_seen += 1
+            if isinstance(row, list) and self._keep(row):
+                self.states.append(row)
+        self._buffer = buffer[position:]
+
+    def _read_time(self, text: str):
+        """从 states 数组之外的部分读取 time 字段"""
+        if self.api_time is None:
+            match = _TIME_KEY.search(text)
+            if match:
+                self.api_time = int(match.group(1))
+
+    def close(self) -> Dict[str, Any]:
+        """
+        结束解析
+
+        Returns:
+            与 response.json() 格式相同的字典 {"time", "states"}，states 只包含匹配的行
+
+        Raises:
+            ValueError: 响应不完整或格式错误
+        """
+        if self._phase == _HEAD:
+            # 没有 states 字段（或为空对象）时按无数据处理
+            self._read_time(self._buffer)
+            self.states = None
+        elif self._phase == _ROWS:
+            raise ValueError(f"OpenSky响应不完整: states 数组未结束（已解析 {self.rows_seen} 行）")
+        else:
+            self._read_time(self._buffer)
+        self._buffer = ""
+        return {"time": self.api_time, "states": self.states}
+
+
+def parse_states_stream(chunks: Iterable[bytes], bbox: Optional[Sequence[float]] = None,
+                        callsigns: Optional[Iterable[str]] = None, encoding: str = "utf-8") -> Dict[str, Any]:
+    """
+    流式解析 /states/all 响应体
+
+    Args:
+        chunks: 响应体数据块（如 response.iter_content()）
+        bbox: 可选的边界框 (min_lat, max_lat, min_lon, max_lon)
+        callsigns: 可选的呼号或呼号片段列表（已去空白、转大写）
+        encoding: 响应编码
+
+    Returns:
+        {"time": 接口时间戳, "states": 匹配的状态向量列表或None}
+    """
+    parser = StatesStreamParser(bbox=bbox, callsigns=callsigns)
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    for chunk in chunks:
+        if chunk:
+            parser.feed(decoder.decode(chunk))
+    parser.feed(decoder.decode(b"", final=True))
+    data = parser.close()
+    logger.debug(f"流式解析状态向量: 共 {parser.rows_seen} 行，保留 {len(data['states'] or [])} 行")
+    return data
@@ -0,0 +1,204 @@
+"""
+Weather Cache - 按模式网格和日期切片缓存的天气数据
+
+坐标先对齐到天气模式的网格点（同一网格内的坐标返回的是同一格点的数据），
+逐小时数据按本地日期切成每日片段缓存，查询任意日期范围时由已缓存的每日片段拼接，
+只请求缺失的日期；条目在模式下一次更新时过期
+"""
+
+import os
+import math
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .result_cache import CACHE_HIT, CACHE_MISS, CACHE_STALE, TTLCache, get_cache
+from .singleflight import get_singleflight
+
+# 初始化日志器
+logger = logging.getLogger(__name__)
+
+# 部分缓存命中：已缓存的日期直接使用，其余日期在线请求
+CACHE_PARTIAL = "partial"
+
+# 各天气模式的网格分辨率（度）和更新间隔（小时）
+MODEL_GRID_RESOLUTION = {
+    "cma_grapes_global": 0.125,
+}
+MODEL_UPDATE_HOURS = {
+    "cma_grapes_global": 6,
+}
+DEFAULT_GRID_RESOLUTION = 0.1
+DEFAULT_UPDATE_HOURS = 1
+
+# 过期时间距离当前的最小值（秒），避免刚好在更新时刻写入的条目立即过期
+_MIN_TTL_SECONDS = 60
+
+
+def grid_resolution(model: str) -> float:
+    """返回模式网格分辨率（度），环境变量 WEATHER_GRID_RESOLUTION 优先"""
+    return float(os.getenv('WEATHER_GRID_RESOLUTION') or MODEL_GRID_RESOLUTION.get(model, DEFAULT_GRID_RESOLUTION))
+
+
+def update_hours(model: str) -> float:
+    """返回模式更新间隔（小时），环境变量 WEATHER_MODEL_UPDATE_HOURS 优先"""
+    return float(os.getenv('WEATHER_MODEL_UPDATE_HOURS') or MODEL_UPDATE_HOURS.get(model, DEFAULT_UPDATE_HOURS))
+
+
+def snap_to_grid(latitude: float, longitude: float, resolution: float) -> Tuple[float, float]:
+    """
+    把坐标对齐到最近的网格点
+
+    Args:
+        latitude: 纬度
+        longitude: 经度
+        resolution: 网格分辨率（度）
+
+    Returns:
+        (网格点纬度, 网格点经度)
+    """
+    lat = max(-90.0, min(90.0, round(latitude / resolution) * resolution))
+    lon = round(longitude / resolution) * resolution
+    if lon > 180:
+        lon -= 360
+    elif lon <= -180:
+        lon += 360
+    # 去掉浮点误差，保证同一网格点生成相同的缓存键
+    return round(lat, 6), round(lon, 6)
+
+
+def seconds_until_update(hours: float, now: Optional[datetime] = None) -> float:
+    """
+    距离下一次模式更新（UTC零点起每 hours 小时一次）的秒数
+
+    Args:
+        hours: 更新间隔（小时）
+        now: 当前时间，默认使用当前UTC时间
+
+    Returns:
+        秒数，不小于 _MIN_TTL_SECONDS
+    """
+    now = now or datetime.now(timezone.utc)
+    period = hours * 3600
+    elapsed = (now - now.replace(hour=0, minute=0, second=0, microsecond=0)).total_seconds()
+    remaining = (math.floor(elapsed / period) + 1) * period - elapsed
+    return max(float(_MIN_TTL_SECONDS), remaining)
+
+
+def _date_range(start_date: str, end_date: str) -> List[str]:
+    """返回 [start_date, end_date] 内的所有日期字符串"""
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    days = (datetime.strptime(end_date, '%Y-%m-%d') - start).days
+    return [(start + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(days + 1)]
+
+
+def split_daily(data: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """
+    把接口返回的逐小时数据按本地日期切成每日片段
+
+    Args:
+        data: Open-Meteo 返回的JSON（hourly.time 为 "YYYY-MM-DDTHH:MM" 本地时间）
+
+    Returns:
+        日期 -> 与接口返回格式相同、只含当天数据的字典
+    """
+    hourly = data.get("hourly") or {}
+    times = hourly.get("time") or []
+    meta = {key: value for key, value in data.items() if key != "hourly"}
+    slices: Dict[str, Dict[str, Any]] = {}
+    for position, time_str in enumerate(times):
+        day = str(time_str)[:10]
+        piece = slices.get(day)
+        if piece is None:
+            piece = slices[day] = dict(meta, hourly={key: [] for key in hourly})
+        for key, values in hourly.items():
+            piece["hourly"][key].append(values[position] if position < len(values) else None)
+    return slices
+
+
+def merge_daily(slices: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """按顺序拼接每日片段，元数据取第一个片段"""
+    merged = {key: value for key, value in slices[0].items() if key != "hourly"}
+    hourly: Dict[str, List[Any]] = {}
+    for piece in slices:
+        for key, values in (piece.get("hourly") or {}).items():
+            hourly.setdefault(key, []).extend(values)
+    merged["hourly"] = hourly
+    return merged
+
+
+class WeatherSliceCache:
+    """按 (模式, 网格点, 日期) 缓存每日天气片段"""
+
+    def __init__(self, model: str, cache: Optional[TTLCache] = None):
+        """
+        Args:
+            model: 天气模式名称，如 "cma_grapes_global"
+            cache: 存放每日片段的缓存，默认使用进程共享的 "weather" 缓存
+        """
+        self.model = model
+        self.cache = cache or get_cache("weather")
+
+    def get_range(self, latitude: float, longitude: float, start_date: str, end_date: str,
+                  fetch: Callable[[float, float, str, str], Dict[str, Any]]) -> Tuple[Dict[str, Any], str]:
+        """
+        查询日期范围内的天气数据，缺失的日期合并为一次请求
+
+        Args:
+            latitude: 纬度
+            longitude: 经度
+            start_date: 开始日期 (YYYY-MM-DD)
+            end_date: 结束日期 (YYYY-MM-DD)
+            fetch: 在线请求函数 fetch(网格点纬度, 网格点经度, 开始日期, 结束日期)，返回接口JSON
+
+        Returns:
+            (拼接后的天气数据, 缓存状态)；状态为 "hit"、"stale"、"partial" 或 "miss"
+        """
+        cell = snap_to_grid(latitude, longitude, grid_resolution(self.model))
+        dates = _date_range(start_date, end_date)
+        slices: Dict[str, Dict[str, Any]] = {}
+        stale: List[str] = []
+        for day in dates:
+            piece, status = self.cache.get((self.model, cell, day))
+            if piece is not None:
+                slices[day] = piece
+                if status == CACHE_STALE:
+                    stale.append(day)
+
+        missing = [day for day in dates if day not in slices]
+        if missing:
+            # 缺失日期之间夹着已缓存的日期时一并重新请求，保持单次请求
+            fetched = self._load(cell, missing[0], missing[-1], fetch)
+            slices.update({day: fetched[day] for day in dates if day in fetched and day not in slices})
+            status = CACHE_PARTIAL if len(missing) < len(dates) else CACHE_MISS
+        else:
+            status = CACHE_STALE if stale else CACHE_HIT
+        if stale:
+            def refresh():
+                # 片段由 _load 写入缓存，刷新任务本身不写入条目
+                self._load(cell, stale[0], stale[-1], fetch)
+                return None
+
+            self.cache.refresh_async(("refresh", self.model, cell, stale[0], stale[-1]), refresh)
+
+        present = [slices[day] for day in dates if day in slices]
+        if not present:
+            raise ValueError(f"天气接口未返回 {start_date} 到 {end_date} 的数据")
+        logger.debug(f"天气网格 {cell} {start_date}~{end_date} 缓存状态: {status}")
+        return merge_daily(present), status
+
+    def _load(self, cell: Tuple[float, float], start_date: str, end_date: str,
+              fetch: Callable[[float, float, str, str], Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """请求一段日期的数据，切片后写入缓存（相同请求合并为一次）"""
+        key = (self.model, cell, start_date, end_date)
+
+        def load():
+            data = fetch(cell[0], cell[1], start_date, end_date)
+            slices = split_daily(data)
+            ttl = seconds_until_update(update_hours(self.model))
+            for day, piece in slices.items():
+                self.cache.set((self.model, cell, day), piece, ttl=ttl)
+            logger.info(f"天气网格 {cell} 已缓存 {len(slices)} 天数据，{int(ttl)} 秒后随模式更新过期")
+            return slices
+
+        return get_singleflight("weather").do(key, load)[0]
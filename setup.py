@@ -30,6 +30,7 @@ def read_requirements():
             "pytz>=2023.3",
             "uvicorn>=0.23.0",
             "fastapi>=0.100.0",
+            "numpy>=1.24.0",
         ]
 
 setup(